@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+Vorberechnete Aggregate für die Diagramm-Callbacks.
+
+Beim Laden werden die Zeilen einem Raster (Land bzw. Kontinent × Tag) zugeordnet
+und pro Attribut Summen, Anzahl gültiger Werte und Präfixsummen über das Datum
+berechnet. Der Mittelwert eines Landes oder Kontinents über einen beliebigen
+Zeitraum ist dann eine Differenz zweier Präfixsummen statt eines groupby über
+alle ausgewählten Zeilen.
+
+Die Kontinent-Raster sind klein und werden für alle Attribute beim Laden
+berechnet. Die Länder-Präfixsummen werden erst für ein Attribut berechnet,
+wenn ein Diagramm es anfordert, und in einem begrenzten Cache gehalten.
+
+Gleitende Werte über die Tage (Mittelwert bzw. Summe der letzten N Tage,
+Wachstum gegenüber den N Tagen davor, Summe seit Beginn des Zeitraums) sind
+ebenfalls Differenzen derselben Präfixsummen, für alle Länder bzw.
+Kontinente auf einmal statt mit rolling() pro Gruppe. Die Raster pro
+Attribut, Modus und Fenster bleiben in einem begrenzten Cache.
+
+Für lange Zeiträume gibt es die Tageswerte auch pro Woche (ab Montag) und pro
+Monat: Summe, Anzahl gültiger Werte und Mittelwert einer Periode sind
+Differenzen der Präfixsummen an den Grenzen der Perioden. Die Grenzen jeder
+Stufe werden beim Laden berechnet (periods) und am Rand auf den Zeitraum
+beschnitten.
+
+Eine Rangliste (die N Länder mit dem höchsten bzw. tiefsten Mittelwert eines
+Attributs im Zeitraum) braucht die Mittelwerte aller Länder aus denselben
+Präfixsummen und eine Teilsortierung (argpartition) statt einer ganzen.
+
+Wurden an einen Snapshot nur neue Zeilen angehängt (refresh.py), übernimmt ein
+neuer Cube die Kontinent-Raster des vorherigen und rechnet nur die neuen
+Zeilen ein.
+
+Alle Arrays eines Cubes sind schreibgeschützt (freeze); Threads lesen sie
+gleichzeitig, ein neuer Datenstand bekommt einen neuen Cube.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from storage import SparseColumn
+
+
+def _prefix(werte):
+    #Präfixsummen entlang der Tage mit führender Null: p[:, j] = Summe der Tage < j
+    prefix = np.zeros((werte.shape[0], werte.shape[1] + 1), dtype=werte.dtype)
+    np.cumsum(werte, axis=1, out=prefix[:, 1:])
+    return prefix
+
+
+def _raster(zellen, gruppen, tage, werte=None):
+    #Summe (bzw. Anzahl bei werte=None) pro Zelle gruppe*tage+tag
+    summe = np.bincount(zellen, weights=werte, minlength=gruppen * tage)
+    return summe.reshape(gruppen, tage)
+
+
+#Stufen der Zeitachse über den Tagen
+PERIODS = ["week", "month"]
+
+
+def periods(tage, stufe):
+    #Nummer der Woche (ab Montag) bzw. des Monats von Tagen seit 1970 (bei "day" die Tage)
+    tage = np.asarray(tage, dtype=np.int64)
+    if stufe == "week":
+        return (tage + 3) // 7
+    if stufe == "month":
+        return tage.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return tage
+
+
+def period_start(nummern, stufe):
+    #Erster Tag der Perioden (datetime64[D])
+    nummern = np.asarray(nummern, dtype=np.int64)
+    if stufe == "week":
+        return (nummern * 7 - 3).astype("datetime64[D]")
+    if stufe == "month":
+        return nummern.astype("datetime64[M]").astype("datetime64[D]")
+    return nummern.astype("datetime64[D]")
+
+
+def period_count(start_date, end_date, stufe):
+    #Anzahl Perioden der Stufe, die der Zeitraum (Kalendertage) berührt
+    von, bis = (np.datetime64(pd.Timestamp(datum), "D").astype(np.int64) for datum in (start_date, end_date))
+    return int(periods(bis, stufe) - periods(von, stufe)) + 1
+
+
+def _period_bounds(dates, stufe):
+    #Grenzen der Perioden als Tages-Indizes (Periode k: Tage [grenzen[k], grenzen[k + 1])) und ihr Startdatum
+    nummern = periods(dates.astype(np.int64), stufe)
+    anfang = np.flatnonzero(np.r_[True, nummern[1:] != nummern[:-1]]) if len(nummern) else np.zeros(0, np.int64)
+    return np.r_[anfang, len(nummern)], period_start(nummern[anfang], stufe)
+
+
+def _differenz(oben, unten):
+    #Differenz zweier Präfixsummen; Rundungsreste nach grossen Werten (z.B. 1e-12 statt 0) werden 0
+    differenz = oben - unten
+    differenz[np.abs(differenz) <= 8 * np.finfo(np.float64).eps * np.maximum(np.abs(oben), np.abs(unten))] = 0
+    return differenz
+
+
+def _window(prefix_summe, prefix_anzahl, dates, modus, fenster):
+    #Raster (Gruppe × Tag) über die fenster Kalendertage bis und mit jedem Tag:
+    #"mean" Mittelwert, "sum" Summe der gültigen Werte, "growth" Veränderung der
+    #Summe gegenüber den fenster Tagen davor in Prozent
+    bis = np.arange(1, len(dates) + 1)
+    von = np.searchsorted(dates, dates - np.timedelta64(fenster - 1, "D"))
+    summe = _differenz(prefix_summe[:, bis], prefix_summe[:, von])
+    anzahl = prefix_anzahl[:, bis] - prefix_anzahl[:, von]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if modus == "mean":
+            return np.where(anzahl > 0, summe / np.maximum(anzahl, 1), np.nan)
+        if modus == "sum":
+            return np.where(anzahl > 0, summe, np.nan)
+        if modus == "growth":
+            vorher_von = np.searchsorted(dates, dates - np.timedelta64(2 * fenster - 1, "D"))
+            vorher = _differenz(prefix_summe[:, von], prefix_summe[:, vorher_von])
+            gueltig = (anzahl > 0) & (prefix_anzahl[:, von] > prefix_anzahl[:, vorher_von]) & (vorher != 0)
+            return np.where(gueltig, (summe / np.where(gueltig, vorher, 1) - 1) * 100, np.nan)
+    raise ValueError("Unbekannter Modus %r" % modus)
+
+
+def _since(prefix_summe, prefix_anzahl, gruppen, tage, von):
+    #Summe der gültigen Werte vom Tag von bis und mit dem jeweiligen Tag
+    summe = _differenz(prefix_summe[gruppen, tage + 1], prefix_summe[gruppen, von])
+    anzahl = prefix_anzahl[gruppen, tage + 1] - prefix_anzahl[gruppen, von]
+    return np.where(anzahl > 0, summe, np.nan)
+
+
+def freeze(wert):
+    #NumPy-Arrays schreibschützen, auch in Dictionaries, Listen und Tupeln
+    if isinstance(wert, np.ndarray):
+        wert.flags.writeable = False
+    elif isinstance(wert, Mapping):
+        for element in wert.values():
+            freeze(element)
+    elif isinstance(wert, (list, tuple)):
+        for element in wert:
+            freeze(element)
+    return wert
+
+
+def _unique(attributes):
+    return list(OrderedDict.fromkeys(attributes))
+
+
+#Reihenfolge der Rangliste: höchste bzw. tiefste Werte zuerst
+RANKINGS = ["top", "bottom"]
+
+
+def _rank(werte, n, order="top"):
+    #Positionen der n grössten (top) bzw. kleinsten (bottom) gültigen Werte, nach Rang sortiert;
+    #bei gleichen Werten die kleinere Position zuerst. Nur die Kandidaten bis zum n-ten Wert
+    #(argpartition) werden sortiert
+    gueltig = np.flatnonzero(~np.isnan(werte))
+    schluessel = -werte[gueltig] if order == "top" else werte[gueltig]
+    if 0 < n < len(gueltig):
+        grenze = schluessel[np.argpartition(schluessel, n - 1)[n - 1]]
+        kandidaten = schluessel <= grenze
+        gueltig, schluessel = gueltig[kandidaten], schluessel[kandidaten]
+    return gueltig[np.lexsort((gueltig, schluessel))[:max(n, 0)]]
+
+
+class Cube:
+
+    def __init__(self, dataset, max_location_attributes=16, max_windows=16, previous=None):
+        self.dataset = dataset
+        self.max_location_attributes = max_location_attributes
+        self.max_windows = max_windows
+        self.attributes = [name for name in dataset.column_names
+                           if name not in dataset.categories and name != "date"]
+
+        tage = dataset.columns["date"].astype("datetime64[D]")
+        self.dates = np.unique(tage)
+        self.row_day = np.searchsorted(self.dates, tage)
+        self.row_location = np.asarray(dataset.columns["location"], dtype=np.int64)
+        self.row_continent = np.asarray(dataset.columns["continent"], dtype=np.int64)
+
+        n_tage = len(self.dates)
+        n_laender = len(dataset.categories["location"])
+        n_kontinente = len(dataset.categories["continent"])
+
+        self.location_continent = dataset.catalog.location_continent
+        self.location_iso_code = dataset.catalog.location_iso_code
+
+        #Stufen Woche und Monat: Grenzen der Perioden über den Tagen
+        self.periods = {stufe: _period_bounds(self.dates, stufe) for stufe in PERIODS}
+
+        self._location_cells = self.row_location * n_tage + self.row_day
+        self._continent_cells = self.row_continent * n_tage + self.row_day
+        self._n = (n_laender, n_kontinente, n_tage)
+
+        #Anzahl vorhandener Zeilen pro Zelle, unabhängig von fehlenden Werten
+        self.location_rows = _prefix(_raster(self._location_cells, n_laender, n_tage).astype(np.int32))
+        self.continent_rows_per_day = _raster(self._continent_cells, n_kontinente, n_tage).astype(np.int32)
+        self.continent_rows = _prefix(self.continent_rows_per_day)
+
+        #Kontinent-Raster: nach einem Anhängen neuer Zeilen nur diese einrechnen
+        neue_zeilen, alte_tage = self._appended(previous)
+        self._continent = {}
+        for attribut in self.attributes:
+            if neue_zeilen is not None and attribut in previous._continent:
+                self._continent[attribut] = self._extend_continent(
+                    attribut, previous._continent[attribut], neue_zeilen, alte_tage)
+            else:
+                self._continent[attribut] = self._continent_aggregate(attribut)
+        self._location = OrderedDict()
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _appended(self, previous):
+        #Neue Zeilen und Position der alten Tage, falls der vorherige Datenstand
+        #unverändert im neuen enthalten ist (gleiche Codes, nur Zeilen angehängt)
+        if previous is None:
+            return None, None
+        for spalte in ["location", "continent"]:
+            alt = previous.dataset.categories[spalte]
+            if self.dataset.categories[spalte][:len(alt)] != alt:
+                return None, None
+        alte_zeilen = np.isin(self.dataset.row_key, previous.dataset.row_key)
+        if alte_zeilen.sum() != previous.dataset.rows:
+            return None, None
+        return np.flatnonzero(~alte_zeilen), np.searchsorted(self.dates, previous.dates)
+
+    def _extend_continent(self, attribut, alt, neue_zeilen, alte_tage):
+        summe, anzahl = self._aggregate(attribut, self._continent_cells, self._n[1], neue_zeilen)
+        n_alt = alt[0].shape[0]
+        summe[:n_alt, alte_tage] += alt[0]
+        anzahl[:n_alt, alte_tage] += alt[1]
+        return summe, anzahl, _prefix(summe), _prefix(anzahl)
+
+    def _aggregate(self, attribut, zellen, gruppen, zeilen=None):
+        spalte = self.dataset.columns[attribut]
+        if isinstance(spalte, SparseColumn) and zeilen is None:
+            #Dünn besetzte Spalte: nur die vorhandenen Werte einrechnen
+            werte, zellen = spalte.present(), zellen[spalte.index]
+        elif zeilen is not None:
+            werte, zellen = np.asarray(spalte[zeilen], dtype=np.float64), zellen[zeilen]
+        else:
+            werte = np.asarray(spalte, dtype=np.float64)
+        #Fehlende Werte zählen als 0 mit Gewicht 0, ohne die Zeilen zu kopieren
+        gueltig = ~np.isnan(werte)
+        n_tage = self._n[2]
+        summe = _raster(zellen, gruppen, n_tage, np.where(gueltig, werte, 0.0))
+        anzahl = _raster(zellen, gruppen, n_tage, gueltig).astype(np.int32)
+        return summe, anzahl
+
+    def _continent_aggregate(self, attribut):
+        summe, anzahl = self._aggregate(attribut, self._continent_cells, self._n[1])
+        return summe, anzahl, _prefix(summe), _prefix(anzahl)
+
+    def _location_aggregate(self, attribut):
+        #Länder-Präfixsummen eines Attributs, die zuletzt benutzten bleiben im Cache
+        with self._lock:
+            if attribut in self._location:
+                self._location.move_to_end(attribut)
+                return self._location[attribut]
+        summe, anzahl = self._aggregate(attribut, self._location_cells, self._n[0])
+        eintrag = freeze((_prefix(summe), _prefix(anzahl)))
+        with self._lock:
+            self._location[attribut] = eintrag
+            while len(self._location) > self.max_location_attributes:
+                self._location.popitem(last=False)
+        return eintrag
+
+    def _continent_daily(self, attribut):
+        #Präfixsummen der Tagesmittel pro Kontinent (Tage mit gültigen Werten)
+        summe, anzahl = self._continent[attribut][:2]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mittel = np.where(anzahl > 0, summe / np.maximum(anzahl, 1), 0.0)
+        return _prefix(mittel), _prefix((anzahl > 0).astype(np.int32))
+
+    def _window_raster(self, scope, attribut, modus, fenster):
+        #Gleitende Werte aller Länder bzw. Kontinente, die zuletzt benutzten bleiben im Cache
+        schluessel = (scope, attribut, modus, fenster)
+        with self._lock:
+            if schluessel in self._windows:
+                self._windows.move_to_end(schluessel)
+                return self._windows[schluessel]
+        if scope == "location":
+            prefix_summe, prefix_anzahl = self._location_aggregate(attribut)
+        else:
+            prefix_summe, prefix_anzahl = self._continent_daily(attribut)
+        raster = freeze(_window(prefix_summe, prefix_anzahl, self.dates, modus, fenster))
+        with self._lock:
+            self._windows[schluessel] = raster
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+        return raster
+
+    def location_window(self, attribut, laender, tage, start_date, modus, fenster):
+        #Gleitende Werte für Zeilen (Land- und Tages-Index); "cumulative": Summe seit start_date
+        if modus == "cumulative":
+            prefix_summe, prefix_anzahl = self._location_aggregate(attribut)
+            return _since(prefix_summe, prefix_anzahl, laender, tage, self.day_range(start_date, start_date)[0])
+        return self._window_raster("location", attribut, modus, fenster)[laender, tage]
+
+    def day_range(self, start_date, end_date):
+        #Tages-Indizes [von, bis) des gewählten Zeitraums
+        von = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start_date), "D"), side="left")
+        bis = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end_date), "D"), side="right")
+        return von, bis
+
+    def _names(self, column, codes):
+        return self.dataset.catalog.label(column, codes)
+
+    def _mittelwert(self, prefix_summe, prefix_anzahl, gruppen, von, bis):
+        anzahl = prefix_anzahl[gruppen, bis] - prefix_anzahl[gruppen, von]
+        summe = prefix_summe[gruppen, bis] - prefix_summe[gruppen, von]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(anzahl > 0, summe / np.maximum(anzahl, 1), np.nan)
+
+    def _intervals(self, stufe, von, bis):
+        #Perioden der Stufe im Zeitraum (Tage [von, bis)): Grenzen auf den Zeitraum beschnitten und Startdatum
+        grenzen, anfang = self.periods[stufe]
+        if bis <= von:
+            return grenzen[:0], grenzen[:0], anfang[:0]
+        erste = np.searchsorted(grenzen, von, side="right") - 1
+        letzte = np.searchsorted(grenzen, bis, side="left")
+        unten = np.maximum(grenzen[erste:letzte], von)
+        oben = np.minimum(grenzen[erste + 1:letzte + 1], bis)
+        return unten, oben, anfang[erste:letzte]
+
+    def location_per_interval(self, column, values, start_date, end_date, attributes=None, stufe="week"):
+        #Mittelwert pro Land und Woche bzw. Monat (Spalten wie Dataset.location_per_day,
+        #Datum: erster Tag der Periode), nur Perioden mit Zeilen des Landes
+        von, bis = self.day_range(start_date, end_date)
+        unten, oben, anfang = self._intervals(stufe, von, bis)
+        laender = self.dataset.locations(column, values)
+        zeilen = self.location_rows[laender]
+        land, periode = np.nonzero(zeilen[:, oben] > zeilen[:, unten])
+        laender, unten, oben = laender[land], unten[periode], oben[periode]
+
+        data = {
+            "iso_code": self._names("iso_code", self.location_iso_code[laender]),
+            "continent": self._names("continent", self.location_continent[laender]),
+            "location": self._names("location", laender),
+            "date": anfang[periode].astype("datetime64[ns]"),
+        }
+        for attribut in _unique(attributes or self.attributes):
+            prefix_summe, prefix_anzahl = self._location_aggregate(attribut)
+            data[attribut] = self._mittelwert(prefix_summe, prefix_anzahl, laender, unten, oben)
+        return pd.DataFrame(data)[[name for name in self.dataset.projection(attributes) if name in data]]
+
+    def continent_per_interval(self, values, start_date, end_date, attributes=None, stufe="week"):
+        #Mittelwert pro Kontinent und Woche bzw. Monat über alle Zeilen der Periode
+        von, bis = self.day_range(start_date, end_date)
+        unten, oben, anfang = self._intervals(stufe, von, bis)
+        kontinente = self.dataset.codes("continent", values)
+        zeilen = self.continent_rows[kontinente]
+        gruppe, periode = np.nonzero(zeilen[:, oben] > zeilen[:, unten])
+        kontinente, unten, oben = kontinente[gruppe], unten[periode], oben[periode]
+
+        data = {"continent": self._names("continent", kontinente), "date": anfang[periode].astype("datetime64[ns]")}
+        for attribut in _unique(attributes or self.attributes):
+            _, _, prefix_summe, prefix_anzahl = self._continent[attribut]
+            data[attribut] = self._mittelwert(prefix_summe, prefix_anzahl, kontinente, unten, oben)
+        return pd.DataFrame(data).sort_values(["continent", "date"], ignore_index=True)
+
+    def location_per_period(self, column, values, start_date, end_date, attributes=None, by=("location",)):
+        #Mittelwert pro Land über den Zeitraum (wie groupby(by).mean())
+        von, bis = self.day_range(start_date, end_date)
+        laender = self.dataset.locations(column, values)
+        laender = laender[self.location_rows[laender, bis] > self.location_rows[laender, von]]
+
+        data = {
+            "iso_code": self._names("iso_code", self.location_iso_code[laender]),
+            "continent": self._names("continent", self.location_continent[laender]),
+            "location": self._names("location", laender),
+        }
+        for attribut in _unique(attributes or self.attributes):
+            prefix_summe, prefix_anzahl = self._location_aggregate(attribut)
+            data[attribut] = self._mittelwert(prefix_summe, prefix_anzahl, laender, von, bis)
+        return pd.DataFrame(data).sort_values(list(by), ignore_index=True)
+
+    def location_ranking(self, column, values, start_date, end_date, attribute, n=10, order="top"):
+        #Die n Länder der Auswahl mit dem höchsten (top) bzw. tiefsten (bottom) Mittelwert von
+        #attribute im Zeitraum, nach Rang sortiert (Spalten wie location_per_period)
+        von, bis = self.day_range(start_date, end_date)
+        laender = self.dataset.locations(column, values)
+        prefix_summe, prefix_anzahl = self._location_aggregate(attribute)
+        werte = self._mittelwert(prefix_summe, prefix_anzahl, laender, von, bis)
+        rang = _rank(werte, n, order)
+        laender = laender[rang]
+        return pd.DataFrame({
+            "iso_code": self._names("iso_code", self.location_iso_code[laender]),
+            "continent": self._names("continent", self.location_continent[laender]),
+            "location": self._names("location", laender),
+            attribute: werte[rang],
+        })
+
+    def continent_per_period(self, values, start_date, end_date, attributes=None):
+        #Mittelwert pro Kontinent über alle Zeilen des Zeitraums (wie groupby(["continent"]).mean())
+        von, bis = self.day_range(start_date, end_date)
+        kontinente = self.dataset.codes("continent", values)
+        kontinente = kontinente[self.continent_rows[kontinente, bis] > self.continent_rows[kontinente, von]]
+
+        data = {"continent": self._names("continent", kontinente)}
+        for attribut in _unique(attributes or self.attributes):
+            _, _, prefix_summe, prefix_anzahl = self._continent[attribut]
+            data[attribut] = self._mittelwert(prefix_summe, prefix_anzahl, kontinente, von, bis)
+        return pd.DataFrame(data).sort_values(["continent"], ignore_index=True)
+
+    def continent_per_day(self, values, start_date, end_date, attributes=None, smoothing="off", window=7):
+        #Tagesmittel pro Kontinent (wie groupby(["continent", "date"]).mean()), mit smoothing
+        #gleitende Werte der Tagesmittel über window Tage (siehe _window)
+        von, bis = self.day_range(start_date, end_date)
+        kontinente = self.dataset.codes("continent", values)
+        vorhanden = self.continent_rows_per_day[kontinente, von:bis] > 0
+        gruppe, tag = np.nonzero(vorhanden)
+
+        data = {
+            "continent": self._names("continent", kontinente[gruppe]),
+            "date": self.dates[von:bis][tag].astype("datetime64[ns]"),
+        }
+        for attribut in _unique(attributes or self.attributes):
+            if smoothing == "cumulative":
+                prefix_summe, prefix_anzahl = self._continent_daily(attribut)
+                data[attribut] = _since(prefix_summe, prefix_anzahl, kontinente[gruppe], von + tag, von)
+                continue
+            if smoothing != "off":
+                data[attribut] = self._window_raster("continent", attribut, smoothing, window)[kontinente[gruppe],
+                                                                                             von + tag]
+                continue
+            summe, anzahl = self._continent[attribut][:2]
+            summe = summe[kontinente, von:bis][vorhanden]
+            anzahl = anzahl[kontinente, von:bis][vorhanden]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                data[attribut] = np.where(anzahl > 0, summe / np.maximum(anzahl, 1), np.nan)
+        return pd.DataFrame(data).sort_values(["continent", "date"], ignore_index=True)
@@ -0,0 +1,865 @@
+/*
+ * Diagramme aus den Tagesreihen im Browser zeichnen (siehe series.py).
+ *
+ * Nach einer Änderung der Auswahl oder der Diagramme schickt der Server die
+ * Tageswerte der ausgewählten Länder einmal in den Store "tagesreihen". Ein
+ * neuer Zeitraum wird danach hier gezeichnet, ohne Request an den Server:
+ * Tage per Binärsuche auswählen, Mittelwerte aus Präfixsummen wie der Cube
+ * (aggregates.py), Ausdünnen wie decimation.minmax und Figuren wie
+ * figures.py. Wochen- und Monatsmittel (Auflösung) sind Differenzen derselben
+ * Präfixsummen an den Grenzen der Perioden. Die Rechenschritte entsprechen
+ * denen des Servers, die Werte sind dieselben.
+ *
+ * Die Stores "diagramm-figur" enthalten die Beschreibung jedes Diagramms
+ * ({diagram: ...}). Ohne Tagesreihen (grosse Auswahl, Tabs nur mit
+ * Mittelwerten über den Zeitraum) zeichnet der Server; die Stores enthalten
+ * dann die Figuren, die nur übernommen werden.
+ */
+window.dash_clientside = window.dash_clientside || {};
+window.dash_clientside.covidiagrams = (function () {
+    var TAG_MS = 86400000;
+    var TYPEN = {float32: Float32Array, float64: Float64Array, int32: Int32Array};
+    //Dekodierte Tagesreihen des zuletzt gezeichneten Stores
+    var letzte = {key: null, daten: null};
+
+    function tag(datum) {
+        //Tage seit 1970 eines Datums "YYYY-MM-DD" (Uhrzeit wird ignoriert)
+        return Math.floor(Date.parse(String(datum).slice(0, 10)) / TAG_MS);
+    }
+
+    function datum(tage) {
+        return new Date(tage * TAG_MS).toISOString().slice(0, 10);
+    }
+
+    function periode(tage, stufe) {
+        //Nummer der Woche (ab Montag) bzw. des Monats eines Tages (wie aggregates.periods)
+        if (stufe === "week") {
+            return Math.floor((tage + 3) / 7);
+        }
+        if (stufe === "month") {
+            var d = new Date(tage * TAG_MS);
+            return (d.getUTCFullYear() - 1970) * 12 + d.getUTCMonth();
+        }
+        return tage;
+    }
+
+    function periode_start(nummer, stufe) {
+        //Erster Tag einer Periode (wie aggregates.period_start)
+        if (stufe === "week") {
+            return nummer * 7 - 3;
+        }
+        if (stufe === "month") {
+            return Date.UTC(1970 + Math.floor(nummer / 12), ((nummer % 12) + 12) % 12, 1) / TAG_MS;
+        }
+        return nummer;
+    }
+
+    //----------------
+    // Dekodieren
+    //----------------
+    function array(eintrag) {
+        //{"dtype": ..., "bdata": base64} als Typed Array
+        var roh = atob(eintrag.bdata), bytes = new Uint8Array(roh.length);
+        for (var i = 0; i < roh.length; i++) {
+            bytes[i] = roh.charCodeAt(i);
+        }
+        return new TYPEN[eintrag.dtype](bytes.buffer);
+    }
+
+    function rint(x) {
+        //Auf eine ganze Zahl runden wie np.rint (bei .5 zur geraden Zahl)
+        var r = Math.round(x);
+        return (r - x === 0.5 && r % 2 !== 0) ? r - 1 : r;
+    }
+
+    function spalte(eintrag, n) {
+        //Zahlenspalte als Float64Array mit NaN für fehlende Werte (wie storage.load)
+        var werte = array(eintrag), ergebnis = new Float64Array(n), i;
+        var faktor = Math.pow(10, eintrag.decimals);
+        var wert = eintrag.decimals === undefined ? function (x) { return x; }
+                                                  : function (x) { return rint(x * faktor) / faktor; };
+        if (eintrag.index) {
+            var index = array(eintrag.index);
+            ergebnis.fill(NaN);
+            for (i = 0; i < index.length; i++) {
+                ergebnis[index[i]] = wert(werte[i]);
+            }
+        } else {
+            for (i = 0; i < n; i++) {
+                ergebnis[i] = wert(werte[i]);
+            }
+        }
+        return ergebnis;
+    }
+
+    function dekodieren(reihen) {
+        //Spalten eines Stores, pro Schlüssel (Datenstand und Auswahl) nur einmal dekodiert
+        if (letzte.key === reihen.key) {
+            return letzte.daten;
+        }
+        var orte = reihen.locations, laender = [], n = 0;
+        for (var i = 0; i < orte.name.length; i++) {
+            laender.push({name: orte.name[i], continent: orte.continent[i], iso_code: orte.iso_code[i],
+                          code: orte.code[i], von: n, bis: n + orte.rows[i]});
+            n += orte.rows[i];
+        }
+        var daten = {laender: laender, kontinente: reihen.continents, n: n, tag: array(reihen.date),
+                     spalten: {}, praefix: {}, raster: null};
+        Object.keys(reihen.columns).forEach(function (name) {
+            daten.spalten[name] = spalte(reihen.columns[name], n);
+        });
+        letzte = {key: reihen.key, daten: daten};
+        return daten;
+    }
+
+    //----------------
+    // Auswahl und Mittelwerte
+    //----------------
+    function suche(werte, a, b, x) {
+        //Erste Position in [a, b) mit werte >= x
+        while (a < b) {
+            var m = (a + b) >> 1;
+            if (werte[m] < x) {
+                a = m + 1;
+            } else {
+                b = m;
+            }
+        }
+        return a;
+    }
+
+    function tabelle(namen) {
+        var df = {laenge: 0, spalten: {}};
+        namen.forEach(function (name) { df.spalten[name] = []; });
+        return df;
+    }
+
+    function praefix(daten, attribut) {
+        //Summe und Anzahl gültiger Werte pro Land bis einschliesslich jeder Zeile
+        if (!daten.praefix[attribut]) {
+            var werte = daten.spalten[attribut], summe = new Float64Array(daten.n), anzahl = new Int32Array(daten.n);
+            daten.laender.forEach(function (land) {
+                var s = 0, z = 0;
+                for (var i = land.von; i < land.bis; i++) {
+                    if (werte[i] === werte[i]) {
+                        s += werte[i];
+                        z += 1;
+                    }
+                    summe[i] = s;
+                    anzahl[i] = z;
+                }
+            });
+            daten.praefix[attribut] = {summe: summe, anzahl: anzahl};
+        }
+        return daten.praefix[attribut];
+    }
+
+    function mittelwert(summe, anzahl) {
+        return anzahl > 0 ? summe / anzahl : NaN;
+    }
+
+    function vergleich(spalten) {
+        //Sortierung nach mehreren Textspalten (wie sort_values)
+        return function (a, b) {
+            for (var i = 0; i < spalten.length; i++) {
+                if (a[spalten[i]] < b[spalten[i]]) {
+                    return -1;
+                }
+                if (a[spalten[i]] > b[spalten[i]]) {
+                    return 1;
+                }
+            }
+            return 0;
+        };
+    }
+
+    function raster(daten) {
+        //Zeilen pro Kontinent und Tag; Kontinente in der Reihenfolge der Auswahl,
+        //Tage vom ersten bis zum letzten Tag der Tagesreihen
+        if (!daten.raster) {
+            var erster = Infinity, letzter = -Infinity, i;
+            for (i = 0; i < daten.n; i++) {
+                erster = Math.min(erster, daten.tag[i]);
+                letzter = Math.max(letzter, daten.tag[i]);
+            }
+            if (!daten.n) {
+                erster = letzter = 0;
+            }
+            var tage = daten.n ? letzter - erster + 1 : 0, nummer = Object.create(null);
+            daten.kontinente.forEach(function (name, k) { nummer[name] = k; });
+            //Länder in der Reihenfolge der Zeilen im Snapshot: Summen in derselben Reihenfolge wie np.bincount
+            var laender = daten.laender.filter(function (land) { return land.continent in nummer; });
+            laender.sort(function (a, b) { return a.code - b.code; });
+            var zeilen = new Int32Array(daten.kontinente.length * tage);
+            laender.forEach(function (land) {
+                for (var i = land.von; i < land.bis; i++) {
+                    zeilen[nummer[land.continent] * tage + daten.tag[i] - erster] += 1;
+                }
+            });
+            daten.raster = {erster: erster, tage: tage, nummer: nummer, laender: laender, zeilen: zeilen,
+                            praefix: prefixe(zeilen, daten.kontinente.length, tage), attribute: {}};
+        }
+        return daten.raster;
+    }
+
+    function prefixe(werte, gruppen, tage) {
+        //Präfixsummen pro Gruppe mit führender Null (wie aggregates._prefix)
+        var ergebnis = new Float64Array(gruppen * (tage + 1));
+        for (var g = 0; g < gruppen; g++) {
+            var s = 0;
+            for (var t = 0; t < tage; t++) {
+                s += werte[g * tage + t];
+                ergebnis[g * (tage + 1) + t + 1] = s;
+            }
+        }
+        return ergebnis;
+    }
+
+    function kontinent_summen(daten, attribut) {
+        //Summe und Anzahl gültiger Werte pro Kontinent und Tag, mit Präfixsummen
+        var r = raster(daten);
+        if (!r.attribute[attribut]) {
+            var werte = daten.spalten[attribut], gruppen = daten.kontinente.length;
+            var summe = new Float64Array(gruppen * r.tage), anzahl = new Int32Array(gruppen * r.tage);
+            r.laender.forEach(function (land) {
+                var basis = r.nummer[land.continent] * r.tage - r.erster;
+                for (var i = land.von; i < land.bis; i++) {
+                    if (werte[i] === werte[i]) {
+                        summe[basis + daten.tag[i]] += werte[i];
+                        anzahl[basis + daten.tag[i]] += 1;
+                    }
+                }
+            });
+            r.attribute[attribut] = {summe: summe, anzahl: anzahl, praefix_summe: prefixe(summe, gruppen, r.tage),
+                                     praefix_anzahl: prefixe(anzahl, gruppen, r.tage)};
+        }
+        return r.attribute[attribut];
+    }
+
+    function Auswahl(daten, von, bis, attribute) {
+        //Wie diagrams.Selection: Tabellen des Zeitraums [von, bis] (Tagesnummern), je einmal berechnet
+        this.daten = daten;
+        this.von = von;
+        this.bis = bis;
+        this.attribute = attribute;
+        this.tabellen = {};
+    }
+
+    Auswahl.prototype.tabelle = function (name, funktion) {
+        if (!(name in this.tabellen)) {
+            this.tabellen[name] = funktion.call(this);
+        }
+        return this.tabellen[name];
+    };
+
+    Auswahl.prototype.zeilen = function (land) {
+        //Zeilen [a, b) eines Landes im Zeitraum
+        var tage = this.daten.tag;
+        return [suche(tage, land.von, land.bis, this.von), suche(tage, land.von, land.bis, this.bis + 1)];
+    };
+
+    Auswahl.prototype.tage = function (r) {
+        //Tage [a, b) des Zeitraums im Raster der Kontinente
+        return [Math.max(0, Math.min(r.tage, this.von - r.erster)), Math.max(0, Math.min(r.tage, this.bis - r.erster + 1))];
+    };
+
+    Auswahl.prototype.location_per_day = function () {
+        //Werte pro Land und Tag, Länder alphabetisch
+        return this.tabelle("location_per_day", function () {
+            var daten = this.daten, attribute = this.attribute, self = this;
+            var df = tabelle(["location", "continent", "date"].concat(attribute));
+            daten.laender.forEach(function (land) {
+                var b = self.zeilen(land);
+                for (var i = b[0]; i < b[1]; i++) {
+                    df.spalten.location.push(land.name);
+                    df.spalten.continent.push(land.continent);
+                    df.spalten.date.push(datum(daten.tag[i]));
+                    for (var j = 0; j < attribute.length; j++) {
+                        df.spalten[attribute[j]].push(daten.spalten[attribute[j]][i]);
+                    }
+                }
+                df.laenge += b[1] - b[0];
+            });
+            return df;
+        });
+    };
+
+    Auswahl.prototype.location_per_period = function (by) {
+        //Mittelwert pro Land über den Zeitraum, nach by sortiert
+        by = by || ["location"];
+        return this.tabelle("location_per_period:" + by.join(","), function () {
+            var daten = this.daten, attribute = this.attribute, self = this, zeilen = [];
+            daten.laender.forEach(function (land) {
+                var b = self.zeilen(land);
+                if (b[1] <= b[0]) {
+                    return;
+                }
+                var zeile = {iso_code: land.iso_code, continent: land.continent, location: land.name};
+                attribute.forEach(function (attribut) {
+                    var p = praefix(daten, attribut), a = b[0] - 1, e = b[1] - 1;
+                    var summe = p.summe[e] - (a >= land.von ? p.summe[a] : 0);
+                    var anzahl = p.anzahl[e] - (a >= land.von ? p.anzahl[a] : 0);
+                    zeile[attribut] = mittelwert(summe, anzahl);
+                });
+                zeilen.push(zeile);
+            });
+            zeilen.sort(vergleich(by));
+            return aus_zeilen(zeilen, ["iso_code", "continent", "location"].concat(attribute));
+        });
+    };
+
+    Auswahl.prototype.continent_per_period = function () {
+        //Mittelwert pro Kontinent über alle Zeilen des Zeitraums
+        return this.tabelle("continent_per_period", function () {
+            var daten = this.daten, attribute = this.attribute, r = raster(daten), t = this.tage(r), zeilen = [];
+            daten.kontinente.forEach(function (name, k) {
+                var a = k * (r.tage + 1) + t[0], e = k * (r.tage + 1) + t[1];
+                if (!(r.praefix[e] > r.praefix[a])) {
+                    return;
+                }
+                var zeile = {continent: name};
+                attribute.forEach(function (attribut) {
+                    var s = kontinent_summen(daten, attribut);
+                    zeile[attribut] = mittelwert(s.praefix_summe[e] - s.praefix_summe[a],
+                                                 s.praefix_anzahl[e] - s.praefix_anzahl[a]);
+                });
+                zeilen.push(zeile);
+            });
+            zeilen.sort(vergleich(["continent"]));
+            return aus_zeilen(zeilen, ["continent"].concat(attribute));
+        });
+    };
+
+    Auswahl.prototype.location_per_interval = function (stufe) {
+        //Mittelwert pro Land und Woche bzw. Monat, Datum: erster Tag der Periode
+        return this.tabelle("location_per_interval:" + stufe, function () {
+            var daten = this.daten, attribute = this.attribute, self = this;
+            var prefixe = attribute.map(function (attribut) { return praefix(daten, attribut); });
+            var df = tabelle(["location", "continent", "date"].concat(attribute));
+            daten.laender.forEach(function (land) {
+                var b = self.zeilen(land);
+                for (var i = b[0]; i < b[1];) {
+                    //Zeilen [i, e) derselben Periode
+                    var nummer = periode(daten.tag[i], stufe), e = i + 1;
+                    while (e < b[1] && periode(daten.tag[e], stufe) === nummer) {
+                        e++;
+                    }
+                    df.spalten.location.push(land.name);
+                    df.spalten.continent.push(land.continent);
+                    df.spalten.date.push(datum(periode_start(nummer, stufe)));
+                    prefixe.forEach(function (p, j) {
+                        var a = i - 1, z = e - 1;
+                        df.spalten[attribute[j]].push(mittelwert(p.summe[z] - (a >= land.von ? p.summe[a] : 0),
+                                                                 p.anzahl[z] - (a >= land.von ? p.anzahl[a] : 0)));
+                    });
+                    df.laenge += 1;
+                    i = e;
+                }
+            });
+            return df;
+        });
+    };
+
+    Auswahl.prototype.continent_per_interval = function (stufe) {
+        //Mittelwert pro Kontinent und Woche bzw. Monat über alle Zeilen der Periode
+        return this.tabelle("continent_per_interval:" + stufe, function () {
+            var daten = this.daten, attribute = this.attribute, r = raster(daten), t = this.tage(r);
+            var summen = attribute.map(function (attribut) { return kontinent_summen(daten, attribut); });
+            var reihenfolge = daten.kontinente.map(function (name, k) { return {continent: name, k: k}; });
+            reihenfolge.sort(vergleich(["continent"]));
+            var df = tabelle(["continent", "date"].concat(attribute));
+            reihenfolge.forEach(function (eintrag) {
+                var basis = eintrag.k * (r.tage + 1);
+                for (var tag = t[0]; tag < t[1];) {
+                    //Tage [tag, e) derselben Periode
+                    var nummer = periode(r.erster + tag, stufe), e = tag + 1;
+                    while (e < t[1] && periode(r.erster + e, stufe) === nummer) {
+                        e++;
+                    }
+                    if (r.praefix[basis + e] > r.praefix[basis + tag]) {
+                        df.spalten.continent.push(eintrag.continent);
+                        df.spalten.date.push(datum(periode_start(nummer, stufe)));
+                        summen.forEach(function (s, j) {
+                            df.spalten[attribute[j]].push(mittelwert(
+                                s.praefix_summe[basis + e] - s.praefix_summe[basis + tag],
+                                s.praefix_anzahl[basis + e] - s.praefix_anzahl[basis + tag]));
+                        });
+                        df.laenge += 1;
+                    }
+                    tag = e;
+                }
+            });
+            return df;
+        });
+    };
+
+    Auswahl.prototype.continent_per_day = function () {
+        //Tagesmittel pro Kontinent, nach Kontinent und Datum sortiert
+        return this.tabelle("continent_per_day", function () {
+            var daten = this.daten, attribute = this.attribute, r = raster(daten), t = this.tage(r);
+            var summen = attribute.map(function (attribut) { return kontinent_summen(daten, attribut); });
+            var reihenfolge = daten.kontinente.map(function (name, k) { return {continent: name, k: k}; });
+            reihenfolge.sort(vergleich(["continent"]));
+            var df = tabelle(["continent", "date"].concat(attribute));
+            reihenfolge.forEach(function (eintrag) {
+                for (var tag = t[0]; tag < t[1]; tag++) {
+                    var zelle = eintrag.k * r.tage + tag;
+                    if (r.zeilen[zelle] > 0) {
+                        df.spalten.continent.push(eintrag.continent);
+                        df.spalten.date.push(datum(r.erster + tag));
+                        attribute.forEach(function (attribut, j) {
+                            df.spalten[attribut].push(mittelwert(summen[j].summe[zelle], summen[j].anzahl[zelle]));
+                        });
+                        df.laenge += 1;
+                    }
+                }
+            });
+            return df;
+        });
+    };
+
+    function aus_zeilen(zeilen, namen) {
+        var df = tabelle(namen);
+        zeilen.forEach(function (zeile) {
+            namen.forEach(function (name) { df.spalten[name].push(zeile[name]); });
+        });
+        df.laenge = zeilen.length;
+        return df;
+    }
+
+    function nehmen(df, zeilen) {
+        //Zeilen einer Tabelle
+        var ergebnis = {laenge: zeilen.length, spalten: {}};
+        Object.keys(df.spalten).forEach(function (name) {
+            var werte = df.spalten[name];
+            ergebnis.spalten[name] = zeilen.map(function (i) { return werte[i]; });
+        });
+        return ergebnis;
+    }
+
+    //----------------
+    // Ausdünnen (wie decimation.py)
+    //----------------
+    function serien(keys) {
+        //[Start, Länge] der zusammenhängenden Serien
+        var ergebnis = [];
+        for (var i = 0; i < keys.length; i++) {
+            if (i === 0 || keys[i] !== keys[i - 1]) {
+                ergebnis.push([i, 0]);
+            }
+            ergebnis[ergebnis.length - 1][1] += 1;
+        }
+        return ergebnis;
+    }
+
+    function minmax(keys, y, punkte, behalten) {
+        //Pro Serie und Abschnitt Minimum und Maximum von y (bei gleichen Werten
+        //die erste bzw. letzte Zeile), ohne gültigen Wert die erste Zeile
+        var n_abschnitte = Math.max(Math.floor(punkte / 2), 1);
+        serien(keys).forEach(function (serie) {
+            var start = serie[0], laenge = serie[1], kurz = laenge <= punkte;
+            var zellen = kurz ? laenge : n_abschnitte;
+            var erste = new Int32Array(zellen).fill(-1), klein = new Int32Array(zellen).fill(-1);
+            var gross = new Int32Array(zellen).fill(-1);
+            for (var p = 0; p < laenge; p++) {
+                var zelle = kurz ? p : Math.floor(p * n_abschnitte / laenge), i = start + p, wert = y[i];
+                if (erste[zelle] < 0) {
+                    erste[zelle] = i;
+                }
+                if (wert === wert) {
+                    if (klein[zelle] < 0 || wert < y[klein[zelle]]) {
+                        klein[zelle] = i;
+                    }
+                    if (gross[zelle] < 0 || wert >= y[gross[zelle]]) {
+                        gross[zelle] = i;
+                    }
+                }
+            }
+            for (var z = 0; z < zellen; z++) {
+                if (klein[z] >= 0) {
+                    behalten[klein[z]] = 1;
+                    behalten[gross[z]] = 1;
+                } else if (erste[z] >= 0) {
+                    behalten[erste[z]] = 1;
+                }
+            }
+            behalten[start] = 1;
+            behalten[start + laenge - 1] = 1;
+        });
+    }
+
+    function decimate(df, group, columns, points, method) {
+        //Tabelle (nach Serie und Datum sortiert) auf etwa points Punkte pro Serie reduzieren
+        if (method === "off" || !points || df.laenge === 0) {
+            return df;
+        }
+        var behalten = new Uint8Array(df.laenge);
+        columns.filter(function (name, i) { return columns.indexOf(name) === i; }).forEach(function (name) {
+            minmax(df.spalten[group], df.spalten[name], points, behalten);
+        });
+        var zeilen = [];
+        for (var i = 0; i < df.laenge; i++) {
+            if (behalten[i]) {
+                zeilen.push(i);
+            }
+        }
+        return zeilen.length === df.laenge ? df : nehmen(df, zeilen);
+    }
+
+    //----------------
+    // Figuren (wie figures.py)
+    //----------------
+    function gruppen(keys) {
+        //[[Name, Zeilen]] in der Reihenfolge des ersten Auftretens
+        var ergebnis = [], nummer = Object.create(null);
+        for (var i = 0; i < keys.length; i++) {
+            if (!(keys[i] in nummer)) {
+                nummer[keys[i]] = ergebnis.length;
+                ergebnis.push([keys[i], []]);
+            }
+            ergebnis[nummer[keys[i]]][1].push(i);
+        }
+        return ergebnis;
+    }
+
+    function werte(spalte, zeilen) {
+        return zeilen.map(function (i) { return spalte[i]; });
+    }
+
+    function layout(art, x, y, legende, sonstige) {
+        if (art === "treemap") {
+            return {legend: {tracegroupgap: 0}, margin: {t: 60}};
+        }
+        if (art === "choropleth") {
+            return {geo: {domain: {x: [0.0, 1.0], y: [0.0, 1.0]}, center: {}},
+                    coloraxis: {colorbar: {title: {text: sonstige}}},
+                    legend: {tracegroupgap: 0}, margin: {t: 60}};
+        }
+        var ergebnis = {xaxis: {anchor: "y", domain: [0.0, 1.0], title: {text: x}},
+                        yaxis: {anchor: "x", domain: [0.0, 1.0], title: {text: y}},
+                        legend: legende ? {title: {text: legende}, tracegroupgap: 0} : {tracegroupgap: 0},
+                        margin: {t: 60}};
+        if (art === "bar") {
+            ergebnis.barmode = "relative";
+        }
+        return ergebnis;
+    }
+
+    function kopie(wert) {
+        //Eigene Kopie der Vorgaben pro Figur (Plotly ergänzt das Layout beim Zeichnen)
+        return JSON.parse(JSON.stringify(wert));
+    }
+
+    function figur(traces, layout, vorgaben) {
+        layout.template = kopie(vorgaben.template);
+        return {data: traces, layout: layout};
+    }
+
+    function hovertemplate(teile, hover_name) {
+        var text = teile.map(function (teil) { return teil[0] + "=" + teil[1]; }).join("<br>") + "<extra></extra>";
+        return hover_name ? "<b>%{hovertext}</b><br><br>" + text : text;
+    }
+
+    function xy(df, x, y, color, hover_name, hover_data, render_mode, modus, vorgaben) {
+        var traces = gruppen(df.spalten[color]).map(function (gruppe, nummer) {
+            var name = gruppe[0], zeilen = gruppe[1];
+            var farbe = vorgaben.colors[nummer % vorgaben.colors.length];
+            var symbol = vorgaben.symbols[nummer % vorgaben.symbols.length];
+            var teile = [[color, name], [x, "%{x}"], [y, "%{y}"]].concat(hover_data.map(function (spalte, i) {
+                return [spalte, "%{customdata[" + i + "]}"];
+            }));
+            var trace = {hovertemplate: hovertemplate(teile, hover_name), legendgroup: name, name: name,
+                         showlegend: true, x: werte(df.spalten[x], zeilen), xaxis: "x",
+                         y: werte(df.spalten[y], zeilen), yaxis: "y"};
+            if (modus === "lines+markers") {
+                trace.line = {color: farbe, dash: "solid"};
+                trace.marker = {symbol: symbol};
+            } else {
+                trace.marker = {color: farbe, symbol: symbol};
+            }
+            trace.mode = modus;
+            if (render_mode !== "webgl") {
+                trace.orientation = "v";
+            }
+            if (hover_name) {
+                trace.hovertext = werte(df.spalten[hover_name], zeilen);
+            }
+            if (hover_data.length) {
+                trace.customdata = zeilen.map(function (i) {
+                    return hover_data.map(function (spalte) { return df.spalten[spalte][i]; });
+                });
+            }
+            trace.type = render_mode === "webgl" ? "scattergl" : "scatter";
+            return trace;
+        });
+        //Ohne Traces (leere Auswahl) hat die Legende keinen Titel
+        return figur(traces, layout("xy", x, y, traces.length ? color : null), vorgaben);
+    }
+
+    function line(df, x, y, color, hover_name, render_mode, vorgaben) {
+        return xy(df, x, y, color, hover_name, [], render_mode, "lines+markers", vorgaben);
+    }
+
+    function scatter(df, x, y, color, hover_name, hover_data, render_mode, vorgaben) {
+        return xy(df, x, y, color, hover_name, hover_data, render_mode, "markers", vorgaben);
+    }
+
+    function bar(df, x, y, hover_name, vorgaben) {
+        var liste = gruppen(df.spalten[x]);
+        var traces = liste.map(function (gruppe, nummer) {
+            var name = gruppe[0], zeilen = gruppe[1];
+            var trace = {hovertemplate: hovertemplate([[x, "%{x}"], [y, "%{y}"]], hover_name), legendgroup: name,
+                         marker: {color: vorgaben.colors[nummer % vorgaben.colors.length], pattern: {shape: ""}},
+                         name: name, orientation: "v", showlegend: true, textposition: "auto",
+                         x: werte(df.spalten[x], zeilen), xaxis: "x", y: werte(df.spalten[y], zeilen), yaxis: "y"};
+            if (hover_name) {
+                trace.hovertext = werte(df.spalten[hover_name], zeilen);
+            }
+            trace.type = "bar";
+            return trace;
+        });
+        var ergebnis = layout("bar", x, y, traces.length ? x : null);
+        //Balken in der Reihenfolge der Gruppen
+        ergebnis.xaxis.categoryorder = "array";
+        ergebnis.xaxis.categoryarray = liste.map(function (gruppe) { return gruppe[0]; });
+        return figur(traces, ergebnis, vorgaben);
+    }
+
+    function summe(werte) {
+        //Summe wie np.sum (paarweise in Blöcken von 8), damit die Wurzel der Treemap denselben Wert hat
+        var n = werte.length, i;
+        if (n < 8) {
+            var s = 0;
+            for (i = 0; i < n; i++) {
+                s += werte[i];
+            }
+            return s;
+        }
+        if (n <= 128) {
+            var r = werte.slice(0, 8);
+            for (i = 8; i < n - (n % 8); i += 8) {
+                for (var j = 0; j < 8; j++) {
+                    r[j] += werte[i + j];
+                }
+            }
+            var ergebnis = ((r[0] + r[1]) + (r[2] + r[3])) + ((r[4] + r[5]) + (r[6] + r[7]));
+            for (; i < n; i++) {
+                ergebnis += werte[i];
+            }
+            return ergebnis;
+        }
+        var haelfte = Math.floor(n / 2);
+        haelfte -= haelfte % 8;
+        return summe(werte.slice(0, haelfte)) + summe(werte.slice(haelfte));
+    }
+
+    function treemap(df, path, values, colors, root_color, margin, vorgaben) {
+        //path[0] ist die Wurzel, die übrigen Einträge Spalten von der obersten Ebene bis zu den Blättern
+        var zahlen = df.spalten[values].map(function (wert) { return wert === wert ? wert : 0; });
+        var ids = [], labels = [], parents = [], summen = [];
+        for (var ebene = path.length - 1; ebene > 0; ebene--) {
+            var nummer = Object.create(null), anfang = ids.length;
+            for (var i = 0; i < df.laenge; i++) {
+                var pfad = path[0];
+                for (var k = 1; k <= ebene; k++) {
+                    pfad += "/" + df.spalten[path[k]][i];
+                }
+                if (!(pfad in nummer)) {
+                    nummer[pfad] = ids.length - anfang;
+                    ids.push(pfad);
+                    labels.push(df.spalten[path[ebene]][i]);
+                    parents.push(pfad.slice(0, pfad.lastIndexOf("/")));
+                    summen.push(0);
+                }
+                summen[anfang + nummer[pfad]] += zahlen[i];
+            }
+        }
+        if (df.laenge) {
+            ids.push(path[0]);
+            labels.push(path[0]);
+            parents.push("");
+            summen.push(summe(zahlen));
+        }
+        var trace = {branchvalues: "total", domain: {x: [0.0, 1.0], y: [0.0, 1.0]},
+                     hovertemplate: "labels=%{label}<br>" + values + "=%{value}<br>parent=%{parent}<br>id=%{id}<extra></extra>",
+                     ids: ids, labels: labels, name: "", parents: parents, values: summen, type: "treemap"};
+        if (root_color !== null) {
+            trace.root = {color: root_color};
+        }
+        var ergebnis = layout("treemap");
+        ergebnis.treemapcolorway = colors.slice();
+        if (margin !== null) {
+            ergebnis.margin = kopie(margin);
+        }
+        return figur([trace], ergebnis, vorgaben);
+    }
+
+    function choropleth(df, locations, color, hover_name, colorscale, margin, vorgaben) {
+        var trace = {coloraxis: "coloraxis", geo: "geo",
+                     hovertemplate: hovertemplate([[locations, "%{location}"], [color, "%{z}"]], hover_name),
+                     hovertext: df.spalten[hover_name], locations: df.spalten[locations], name: "",
+                     z: df.spalten[color], type: "choropleth"};
+        var ergebnis = layout("choropleth", null, null, null, color);
+        ergebnis.coloraxis.colorscale = kopie(colorscale);
+        ergebnis.coloraxis.autocolorscale = false;
+        if (margin !== null) {
+            ergebnis.margin = kopie(margin);
+        }
+        return figur([trace], ergebnis, vorgaben);
+    }
+
+    //----------------
+    // Diagramme (wie diagrams.render)
+    //----------------
+    function stufe_von(diagram, von, bis) {
+        //Auflösung der Tageswerte im Zeitraum (wie Diagram.resolution)
+        var stufe = diagram.granularity || "day";
+        if (diagram.smoothing !== "off" || stufe === "day") {
+            return "day";
+        }
+        if (stufe !== "auto") {
+            return stufe;
+        }
+        if (!diagram.points || !isFinite(von) || !isFinite(bis)) {
+            return "day";
+        }
+        var stufen = ["day", "week"];
+        for (var i = 0; i < stufen.length; i++) {
+            if (periode(bis, stufen[i]) - periode(von, stufen[i]) + 1 <= diagram.points) {
+                return stufen[i];
+            }
+        }
+        return "month";
+    }
+
+    function label(attribut, stufe, vorgaben) {
+        //Spalte bzw. Achsentitel eines Attributs (wie Diagram.label)
+        return vorgaben.granularities[stufe].replace("%s", attribut);
+    }
+
+    function pro_tag(auswahl, diagram, scope, stufe) {
+        //Tageswerte bzw. Wochen- oder Monatsmittel pro Land oder Kontinent
+        if (stufe !== "day") {
+            return scope === "location" ? auswahl.location_per_interval(stufe) : auswahl.continent_per_interval(stufe);
+        }
+        return scope === "location" ? auswahl.location_per_day() : auswahl.continent_per_day();
+    }
+
+    function per_day(diagram, df, group, stufe, vorgaben) {
+        var spalten = diagram.chart === "3" ? [diagram.x_attribut, diagram.y_attribut] : [diagram.y_attribut];
+        df = decimate(df, group, spalten, diagram.points, diagram.decimation);
+        var umbenennen = spalten.filter(function (spalte) { return label(spalte, stufe, vorgaben) !== spalte; });
+        if (umbenennen.length) {
+            var spalten_neu = {};
+            Object.keys(df.spalten).forEach(function (name) {
+                spalten_neu[umbenennen.indexOf(name) >= 0 ? label(name, stufe, vorgaben) : name] = df.spalten[name];
+            });
+            df = {laenge: df.laenge, spalten: spalten_neu};
+        }
+        return df;
+    }
+
+    function render_mode(df, vorgaben) {
+        return df.laenge > vorgaben.webgl_threshold ? "webgl" : "svg";
+    }
+
+    function render_location(auswahl, diagram, vorgaben) {
+        var y = diagram.y_attribut, x = diagram.x_attribut, df;
+        var stufe = stufe_von(diagram, auswahl.von, auswahl.bis);
+        if (diagram.chart === "1") {
+            df = per_day(diagram, pro_tag(auswahl, diagram, "location", stufe), "location", stufe, vorgaben);
+            return line(df, "date", label(y, stufe, vorgaben), "location", null, render_mode(df, vorgaben), vorgaben);
+        }
+        if (diagram.chart === "2") {
+            return bar(auswahl.location_per_period(), "location", y, null, vorgaben);
+        }
+        if (diagram.x_radio === "on") {
+            df = per_day(diagram, pro_tag(auswahl, diagram, "location", stufe), "location", stufe, vorgaben);
+            return scatter(df, label(x, stufe, vorgaben), label(y, stufe, vorgaben), "location", null, ["date"],
+                           render_mode(df, vorgaben), vorgaben);
+        }
+        return scatter(auswahl.location_per_period(), x, y, "location", null, [], "svg", vorgaben);
+    }
+
+    function render_continent(auswahl, diagram, vorgaben) {
+        var y = diagram.y_attribut, x = diagram.x_attribut, sonstige = diagram.sonstige_attribut, df;
+        var pro_land = diagram.y_radio === "on", gruppe = pro_land ? "location" : "continent";
+        var stufe = stufe_von(diagram, auswahl.von, auswahl.bis);
+        if (diagram.chart === "1") {
+            df = per_day(diagram, pro_tag(auswahl, diagram, gruppe, stufe), gruppe, stufe, vorgaben);
+            return line(df, "date", label(y, stufe, vorgaben), gruppe, pro_land ? "location" : null,
+                        render_mode(df, vorgaben), vorgaben);
+        }
+        if (diagram.chart === "2") {
+            return pro_land ? bar(auswahl.location_per_period(["continent", "location"]), "continent", y, "location", vorgaben)
+                            : bar(auswahl.continent_per_period(), "continent", y, null, vorgaben);
+        }
+        if (diagram.chart === "3") {
+            if (diagram.x_radio === "on") {
+                df = per_day(diagram, pro_tag(auswahl, diagram, gruppe, stufe), gruppe, stufe, vorgaben);
+                return scatter(df, label(x, stufe, vorgaben), label(y, stufe, vorgaben), "continent",
+                               pro_land ? "location" : null, ["date"], render_mode(df, vorgaben), vorgaben);
+            }
+            return pro_land ? scatter(auswahl.location_per_period(["continent", "location"]), x, y, "continent",
+                                      "location", [], "svg", vorgaben)
+                            : scatter(auswahl.continent_per_period(), x, y, "continent", null, [], "svg", vorgaben);
+        }
+        if (diagram.chart === "4") {
+            var t = vorgaben.treemap;
+            return treemap(auswahl.location_per_period(["continent", "location"]), ["Total", "continent", "location"],
+                           sonstige, t.colors, t.root_color, t.margin, vorgaben);
+        }
+        var c = vorgaben.choropleth;
+        return choropleth(auswahl.location_per_period(["iso_code", "location", "continent"]), "iso_code", sonstige,
+                          "location", c.colorscale, c.margin, vorgaben);
+    }
+
+    function attribute(diagram) {
+        if (diagram.chart === "3") {
+            return [diagram.x_attribut, diagram.y_attribut];
+        }
+        if (diagram.chart === "4" || diagram.chart === "5") {
+            return [diagram.sonstige_attribut];
+        }
+        return [diagram.y_attribut];
+    }
+
+    function render(reihen, diagrams, start_date, end_date, vorgaben) {
+        //Figuren aller Diagramme eines Tabs aus den Tagesreihen; die Diagramme teilen sich die Auswahl
+        var daten = dekodieren(reihen), namen = [];
+        diagrams.forEach(function (diagram) {
+            attribute(diagram).forEach(function (name) {
+                if (namen.indexOf(name) < 0) {
+                    namen.push(name);
+                }
+            });
+        });
+        var auswahl = new Auswahl(daten, start_date ? tag(start_date) : -Infinity,
+                                  end_date ? tag(end_date) : Infinity, namen);
+        return diagrams.map(function (diagram) {
+            return diagram.scope === "location" ? render_location(auswahl, diagram, vorgaben)
+                                                : render_continent(auswahl, diagram, vorgaben);
+        });
+    }
+
+    return {
+        render: render,
+
+        zeitraum: function (start_date, end_date, reihen) {
+            //Neuer Zeitraum für den Server, nur wenn er die Figuren zeichnet
+            return reihen ? window.dash_clientside.no_update : [start_date, end_date];
+        },
+
+        diagramme: function (reihen, figuren, start_date, end_date, vorgaben) {
+            //Figuren der Diagramme: aus den Tagesreihen und Beschreibungen im Browser, sonst die des Servers
+            var diagrams = figuren.map(function (figur) { return figur && figur.diagram; });
+            if (reihen && diagrams.every(Boolean)) {
+                return render(reihen, diagrams, start_date, end_date, vorgaben);
+            }
+            var ausgeloest = window.dash_clientside.callback_context.triggered.some(function (eingabe) {
+                return eingabe.prop_id.indexOf('"diagramm-figur"') >= 0;
+            });
+            return ausgeloest ? figuren : window.dash_clientside.no_update;
+        }
+    };
+})();
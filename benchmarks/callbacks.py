@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Laufzeit der Diagramm-Callbacks pro Diagrammtyp (ohne Figuren-Cache).
+
+Tab 1: Auswahl von 4 Ländern über den ganzen Zeitraum (Diagramm 1).
+Tab 2: Auswahl eines Kontinents über den ganzen Zeitraum (Diagramm 3).
+
+Aufruf:
+    COVIDIAGRAMS_SNAPSHOT=data/owid-snapshot python benchmarks/callbacks.py [--repeat N]
+        [--countries Switzerland Austria Germany Italy] [--continent Europe]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dashboard
+from diagrams import Diagram, render_panels
+
+DIAGRAMME = {"1": "line", "2": "bar", "3": "scatter", "4": "treemap", "5": "choropleth"}
+
+
+def zeichnen(scope, auswahl, start_date, end_date, *argumente):
+    return render_panels(dashboard.store.current, scope, auswahl, start_date, end_date, [Diagram(scope, *argumente)])
+
+
+def messen(funktion, argumente, repeat):
+    funktion(*argumente)
+    zeiten = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        funktion(*argumente)
+        zeiten.append(time.perf_counter() - start)
+    zeiten.sort()
+    return zeiten[len(zeiten) // 2] * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--countries", nargs="+", default=["Switzerland", "Austria", "Germany", "Italy"])
+    parser.add_argument("--continent", nargs="+", default=["Europe"])
+    args = parser.parse_args()
+
+    start_date, end_date = dashboard.store.current.oldest_date, dashboard.store.current.newest_date
+    y, x, sonstige = "new_cases_per_million", "new_deaths_per_million", "new_cases_per_million"
+
+    print("%-32s %10s" % ("Callback", "Median [ms]"))
+    for auswahl in "123":
+        for x_radio in (["on", "off"] if auswahl == "3" else ["on"]):
+            zeit = messen(zeichnen, ("location", args.countries, start_date, end_date, auswahl, y, x, None, x_radio),
+                          args.repeat)
+            name = "diagramm1 %s%s" % (DIAGRAMME[auswahl], " (%s)" % x_radio if auswahl == "3" else "")
+            print("%-32s %10.1f" % (name, zeit))
+    for auswahl in "12345":
+        for y_radio in (["on", "off"] if auswahl in "123" else ["off"]):
+            zeit = messen(zeichnen, ("continent", args.continent, start_date, end_date, auswahl, y, x, sonstige, "off", y_radio),
+                          args.repeat)
+            name = "diagramm3 %s%s" % (DIAGRAMME[auswahl], " (%s)" % y_radio if auswahl in "123" else "")
+            print("%-32s %10.1f" % (name, zeit))
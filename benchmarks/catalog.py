@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Aufbau des Dimensionskatalogs und Öffnen des Datasets.
+
+Verglichen werden:
+    listen      Länder- und Kontinentliste per Schleife mit "if i not in liste",
+                Datumsgrenzen per min/max über die Datums-Strings (bisheriger
+                Import des Dashboards)
+    katalog     Catalog aus den Integer-Codes in einem vektorisierten Durchgang
+                (inkl. Kontinent, ISO-Code, erstem/letztem Datum und
+                Zeilenbereich jedes Landes)
+
+Zusätzlich: Zeit und Speicher (tracemalloc) für das Öffnen des ganzen Datasets
+inklusive Katalog und vorberechneter Aggregate.
+
+Aufruf:
+    python benchmarks/catalog.py [SNAPSHOT] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot
+from catalog import Catalog
+from dataset import Dataset
+
+
+def messen(funktion, repeat):
+    funktion()
+    zeiten = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    return min(zeiten) * 1000
+
+
+def listen(df):
+    location_list = []
+    for i in df['location'].tolist():
+        if i not in location_list:
+            location_list.append(i)
+    continent_list = []
+    for i in df['continent'].tolist():
+        if i not in continent_list:
+            continent_list.append(i)
+    date_column = df['date'].tolist()
+    return location_list, continent_list, min(date_column), max(date_column)
+
+
+def speicher(funktion):
+    #Speicher, der nach dem Aufruf belegt bleibt, und Spitze während des Aufrufs
+    tracemalloc.start()
+    ergebnis = funktion()
+    aktuell, spitze = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ergebnis
+    return aktuell / 2 ** 20, spitze / 2 ** 20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=snapshot.DEFAULT_PATH)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dataset = Dataset(args.path)
+    #DataFrame wie bisher: Text-Spalten und Datum als String
+    df, _ = snapshot.read_snapshot(args.path)
+    df = df.astype({"continent": object, "location": object})
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    spalten = dataset.columns
+
+    def katalog():
+        return Catalog(dataset.categories, spalten["location"], spalten["continent"],
+                       spalten["iso_code"], spalten["date"])
+
+    print("%-30s %10s %12s %12s" % ("", "Zeit [ms]", "belegt [MB]", "Spitze [MB]"))
+    for name, funktion in [("listen", lambda: listen(df)), ("katalog", katalog),
+                           ("Dataset öffnen", lambda: Dataset(args.path))]:
+        zeit = messen(funktion, args.repeat)
+        belegt, spitze = speicher(funktion)
+        print("%-30s %10.1f %12.1f %12.1f" % (name, zeit, belegt, spitze))
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Zeitraum ändern: Figuren vom Server gegenüber Figuren aus den Tagesreihen im
+Browser (series.py, assets/diagrams.js).
+
+Pro Ansicht (Standardansicht der Tabs und grössere Auswahlen) gemessen:
+
+    Tagesreihen     Grösse des Stores, der einmal pro Auswahl geschickt wird
+                    (ohne Kompression, gzip, Brotli)
+    Server          Request des Diagramm-Callbacks für einen neuen Zeitraum
+                    (Flask-Testclient, ohne Figuren-Cache, ohne Netzwerk) und
+                    Grösse der Antwort mit Brotli
+    Browser         Zeichnen der Figuren für einen neuen Zeitraum in Node.js
+                    (dieselbe Datei wie im Browser, ohne Plotly)
+
+Mit Node.js wird ausserdem geprüft, dass die Figuren aus dem Browser denselben
+Inhalt haben wie die des Servers (ohne kompakte Figuren), für alle
+Diagrammtypen, Auflösungen (Tag, Woche, Monat, auto) und mehrere Zeiträume.
+
+Aufruf:
+    COVIDIAGRAMS_SNAPSHOT=data/owid-snapshot python benchmarks/clientside.py [--repeat N] [--node node]
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("COVIDIAGRAMS_CACHE_DIR", "")
+os.environ.setdefault("COVIDIAGRAMS_REFRESH_INTERVAL", "0")
+
+import brotli
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+import dashboard
+import loadtest
+from diagrams import CHARTS, RANKING_CHARTS, Diagram, point_budget, render_panels
+from series import figure_defaults, series_store
+
+Y, X, SONSTIGE = "new_cases_per_million", "new_deaths_per_million", "total_cases_per_million"
+#Name, Bereich, Auswahl und Diagrammtypen der Ansicht
+ANSICHTEN = [
+    ("Tab 1 (3 Länder)", "location", ["Switzerland", "Austria", "Germany"], ["1", "2"]),
+    ("Tab 2 (Europa)", "continent", ["Europe"], ["4", "5"]),
+    ("Tab 1 (8 Länder)", "location", ["Switzerland", "Austria", "Germany", "Italy", "France", "Spain", "Poland",
+                                      "Sweden"], ["1", "3"]),
+    ("Tab 2 (Europa, Linie)", "continent", ["Europe"], ["1", "3"]),
+]
+
+#Figuren aus Node.js: dieselbe Datei wie im Browser, Zeit pro Zeichnen in ms
+NODE = """
+const fs = require("fs");
+global.window = {dash_clientside: {}};
+require(process.argv[1]);
+const ns = window.dash_clientside.covidiagrams;
+const eingabe = JSON.parse(fs.readFileSync(process.argv[2]));
+const ergebnis = eingabe.faelle.map(function (fall) {
+    const figuren = ns.render(fall.reihen, fall.diagrams, fall.start, fall.end, eingabe.vorgaben);
+    const start = process.hrtime.bigint();
+    for (let i = 0; i < eingabe.repeat; i++) {
+        ns.render(fall.reihen, fall.diagrams, fall.start_neu || fall.start, fall.end, eingabe.vorgaben);
+    }
+    return {figuren: figuren, zeit: Number(process.hrtime.bigint() - start) / 1e6 / Math.max(eingabe.repeat, 1)};
+});
+process.stdout.write(JSON.stringify(ergebnis));
+"""
+
+
+def node_rendern(node, faelle, repeat=0):
+    #Figuren (und Zeit pro Zeichnen) aller Fälle in einem Node.js-Prozess
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as datei:
+        json.dump({"faelle": faelle, "vorgaben": figure_defaults(), "repeat": repeat}, datei)
+    try:
+        ausgabe = subprocess.run([node, "-e", NODE, os.path.join(ROOT, "assets", "diagrams.js"), datei.name],
+                                 check=True, stdout=subprocess.PIPE)
+    finally:
+        os.unlink(datei.name)
+    return json.loads(ausgabe.stdout)
+
+
+def normal(wert):
+    #Figur als JSON-Werte: Typed Arrays als Listen, Datum ohne Uhrzeit, NaN als None
+    if isinstance(wert, dict) and "bdata" in wert:
+        werte = np.frombuffer(base64.b64decode(wert["bdata"]), dtype=wert["dtype"])
+        if "shape" in wert:
+            werte = werte.reshape([int(n) for n in str(wert["shape"]).split(",")])
+        return normal(werte.tolist())
+    if isinstance(wert, dict):
+        return {name: normal(element) for name, element in wert.items()}
+    if isinstance(wert, list):
+        return [normal(element) for element in wert]
+    if isinstance(wert, float) and math.isnan(wert):
+        return None
+    if isinstance(wert, str) and len(wert) > 10 and wert[4:5] == "-" and wert[10:11] == "T":
+        return wert[:10]
+    return wert
+
+
+def unterschiede(a, b, pfad="figur"):
+    if isinstance(a, dict) and isinstance(b, dict):
+        if set(a) != set(b):
+            return ["%s: Schlüssel %s" % (pfad, sorted(set(a) ^ set(b)))]
+        return [fehler for name in a for fehler in unterschiede(a[name], b[name], "%s.%s" % (pfad, name))]
+    if isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            return ["%s: Länge %d / %d" % (pfad, len(a), len(b))]
+        return [fehler for i, (x, y) in enumerate(zip(a, b)) for fehler in unterschiede(x, y, "%s[%d]" % (pfad, i))]
+    return [] if a == b else ["%s: %r / %r" % (pfad, a, b)]
+
+
+def diagramme(scope, charts, **einstellungen):
+    return [Diagram(scope, chart, Y, X, SONSTIGE, points=point_budget(1920), decimation="minmax", **einstellungen)
+            for chart in charts]
+
+
+def beschreibungen(liste):
+    #Beschreibung der Diagramme wie in den Stores "diagramm-figur"
+    return [dict(vars(diagram)) for diagram in liste]
+
+
+def pruefen(node, dataset):
+    #Figuren aus dem Browser gegenüber render_panels, alle Diagrammtypen und Zeiträume
+    zeitraeume = [(dataset.oldest_date, dataset.newest_date), ("2021-01-01", "2021-03-31"),
+                  (dataset.newest_date, dataset.newest_date), ("1990-01-01", "1990-02-01")]
+    faelle, erwartet = [], []
+    for name, scope, auswahl, _ in ANSICHTEN:
+        for radios in [{}, {"x_radio": "off"}, {"y_radio": "on"}, {"x_radio": "off", "y_radio": "on"},
+                       {"granularity": "auto"}, {"granularity": "week"}, {"granularity": "month", "y_radio": "on"}]:
+            if scope == "location" and radios.get("y_radio") == "on":
+                continue
+            #Ranglisten zeichnet immer der Server
+            liste = diagramme(scope, [chart for _, chart in CHARTS[scope] if chart not in RANKING_CHARTS], **radios)
+            reihen = series_store(dataset, scope, auswahl, liste, max_values=10 ** 9)
+            for start, end in zeitraeume:
+                faelle.append({"reihen": reihen, "diagrams": beschreibungen(liste), "start": start, "end": end})
+                figuren = render_panels(dataset, scope, auswahl, start, end, liste)
+                erwartet.append(("%s %s %s-%s" % (name, radios, start, end),
+                                 [normal(json.loads(to_json_plotly(fig))) for fig in figuren]))
+    anzahl, fehler = 0, []
+    for (name, figuren), ergebnis in zip(erwartet, node_rendern(node, faelle)):
+        for nummer, (fig, js) in enumerate(zip(figuren, ergebnis["figuren"])):
+            anzahl += 1
+            fehler += ["%s Diagramm %d: %s" % (name, nummer + 1, text) for text in unterschiede(fig, normal(js))]
+    return anzahl, fehler
+
+
+def groessen(daten):
+    roh = json.dumps(daten, separators=(",", ":")).encode()
+    return len(roh), len(gzip.compress(roh, 6)), len(brotli.compress(roh, quality=4))
+
+
+def median(werte):
+    return sorted(werte)[len(werte) // 2]
+
+
+def server_messen(client, scope, auswahl, charts, start, end, repeat):
+    #Request für einen neuen Zeitraum, wenn der Server zeichnet (Median in ms, Bytes mit Brotli)
+    callback = loadtest.diagramm_callbacks(json.loads(client.get("/_dash-dependencies").data))[scope]
+    felder = {}
+    for nummer, chart in enumerate(charts, 1 if scope == "location" else 3):
+        werte = dict(loadtest.STANDARD, chart=chart)
+        for typ, name in dashboard.DIAGRAMM_FELDER[scope]:
+            felder[json.dumps(dashboard.panel_id(typ, scope, nummer), sort_keys=True)] = werte[name]
+    body = loadtest.anfrage_diagramme(callback, auswahl, start, end, felder)
+    zeiten = []
+    for _ in range(repeat):
+        dashboard.figure_cache = dashboard.FigureCache(lambda: dashboard.store.current.version)
+        t = time.perf_counter()
+        antwort = client.post(loadtest.CALLBACK_PATH, json=body, headers={"Accept-Encoding": "br"})
+        zeiten.append(time.perf_counter() - t)
+        assert antwort.status_code == 200, antwort.data[:200]
+    return median(zeiten) * 1000, len(antwort.data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--node", default=shutil.which("node"))
+    args = parser.parse_args()
+
+    dataset = dashboard.store.current
+    client = dashboard.server.test_client()
+    start, end = dataset.oldest_date, dataset.newest_date
+    #Neuer Zeitraum: Start ein Jahr später
+    neu = str(int(start[:4]) + 1) + start[4:]
+
+    dashboard.CLIENT_SERIES = 0
+    print("%-24s %8s %26s %20s %12s" % ("Ansicht", "Werte", "Tagesreihen [Bytes]", "Server", "Browser"))
+    print("%-24s %8s %26s %20s %12s" % ("", "", "ohne / gzip / Brotli", "[ms] / Brotli", "[ms]"))
+    for name, scope, auswahl, charts in ANSICHTEN:
+        liste = diagramme(scope, charts)
+        reihen = series_store(dataset, scope, auswahl, liste, max_values=10 ** 9)
+        zeit, bytes_server = server_messen(client, scope, auswahl, charts, neu, end, args.repeat)
+        if reihen is None:
+            #Nur Mittelwerte über den Zeitraum: zeichnet immer der Server
+            print("%-24s %8s %26s %9.1f / %8d %12s" % (name, "-", "-", zeit, bytes_server, "-"))
+            continue
+        werte = sum(reihen["locations"]["rows"]) * len(reihen["columns"])
+        browser = "-"
+        if args.node:
+            ergebnis, = node_rendern(args.node, [{"reihen": reihen, "diagrams": beschreibungen(liste), "start": start,
+                                                  "start_neu": neu, "end": end}], args.repeat)
+            browser = "%.1f" % ergebnis["zeit"]
+        print("%-24s %8d %26s %9.1f / %8d %12s" % (name, werte, "%d / %d / %d" % groessen(reihen), zeit,
+                                                    bytes_server, browser))
+
+    if not args.node:
+        print("Node.js nicht gefunden, Figuren nicht geprüft")
+        sys.exit(0)
+    anzahl, fehler = pruefen(args.node, dataset)
+    for text in fehler[:20]:
+        print("Unterschied: %s" % text)
+    print("%d Figuren geprüft, %d Unterschiede" % (anzahl, len(fehler)))
+    sys.exit(1 if fehler else 0)
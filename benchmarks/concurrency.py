@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Stresstest für Threads: Callbacks laufen gleichzeitig, während ein weiterer
+Thread laufend den Datenstand wechselt (wie refresh.py im Worker).
+
+Zwei synthetische Snapshots (siehe synthetic.py) mit verschiedenen Werten und
+Zeiträumen werden erzeugt. Für eine feste Folge von Requests (Diagramme und
+Tab-Wechsel wie in loadtest.py) wird zuerst die Antwort für jeden Datenstand
+einzeln berechnet. Danach rufen --threads Threads diese Requests über den
+Flask-Testclient auf (wie Gunicorn mit --threads N), während der Datenstand
+alle --swap-interval Sekunden gewechselt wird. Der Figuren-Cache im Speicher
+ist eingeschaltet und klein, damit Figuren laufend neu berechnet und abgelegt
+werden.
+
+Jede Antwort muss vollständig der Antwort eines Datenstands entsprechen.
+Gezählt werden gemischte Antworten (Diagramme aus beiden Datenständen),
+falsche Antworten und Fehler; zusätzlich wird geprüft, dass die Arrays der
+Datenstände schreibgeschützt sind. Exit-Code 1, wenn etwas davon auftritt.
+
+Aufruf:
+    python benchmarks/concurrency.py [--data /tmp/covidiagrams-synthetic] [--threads 8]
+        [--duration 30] [--swap-interval 0.1]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from types import MappingProxyType
+
+import numpy as np
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+import loadtest
+import synthetic
+
+#Zwei Datenstände: Faktor der Zeilen und Seed
+STAENDE = [(0.3, 1), (0.35, 2)]
+
+
+def arrays(wert):
+    #Alle NumPy-Arrays in Dictionaries, Listen und Tupeln
+    if isinstance(wert, np.ndarray):
+        yield wert
+    elif isinstance(wert, (dict, MappingProxyType)):
+        for element in wert.values():
+            yield from arrays(element)
+    elif isinstance(wert, (list, tuple)):
+        for element in wert:
+            yield from arrays(element)
+
+
+def schreibschutz(dataset):
+    #Fehler beim Versuch, den Datenstand zu ändern (leere Liste: alles schreibgeschützt)
+    fehler = []
+    for teil in (dataset, dataset.catalog, dataset.cube):
+        for name, wert in vars(teil).items():
+            if any(a.flags.writeable for a in arrays(wert)):
+                fehler.append("%s.%s beschreibbar" % (type(teil).__name__, name))
+    try:
+        dataset.version = "anders"
+        fehler.append("Dataset.version beschreibbar")
+    except AttributeError:
+        pass
+    try:
+        dataset.columns["date"] = None
+        fehler.append("Dataset.columns beschreibbar")
+    except TypeError:
+        pass
+    return fehler
+
+
+def antwort(client, body):
+    #Ausgaben einer Antwort als {Ausgabe: JSON-Text}
+    daten = client.post(loadtest.CALLBACK_PATH, json=body, headers={"Accept-Encoding": "identity"})
+    if daten.status_code != 200:
+        raise RuntimeError("Status %d: %s" % (daten.status_code, daten.data[:200]))
+    ausgaben = {}
+    for id, eigenschaften in json.loads(daten.data)["response"].items():
+        for eigenschaft, wert in eigenschaften.items():
+            if isinstance(wert, list) and body["output"].startswith("{"):
+                #ALL-Ausgabe: ein Eintrag pro Diagramm
+                for nummer, element in enumerate(wert):
+                    ausgaben["%s.%s[%d]" % (id, eigenschaft, nummer)] = json.dumps(element, sort_keys=True)
+            else:
+                ausgaben["%s.%s" % (id, eigenschaft)] = json.dumps(wert, sort_keys=True)
+    return ausgaben
+
+
+def pruefen(ausgaben, referenzen):
+    #"ok", "gemischt" (jede Ausgabe passt zu einem Datenstand, aber nicht alle zum selben) oder "falsch"
+    if any(ausgaben == referenz for referenz in referenzen):
+        return "ok"
+    if all(any(referenz.get(name) == wert for referenz in referenzen) for name, wert in ausgaben.items()):
+        return "gemischt"
+    return "falsch"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="/tmp/covidiagrams-synthetic")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--swap-interval", type=float, default=0.1)
+    parser.add_argument("--requests", type=int, default=40, help="verschiedene Requests")
+    parser.add_argument("--cache-entries", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pfade = []
+    for scale, seed in STAENDE:
+        pfad = os.path.join(args.data, "concurrency-%s-%d" % (scale, seed))
+        if not os.path.exists(os.path.join(pfad, "meta.json")):
+            synthetic.generate(pfad, scale, seed)
+        pfade.append(pfad)
+
+    os.environ.update({"COVIDIAGRAMS_SNAPSHOT": pfade[0], "COVIDIAGRAMS_REFRESH_INTERVAL": "0",
+                       "COVIDIAGRAMS_CACHE_DIR": "", "COVIDIAGRAMS_CLIENT_SERIES": "0"})
+    import dashboard
+    from dataset import Dataset
+
+    datasets = [dashboard.store.current, Dataset(pfade[1])]
+    dashboard.figure_cache.max_entries = args.cache_entries
+    client = dashboard.server.test_client()
+
+    #Requests wie in loadtest.py: Diagramme mit wechselnder Auswahl und Tab-Wechsel
+    layout = json.loads(client.get("/_dash-layout").data)
+    tabs = {tab: json.loads(client.post(loadtest.CALLBACK_PATH, json=loadtest.anfrage_tab(tab)).data)
+            ["response"]["card-content"]["children"] for tab in ["tab-1", "tab-2"]}
+    callbacks = loadtest.diagramm_callbacks(json.loads(client.get("/_dash-dependencies").data))
+    mix = loadtest.Mix(layout, tabs, callbacks, args.seed)
+    requests = [body for _, body in (mix.naechste() for _ in range(args.requests))]
+
+    #Referenz: jeder Request für jeden Datenstand einzeln
+    referenzen = []
+    for body in requests:
+        referenz = []
+        for dataset in datasets:
+            dashboard.store.swap(dataset)
+            referenz.append(antwort(client, body))
+        referenzen.append(referenz)
+    unterschiedlich = sum(r[0] != r[1] for r in referenzen)
+    print("%d Requests, %d mit verschiedenen Antworten je Datenstand" % (len(requests), unterschiedlich))
+
+    dashboard.figure_cache._entries.clear()
+    dashboard.tab_layouts.clear()
+    ergebnisse = {"ok": 0, "gemischt": 0, "falsch": 0, "fehler": 0}
+    lock = threading.Lock()
+    ende = time.time() + args.duration
+    wechsel = [0]
+
+    def wechseln():
+        while time.time() < ende:
+            wechsel[0] += 1
+            dashboard.store.swap(datasets[wechsel[0] % 2])
+            time.sleep(args.swap_interval)
+
+    def arbeiten(nummer):
+        rng = random.Random(args.seed + nummer)
+        eigener_client = dashboard.server.test_client()
+        while time.time() < ende:
+            i = rng.randrange(len(requests))
+            try:
+                ergebnis = pruefen(antwort(eigener_client, requests[i]), referenzen[i])
+            except Exception as fehler_:
+                ergebnis = "fehler"
+                print("Fehler: %r" % fehler_)
+            with lock:
+                ergebnisse[ergebnis] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=wechseln)] + [threading.Thread(target=arbeiten, args=(i,))
+                                                     for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    dauer = time.perf_counter() - start
+
+    print("%d Threads, %.0f s, %d Wechsel des Datenstands" % (args.threads, dauer, wechsel[0]))
+    for name, anzahl in ergebnisse.items():
+        print("%-10s %8d" % (name, anzahl))
+    print("Figuren-Cache: %s" % dashboard.figure_cache.stats())
+
+    #Zuletzt, weil ein erfolgreicher Schreibversuch den Datenstand verändert
+    fehler = []
+    for dataset in datasets:
+        fehler += schreibschutz(dataset)
+    for text in fehler:
+        print("Schreibschutz: %s" % text)
+    sys.exit(1 if fehler or ergebnisse["gemischt"] or ergebnisse["falsch"] or ergebnisse["fehler"] else 0)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Payload und Renderzeit der Tageswerte mit und ohne Ausdünnen.
+
+Gemessen wird pro Fall die Grösse der Figur als JSON, die Anzahl Punkte, der
+Trace-Typ und die Zeit für Zeichnen und Serialisieren auf dem Server (Median).
+Das Punktebudget entspricht einem 1920px breiten Browserfenster.
+
+Aufruf:
+    python benchmarks/decimation.py [SNAPSHOT] [--repeat N] [--width 1920]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plotly.io.json import to_json_plotly
+
+import snapshot
+from dataset import Dataset
+from diagrams import Diagram, Selection, point_budget, render
+
+
+def messen(dataset, fall, diagram, repeat):
+    scope, values = fall[1], fall[2]
+    zeiten = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        selection = Selection(dataset, scope, values, dataset.oldest_date, dataset.newest_date, diagram.attributes)
+        fig = render(selection, diagram)
+        daten = to_json_plotly(fig)
+        zeiten.append(time.perf_counter() - start)
+    zeiten = sorted(zeiten[1:])
+    punkte = sum(len(trace.x) for trace in fig.data)
+    return len(daten), punkte, fig.data[0].type, zeiten[len(zeiten) // 2] * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=snapshot.DEFAULT_PATH)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--width", type=int, default=1920)
+    args = parser.parse_args()
+
+    dataset = Dataset(args.path)
+    y, x = "new_cases_per_million", "new_deaths_per_million"
+    kontinent = dataset.continent_list[:1]
+    faelle = [
+        ("Tab 1 Linie, 3 Länder", "location", dataset.location_list[:3], "1", "on", "off"),
+        ("Tab 2 Linie pro Land, %s" % kontinent[0], "continent", kontinent, "1", "on", "on"),
+        ("Tab 2 Streudiagramm pro Land", "continent", kontinent, "3", "on", "on"),
+    ]
+    budget = point_budget(args.width)
+
+    print("Punktebudget pro Serie: %d" % budget)
+    print("%-34s %-8s %12s %8s %-10s %10s" % ("Fall", "Modus", "JSON [kB]", "Punkte", "Trace", "Zeit [ms]"))
+    for fall in faelle:
+        name, scope, _, chart, x_radio, y_radio = fall
+        for modus in ["off", "minmax", "lttb"]:
+            diagram = Diagram(scope, chart, y, x, None, x_radio, y_radio,
+                              points=None if modus == "off" else budget, decimation=modus)
+            groesse, punkte, trace, zeit = messen(dataset, fall, diagram, args.repeat)
+            print("%-34s %-8s %12.1f %8d %-10s %10.1f" % (name, modus, groesse / 1024, punkte, trace, zeit))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Export der Zeilen aller Länder (alle Attribute, ganzer Zeitraum) über
+/export/location_per_day.<format> (export.py).
+
+Pro Format gemessen (Flask-Testclient, Antwort stückweise gelesen):
+
+    Bytes       Grösse der Antwort ohne Kompression
+    Zeit        bis zum letzten Byte, Median in ms
+    Spitze      grösster zusätzlicher Speicher während des Exports
+                (tracemalloc, NumPy und pandas eingeschlossen)
+
+Zum Vergleich der Export ohne Stücke: die ganze Auswahl als DataFrame
+(Dataset.select) und to_csv in einen String. Ausserdem ein zweiter Download
+mit If-None-Match (304).
+
+Aufruf:
+    COVIDIAGRAMS_SNAPSHOT=data/owid-snapshot python benchmarks/export.py [--repeat N] [--chunk-values 200000]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("COVIDIAGRAMS_CACHE_DIR", "")
+os.environ.setdefault("COVIDIAGRAMS_REFRESH_INTERVAL", "0")
+
+import dashboard
+import export
+
+FORMATE = ["csv", "ndjson", "arrow"]
+
+
+def messen(funktion, repeat):
+    #Median der Zeit in ms, grösster zusätzlicher Speicher in MB und Ergebnis des letzten Aufrufs
+    funktion()
+    zeiten = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ergebnis = funktion()
+        zeiten.append(time.perf_counter() - start)
+    tracemalloc.start()
+    funktion()
+    spitze = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return sorted(zeiten)[len(zeiten) // 2] * 1000, spitze / 1e6, ergebnis
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--chunk-values", type=int, default=export.CHUNK_VALUES)
+    args = parser.parse_args()
+
+    dataset = dashboard.store.current
+    dashboard.export.chunk_values = args.chunk_values
+    client = dashboard.server.test_client()
+    print("%d Zeilen, %d Spalten, %d Werte pro Stück" % (len(dataset.columns["date"]), len(dataset.column_names),
+                                                         args.chunk_values))
+
+    def herunterladen(pfad, headers=None):
+        #Antwort stückweise lesen, ohne sie zu sammeln
+        antwort = client.get(pfad, headers=dict(headers or {}, **{"Accept-Encoding": "identity"}), buffered=False)
+        groesse = sum(len(stueck) for stueck in antwort.response)
+        antwort.close()
+        return antwort, groesse
+
+    print("%-28s %14s %12s %12s" % ("Variante", "Bytes", "Zeit [ms]", "Spitze [MB]"))
+    for format in FORMATE:
+        pfad = "/export/location_per_day.%s" % format
+        zeit, spitze, (antwort, groesse) = messen(lambda: herunterladen(pfad), args.repeat)
+        print("%-28s %14d %12.1f %12.1f" % ("Stücke, %s" % format, groesse, zeit, spitze))
+        etag = antwort.headers["ETag"]
+        zeit, spitze, (antwort, _) = messen(lambda: herunterladen(pfad, {"If-None-Match": etag}), args.repeat)
+        assert antwort.status_code == 304
+        print("%-28s %14d %12.2f %12.1f" % ("If-None-Match, %s" % format, 0, zeit, spitze))
+
+    def ganz():
+        df = dataset.select("continent", dataset.continent_list, dataset.oldest_date, dataset.newest_date)
+        return df.to_csv(index=False, date_format="%Y-%m-%d")
+
+    zeit, spitze, text = messen(ganz, args.repeat)
+    print("%-28s %14d %12.1f %12.1f" % ("ganze Auswahl, csv", len(text.encode("utf-8")), zeit, spitze))
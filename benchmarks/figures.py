@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Figuren mit plotly.express (bisheriger Weg) gegenüber den graph_objects-
+Builders aus figures.py, pro Diagrammtyp und Variante.
+
+Auswahl und Mittelwerte der Selection werden vorher berechnet, das Ausdünnen
+der Tageswerte gehört zu beiden Wegen. Gemessen wird das Bauen der Figur und,
+in der zweiten Spalte, Bauen und Serialisieren (to_json_plotly, wie für den
+Figuren-Cache). Beide Figuren müssen gleich sein: gleiche Eigenschaften,
+Traces und Layout mit Template; Zahlen gleich bis auf Rundung in den Summen
+der Treemap.
+
+Aufruf:
+    COVIDIAGRAMS_SNAPSHOT=data/owid-snapshot python benchmarks/figures.py [--repeat N]
+        [--countries Switzerland Austria Germany Italy] [--continents Europe Asia]
+"""
+
+import argparse
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("COVIDIAGRAMS_CACHE_DIR", "")
+
+import numpy as np
+import plotly.express as px
+from plotly.io.json import to_json_plotly
+
+import dashboard
+from diagrams import TREEMAP_COLORS, Diagram, Selection, _render_mode, point_budget, render
+
+Y, X, SONSTIGE = "new_cases_per_million", "new_deaths_per_million", "total_cases_per_million"
+#Name, Bereich und Einstellungen der Diagramme
+VARIANTEN = [
+    ("line Länder", "location", "1", {}),
+    ("bar Länder", "location", "2", {}),
+    ("scatter Länder (on)", "location", "3", {}),
+    ("scatter Länder (off)", "location", "3", {"x_radio": "off"}),
+    ("line Kontinent (on)", "continent", "1", {"y_radio": "on"}),
+    ("line Kontinent (off)", "continent", "1", {}),
+    ("bar Kontinent (on)", "continent", "2", {"y_radio": "on"}),
+    ("bar Kontinent (off)", "continent", "2", {}),
+    ("scatter Kontinent (on/on)", "continent", "3", {"y_radio": "on"}),
+    ("scatter Kontinent (on/off)", "continent", "3", {}),
+    ("scatter Kontinent (off/on)", "continent", "3", {"x_radio": "off", "y_radio": "on"}),
+    ("scatter Kontinent (off/off)", "continent", "3", {"x_radio": "off"}),
+    ("treemap", "continent", "4", {}),
+    ("choropleth", "continent", "5", {}),
+]
+
+
+def render_px(selection, diagram):
+    #Die Figuren wie bisher mit plotly.express (diagrams.py vor figures.py)
+    if diagram.scope == "location":
+        return _render_location_px(selection, diagram)
+    return _render_continent_px(selection, diagram)
+
+
+def _render_location_px(selection, diagram):
+    y_attribut, x_attribut = diagram.y_attribut, diagram.x_attribut
+    if diagram.chart == "1":
+    #Liniendiagramm (y-Achse: Attribut von Filter 1)
+        df = diagram.per_day(selection.location_per_day(), 'location')
+        fig = px.line(df, x="date", y=y_attribut, color='location', symbol="location", render_mode=_render_mode(df))
+    elif diagram.chart == "2":
+    #Balkendiagramm, Durchschnittswerte über ausgewählten Zeitpunkt
+        fig = px.bar(selection.location_per_period(), x="location", y=y_attribut, color='location')
+    elif diagram.chart == "3":
+    #Streudiagramm  (y-Achse: Attribut von Filter 1, x-Achse: Attribut von Filter 2)
+        if diagram.x_radio == "on":
+            df = diagram.per_day(selection.location_per_day(), 'location')
+            fig = px.scatter(df, x=x_attribut, y=y_attribut, color='location', symbol="location", hover_data=["date"], render_mode=_render_mode(df))
+        else:
+            fig = px.scatter(selection.location_per_period(), x=x_attribut, y=y_attribut, color='location', symbol="location")
+    return fig
+
+
+def _render_continent_px(selection, diagram):
+    y_attribut, x_attribut, sonstige_attribut = diagram.y_attribut, diagram.x_attribut, diagram.sonstige_attribut
+    #Liniendiagramm
+    if diagram.chart == "1":
+        if diagram.y_radio == "on":
+            #Tageswerte der Länder des gewählten Kontinents
+            df = diagram.per_day(selection.location_per_day(), 'location')
+            fig = px.line(df, x="date", y=y_attribut, color='location', symbol='location', hover_name='location', render_mode=_render_mode(df))
+        else:
+            #Tagesdurchschnitt pro Kontinent
+            df = diagram.per_day(selection.continent_per_day(), 'continent')
+            fig = px.line(df, x="date", y=y_attribut, color='continent', symbol="continent", render_mode=_render_mode(df))
+    #Balkendiagramm
+    elif diagram.chart == "2":
+        if diagram.y_radio == "on":
+            # Durchschnittswert der Länder des gewählten Kontinents über den ausgewählten Zeitpunkt
+            fig = px.bar(selection.location_per_period(by=["continent", "location"]), x="continent", y=y_attribut, color='continent', hover_name='location')
+        else:
+            # Durchschnittswerte des Kontinents über ausgewählten Zeitpunkt und all seine Länder
+            fig = px.bar(selection.continent_per_period(), x="continent", y=y_attribut, color='continent')
+    #Streudiagramm
+    elif diagram.chart == "3":
+        if diagram.x_radio == "on":
+            if diagram.y_radio == "on":
+                df = diagram.per_day(selection.location_per_day(), 'location')
+                fig = px.scatter(df, x=x_attribut, y=y_attribut, color='continent', symbol="continent", hover_name='location', hover_data=["date"], render_mode=_render_mode(df))
+            else:
+                df = diagram.per_day(selection.continent_per_day(), 'continent')
+                fig = px.scatter(df, x=x_attribut, y=y_attribut, color='continent', symbol="continent", hover_data=["date"], render_mode=_render_mode(df))
+        else:
+            if diagram.y_radio == "on":
+                fig = px.scatter(selection.location_per_period(by=["continent", "location"]), x=x_attribut, y=y_attribut, color='continent', symbol="continent", hover_name='location')
+            else:
+                fig = px.scatter(selection.continent_per_period(), x=x_attribut, y=y_attribut, color='continent', symbol="continent")
+    #Treemap, Werteverteilung
+    elif diagram.chart == "4":
+        fig = px.treemap(selection.location_per_period(by=["continent", "location"]), path=[px.Constant("Total"), 'continent', 'location'], values=sonstige_attribut, color_discrete_sequence=TREEMAP_COLORS)
+        fig.update_traces(root_color="#e5ecf6")
+        fig.update_layout(margin = dict(t=20, l=0, r=0, b=0))
+    # Choropleth
+    elif diagram.chart == "5":
+        fig = px.choropleth(selection.location_per_period(by=["iso_code", "location", "continent"]), locations="iso_code", color=sonstige_attribut, color_continuous_scale="ice", hover_name="location")
+        fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+    return fig
+
+
+def array(wert):
+    #Typed Array ({"dtype": ..., "bdata": ...}, ab plotly 6) als NumPy-Array
+    if isinstance(wert, dict) and "bdata" in wert:
+        werte = np.frombuffer(base64.b64decode(wert["bdata"]), dtype=wert["dtype"])
+        return werte.reshape(wert["shape"]) if "shape" in wert else werte
+    return wert
+
+
+def vergleichen(a, b, pfad="figur"):
+    #Unterschiede zweier Figuren (to_plotly_json) als Liste von Pfaden
+    a, b = array(a), array(b)
+    if isinstance(a, dict) and isinstance(b, dict):
+        if set(a) != set(b):
+            return ["%s: Schlüssel %s" % (pfad, sorted(set(a) ^ set(b)))]
+        return [fehler for name in a for fehler in vergleichen(a[name], b[name], "%s.%s" % (pfad, name))]
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)) and not np.ndim(a) > 1:
+        if len(a) != len(b):
+            return ["%s: Länge %d / %d" % (pfad, len(a), len(b))]
+        return [fehler for i, (x, y) in enumerate(zip(a, b)) for fehler in vergleichen(x, y, "%s[%d]" % (pfad, i))]
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a, b = np.asarray(a), np.asarray(b)
+        #Texte als Objekt- oder Unicode-Array ergeben dasselbe JSON
+        if a.dtype.kind in "OU" and b.dtype.kind in "OU":
+            a, b = a.astype(object), b.astype(object)
+        if a.shape != b.shape or a.dtype.kind != b.dtype.kind:
+            return ["%s: %s %s / %s %s" % (pfad, a.shape, a.dtype, b.shape, b.dtype)]
+        if a.dtype.kind == "f":
+            gleich = np.allclose(a, b, rtol=1e-12, atol=0, equal_nan=True)
+        else:
+            gleich = np.array_equal(a, b)
+        return [] if gleich else ["%s: Werte" % pfad]
+    return [] if a == b else ["%s: %r / %r" % (pfad, a, b)]
+
+
+def messen(funktion, repeat):
+    funktion()
+    zeiten = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    zeiten.sort()
+    return zeiten[len(zeiten) // 2] * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--countries", nargs="+", default=["Switzerland", "Austria", "Germany", "Italy"])
+    parser.add_argument("--continents", nargs="+", default=["Europe", "Asia"])
+    args = parser.parse_args()
+
+    dataset = dashboard.store.current
+    fehler = []
+    print("%-28s %7s %16s %16s %8s" % ("Variante", "Traces", "px [ms]", "go [ms]", "Faktor"))
+    print("%-28s %7s %16s %16s" % ("", "", "Figur / + JSON", "Figur / + JSON"))
+    for name, scope, chart, einstellungen in VARIANTEN:
+        auswahl = args.countries if scope == "location" else args.continents
+        diagram = Diagram(scope, chart, Y, X, SONSTIGE, points=point_budget(1920), decimation=dashboard.DECIMATION,
+                          **einstellungen)
+        selection = Selection(dataset, scope, auswahl, dataset.oldest_date, dataset.newest_date, diagram.attributes)
+        alt, neu = render_px(selection, diagram), render(selection, diagram)
+        fehler += ["%s: %s" % (name, text) for text in vergleichen(alt.to_plotly_json(), neu.to_plotly_json())]
+        zeiten = [messen(funktion, args.repeat) for funktion in [
+            lambda: render_px(selection, diagram), lambda: to_json_plotly(render_px(selection, diagram)),
+            lambda: render(selection, diagram), lambda: to_json_plotly(render(selection, diagram))]]
+        print("%-28s %7d %7.1f / %6.1f %7.1f / %6.1f %7.1f×" % (name, len(neu.data), zeiten[0], zeiten[1], zeiten[2],
+                                                               zeiten[3], zeiten[1] / zeiten[3]))
+    for text in fehler:
+        print("Unterschied: %s" % text)
+    sys.exit(1 if fehler else 0)
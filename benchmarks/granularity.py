@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Tageswerte aller Länder eines Kontinents über den ganzen Zeitraum, pro Tag,
+Woche und Monat (Auflösung der Diagramme).
+
+Pro Stufe gemessen:
+
+    Zeilen      Zeilen der Tabelle (Punkte aller Linien)
+    pandas      Tageswerte lesen, groupby Land und Periode, mean()
+    cube        Differenzen der Präfixsummen an den Grenzen der Perioden
+                (Cube.location_per_interval), Tageswerte wie bisher
+    Figur       Liniendiagramm (Länder des Kontinents) mit render und
+                to_json_plotly, Grösse des JSON
+
+pandas und Cube müssen dieselben Mittelwerte ergeben (bis auf Rundung).
+
+Aufruf:
+    python benchmarks/granularity.py [SNAPSHOT] [--continent Europe] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+import snapshot
+from aggregates import period_start, periods
+from dataset import Dataset
+from diagrams import Diagram, Selection, point_budget, render
+
+ATTRIBUTE = ["new_cases_per_million", "new_deaths_per_million", "total_cases_per_million"]
+STUFEN = ["day", "week", "month"]
+
+
+def messen(funktion, repeat):
+    funktion()
+    zeiten = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    zeiten.sort()
+    return zeiten[len(zeiten) // 2] * 1000
+
+
+def pandas_mitteln(dataset, kontinent, stufe):
+    #Tageswerte lesen und pro Land und Periode mitteln (der übliche Weg)
+    df = dataset.location_per_day("continent", kontinent, dataset.oldest_date, dataset.newest_date, ATTRIBUTE)
+    if stufe == "day":
+        return df
+    tage = df["date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    df["date"] = period_start(periods(tage, stufe), stufe).astype("datetime64[ns]")
+    return df.groupby(["location", "date"], sort=True, as_index=False)[ATTRIBUTE].mean()
+
+
+def cube_mitteln(dataset, kontinent, stufe):
+    if stufe == "day":
+        return dataset.location_per_day("continent", kontinent, dataset.oldest_date, dataset.newest_date, ATTRIBUTE)
+    return dataset.cube.location_per_interval("continent", kontinent, dataset.oldest_date, dataset.newest_date,
+                                              ATTRIBUTE, stufe)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=os.environ.get("COVIDIAGRAMS_SNAPSHOT", snapshot.DEFAULT_PATH))
+    parser.add_argument("--continent", default="Europe")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    dataset = Dataset(args.path)
+    kontinent = [args.continent]
+    fehler = []
+    print("%-6s %8s %12s %12s %14s %14s" % ("Stufe", "Zeilen", "pandas [ms]", "cube [ms]", "Figur [ms]",
+                                            "JSON [Bytes]"))
+    for stufe in STUFEN:
+        erwartet, df = pandas_mitteln(dataset, kontinent, stufe), cube_mitteln(dataset, kontinent, stufe)
+        for attribut in ATTRIBUTE:
+            a, b = erwartet[attribut].to_numpy(dtype=np.float64), df[attribut].to_numpy(dtype=np.float64)
+            if a.shape != b.shape or not np.allclose(a, b, rtol=1e-9, atol=1e-9, equal_nan=True):
+                fehler.append("%s %s" % (stufe, attribut))
+
+        #Liniendiagramm der Länder des Kontinents, ohne Ausdünnen
+        diagram = Diagram("continent", "1", ATTRIBUTE[0], y_radio="on", points=point_budget(1920),
+                          decimation="off", granularity=stufe)
+
+        def figur():
+            selection = Selection(dataset, "continent", kontinent, dataset.oldest_date, dataset.newest_date,
+                                  diagram.attributes)
+            return to_json_plotly(render(selection, diagram))
+
+        print("%-6s %8d %12.1f %12.1f %14.1f %14d" % (
+            stufe, len(df), messen(lambda: pandas_mitteln(dataset, kontinent, stufe), args.repeat),
+            messen(lambda: cube_mitteln(dataset, kontinent, stufe), args.repeat), messen(figur, args.repeat),
+            len(figur())))
+    for text in fehler:
+        print("Unterschied: %s" % text)
+    sys.exit(1 if fehler else 0)
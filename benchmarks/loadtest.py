@@ -0,0 +1,459 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark- und Lasttest mit synthetischen Datensätzen (siehe synthetic.py).
+
+Für jeden Faktor (--scales, Vielfaches der Zeilen des OWID-Datensatzes) wird
+ein synthetischer Snapshot erzeugt bzw. wiederverwendet und gemessen:
+
+    direkt  Diagramm 1 bis 4 in der Standardeinstellung des Layouts
+            (render_panels ohne Figuren-Cache) und tab_content, in einem
+            eigenen Prozess pro Datensatz
+    http    das Dashboard als Server (Gunicorn wie im Procfile, ohne Gunicorn
+            der Werkzeug-Server mit Threads); --clients gleichzeitige Clients
+            rufen während --duration Sekunden Diagramm-Callbacks mit
+            wechselnder Auswahl und Tab-Wechsel über /_dash-update-component ab
+
+Berichtet werden p50/p95 der Latenz in ms, Durchsatz (Requests/s) und
+Speicher (Spitze des RSS in MB). Mit --save-baseline werden die Ergebnisse in
+benchmarks/baselines/NAME.json abgelegt, mit --compare mit dieser Baseline
+verglichen: Abweichungen über --tolerance gelten als Regression (Exit-Code 1).
+
+Aufruf:
+    python benchmarks/loadtest.py [--scales 1 10 100] [--data /tmp/covidiagrams-synthetic]
+        [--clients 4] [--duration 20] [--save-baseline | --compare] [--baseline NAME]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, ROOT)
+
+import synthetic
+
+BASELINES = os.path.join(BENCHMARKS, "baselines")
+CALLBACK_PATH = "/_dash-update-component"
+
+#Diagramme wie im Layout: Nummer, Bereich, Diagrammtyp
+PANELS = [(1, "location", "1"), (2, "location", "2"), (3, "continent", "4"), (4, "continent", "5")]
+STANDARD = {"y_attribut": "new_cases_per_million", "x_attribut": "new_deaths_per_million",
+            "sonstige_attribut": "new_cases_per_million", "x_radio": "on", "y_radio": "off", "smoothing": "off",
+            "window": 7, "granularity": "auto", "ranking": "top", "ranking_size": 10}
+AUSWAHL = {"location": ["Switzerland", "Austria", "Germany"], "continent": ["Europe"]}
+#Attribute, aus denen die Clients wählen
+ATTRIBUTE = ["new_cases_per_million", "new_deaths_per_million", "new_cases_smoothed", "total_cases_per_million",
+             "stringency_index", "people_vaccinated_per_hundred", "positive_rate", "reproduction_rate"]
+
+
+def perzentile(zeiten):
+    werte = sorted(zeiten)
+    if not werte:
+        return {"n": 0}
+
+    def p(q):
+        return werte[min(len(werte) - 1, int(round(q * (len(werte) - 1))))] * 1000
+
+    return {"n": len(werte), "p50_ms": round(p(0.5), 2), "p95_ms": round(p(0.95), 2)}
+
+
+def umgebung(path):
+    #Dashboard mit dem synthetischen Snapshot, ohne Aktualisierung und Verzeichnis-Cache;
+    #die Figuren zeichnet der Server (keine Tagesreihen für den Browser)
+    env = dict(os.environ)
+    env.setdefault("COVIDIAGRAMS_CLIENT_SERIES", "0")
+    env.update({"COVIDIAGRAMS_SNAPSHOT": path, "COVIDIAGRAMS_REFRESH_INTERVAL": "0",
+                "COVIDIAGRAMS_CACHE_DIR": "", "PYTHONPATH": ROOT})
+    return env
+
+
+#----------------
+# direkt
+#----------------
+def direkt(repeat):
+    #Läuft im eigenen Prozess (--direct), Ergebnis als JSON auf stdout
+    start = time.perf_counter()
+    import dashboard
+    from diagrams import Diagram, point_budget, render_panels
+    ergebnis = {"import_s": round(time.perf_counter() - start, 2)}
+
+    dataset = dashboard.store.current
+    punkte = point_budget(1920)
+    for nummer, scope, chart in PANELS:
+        diagram = Diagram(scope, chart, points=punkte, decimation=dashboard.DECIMATION, **STANDARD)
+        zeiten = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            render_panels(dataset, scope, AUSWAHL[scope], dataset.oldest_date, dataset.newest_date, [diagram])
+            zeiten.append(time.perf_counter() - t)
+        ergebnis["diagramm%d" % nummer] = perzentile(zeiten[1:])
+    for tab in ["tab-1", "tab-2"]:
+        zeiten = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            dashboard.tab_content(tab)
+            zeiten.append(time.perf_counter() - t)
+        ergebnis["tab_content " + tab] = perzentile(zeiten[1:])
+    ergebnis["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return ergebnis
+
+
+def direkt_messen(path, repeat):
+    ausgabe = subprocess.run([sys.executable, os.path.abspath(__file__), "--direct", path, "--repeat", str(repeat)],
+                             env=umgebung(path), check=True, stdout=subprocess.PIPE, cwd=ROOT)
+    return json.loads(ausgabe.stdout.decode().strip().splitlines()[-1])
+
+
+#----------------
+# http
+#----------------
+def freier_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_starten(path, port, server, workers):
+    if server == "gunicorn":
+        befehl = [sys.executable, "-m", "gunicorn", "--config", os.path.join(ROOT, "gunicorn.conf.py"),
+                  "--bind", "127.0.0.1:%d" % port, "--workers", str(workers), "dashboard:server"]
+    else:
+        befehl = [sys.executable, "-c", "import dashboard; from werkzeug.serving import run_simple; "
+                  "run_simple('127.0.0.1', %d, dashboard.server, threaded=True)" % port]
+    prozess = subprocess.Popen(befehl, env=umgebung(path), cwd=ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    ende = time.time() + 600
+    while time.time() < ende:
+        if prozess.poll() is not None:
+            raise RuntimeError("Server beendet mit Code %d" % prozess.returncode)
+        try:
+            urllib.request.urlopen("http://127.0.0.1:%d/_dash-layout" % port, timeout=5).read()
+            return prozess
+        except OSError:
+            time.sleep(0.5)
+    prozess.kill()
+    raise RuntimeError("Server nicht erreichbar")
+
+
+def prozesse(pid):
+    #Prozess und alle Kindprozesse (Gunicorn-Worker)
+    alle = [pid]
+    try:
+        for task in os.listdir("/proc/%d/task" % pid):
+            with open("/proc/%d/task/%s/children" % (pid, task)) as f:
+                for kind in f.read().split():
+                    alle += prozesse(int(kind))
+    except OSError:
+        pass
+    return alle
+
+
+def rss(pid):
+    #Aktueller und grösster RSS in MB
+    werte = {}
+    with open("/proc/%d/status" % pid) as f:
+        for zeile in f:
+            if zeile.startswith(("VmRSS:", "VmHWM:")):
+                name, wert, _ = zeile.split()
+                werte[name.rstrip(":")] = int(wert) / 1024
+    return werte.get("VmRSS", 0.0), werte.get("VmHWM", 0.0)
+
+
+def anfrage_diagramme(callback, auswahl, start, end, werte):
+    #Request-Body eines Diagramm-Callbacks; die Eingaben stammen aus /_dash-dependencies,
+    #werte: Wert jedes Diagramm-Felds (ID) des Tabs. Zeitraum und Datenstand lösen den
+    #Callback nur aus (Stores ohne Wert), das Datum steht in den States (Browser ohne Tagesreihen)
+    inputs = []
+    for eingabe in callback["inputs"]:
+        if eingabe["id"].startswith("{"):
+            muster = json.loads(eingabe["id"])
+            inputs.append([{"id": json.loads(id), "property": eingabe["property"], "value": wert}
+                           for id, wert in sorted(werte.items()) if _passt(muster, json.loads(id))])
+        elif eingabe["property"] == "value":
+            inputs.append({"id": eingabe["id"], "property": "value", "value": auswahl})
+        else:
+            inputs.append({"id": eingabe["id"], "property": eingabe["property"], "value": None})
+    panels = next(eingabe for eingabe in inputs if isinstance(eingabe, list))
+    outputs = []
+    for ausgabe in ausgaben(callback):
+        if isinstance(ausgabe["id"], dict):
+            outputs.append([{"id": dict(ausgabe["id"], index=i["id"]["index"]), "property": ausgabe["property"]}
+                            for i in panels])
+        else:
+            outputs.append(ausgabe)
+    states = {"start_date": start, "end_date": end, "viewport-width": 1920}
+    return {
+        "output": callback["output"],
+        "outputs": outputs,
+        "inputs": inputs,
+        "state": [{"id": state["id"], "property": state["property"],
+                   "value": states.get(state["property"], states.get(state["id"]))} for state in callback["state"]],
+        "changedPropIds": [callback["inputs"][0]["id"] + ".value"],
+    }
+
+
+def ausgaben(callback):
+    #Ausgaben eines Callbacks als [{"id": ..., "property": ...}], auch bei mehreren ("..a.x...b.y..")
+    text = callback["output"]
+    teile = text[2:-2].split("...") if text.startswith("..") else [text]
+    return [{"id": json.loads(id) if id.startswith("{") else id, "property": eigenschaft}
+            for id, eigenschaft in (teil.rsplit(".", 1) for teil in teile)]
+
+
+def diagramm_callbacks(dependencies):
+    #Diagramm-Callbacks der Tabs ({Bereich: Callback}) aus /_dash-dependencies
+    callbacks = {}
+    for callback in dependencies:
+        for ausgabe in ausgaben(callback):
+            if isinstance(ausgabe["id"], dict) and ausgabe["id"]["type"] == "diagramm-figur":
+                callbacks[ausgabe["id"]["scope"]] = callback
+    return callbacks
+
+
+def _passt(muster, id):
+    return muster.keys() == id.keys() and all(wert == ["ALL"] or wert == id[k] for k, wert in muster.items())
+
+
+def anfrage_tab(tab):
+    return {"output": "card-content.children", "outputs": {"id": "card-content", "property": "children"},
+            "inputs": [{"id": "card-tabs", "property": "active_tab", "value": tab}],
+            "changedPropIds": ["card-tabs.active_tab"]}
+
+
+def _komponenten(layout):
+    #Alle Komponenten eines Layouts (JSON von /_dash-layout bzw. tab_content)
+    if isinstance(layout, dict) and "props" in layout:
+        yield layout
+        layout = layout["props"].get("children")
+    if isinstance(layout, list):
+        for kind in layout:
+            yield from _komponenten(kind)
+    elif isinstance(layout, dict):
+        yield from _komponenten(layout)
+
+
+class Mix:
+    #Zufällige, aber reproduzierbare Folge von Requests wie von Besuchern:
+    #Tab-Wechsel, Diagramme mit wechselnder Auswahl, Zeitraum, Diagrammtyp und Attributen
+
+    def __init__(self, layout, tabs, callbacks, seed):
+        optionen = next(k["props"]["data"] for k in _komponenten(layout) if k["props"].get("id") == "dropdown-options")
+        self.auswahl = {"location": [o["value"] for o in optionen["location"]],
+                        "continent": [o["value"] for o in optionen["continent"]]}
+        self.callbacks = callbacks
+        #Standardwerte aller Diagramm-Felder aus den Tab-Layouts
+        self.werte = {}
+        for tab in tabs.values():
+            for komponente in _komponenten(tab):
+                id = komponente["props"].get("id")
+                if isinstance(id, dict) and "value" in komponente["props"]:
+                    self.werte.setdefault(id["scope"], {})[json.dumps(id, sort_keys=True)] = komponente["props"]["value"]
+                elif id == "my-date-picker-range":
+                    self.start, self.ende = komponente["props"]["min_date_allowed"], komponente["props"]["max_date_allowed"]
+        self.rng = random.Random(seed)
+
+    def naechste(self):
+        rng = self.rng
+        if rng.random() < 0.15:
+            return "tab_content", anfrage_tab(rng.choice(["tab-1", "tab-2"]))
+        scope = rng.choice(["location", "continent"])
+        if rng.random() < 0.3:
+            auswahl = AUSWAHL[scope]
+        else:
+            auswahl = rng.sample(self.auswahl[scope], rng.randint(1, 5 if scope == "location" else 3))
+        start = self.start if rng.random() < 0.5 else self.ende[:4] + "-01-01"
+        werte = dict(self.werte[scope])
+        for id in werte:
+            typ = json.loads(id)["type"]
+            if typ == "diagramm-auswahl" and rng.random() < 0.5:
+                werte[id] = rng.choice(["1", "2", "3"] if scope == "location" else ["1", "2", "3", "4", "5"])
+            elif typ in ("y-attribut", "sonstige-attribut") and rng.random() < 0.5:
+                werte[id] = rng.choice(ATTRIBUTE)
+        return scope + ":diagramme", anfrage_diagramme(self.callbacks[scope], sorted(auswahl), start, self.ende, werte)
+
+
+def http_messen(path, clients, duration, server, workers, seed):
+    port = freier_port()
+    prozess = server_starten(path, port, server, workers)
+    basis = "http://127.0.0.1:%d" % port
+    try:
+        layout = json.loads(urllib.request.urlopen(basis + "/_dash-layout").read())
+        tabs = {tab: json.loads(_post(basis, anfrage_tab(tab)))["response"]["card-content"]["children"]
+                for tab in ["tab-1", "tab-2"]}
+        #Diagramm-Callbacks der Tabs
+        callbacks = diagramm_callbacks(json.loads(urllib.request.urlopen(basis + "/_dash-dependencies").read()))
+
+        zeiten = {}
+        fehler = [0]
+        lock = threading.Lock()
+        ende = time.time() + duration
+
+        def client(nummer):
+            mix = Mix(layout, tabs, callbacks, seed + nummer)
+            while time.time() < ende:
+                name, body = mix.naechste()
+                t = time.perf_counter()
+                try:
+                    _post(basis, body)
+                except OSError:
+                    with lock:
+                        fehler[0] += 1
+                    continue
+                with lock:
+                    zeiten.setdefault(name, []).append(time.perf_counter() - t)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        dauer = time.perf_counter() - start
+
+        ergebnis = {name: perzentile(werte) for name, werte in sorted(zeiten.items())}
+        ergebnis["alle"] = perzentile([z for werte in zeiten.values() for z in werte])
+        ergebnis["throughput_rps"] = round(ergebnis["alle"]["n"] / dauer, 2)
+        ergebnis["errors"] = fehler[0]
+        speicher = [rss(pid) for pid in prozesse(prozess.pid)]
+        ergebnis["rss_mb"] = round(sum(aktuell for aktuell, _ in speicher), 1)
+        ergebnis["peak_rss_mb"] = round(max(spitze for _, spitze in speicher), 1)
+        return ergebnis
+    finally:
+        prozess.terminate()
+        prozess.wait()
+
+
+def _post(basis, body):
+    anfrage = urllib.request.Request(basis + CALLBACK_PATH, data=json.dumps(body).encode(),
+                                     headers={"Content-Type": "application/json", "Accept-Encoding": "identity"})
+    with urllib.request.urlopen(anfrage, timeout=300) as antwort:
+        return antwort.read()
+
+
+#----------------
+# Baseline
+#----------------
+#Kleinere absolute Änderungen gelten nie als Regression (Messrauschen): Latenz in ms, Speicher in MB
+MIN_DELTA = {"ms": 5.0, "mb": 20.0, "rps": 0.0}
+
+
+def commit():
+    #Gemessener Stand (git), None ausserhalb eines Repositories
+    try:
+        ausgabe = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, check=True,
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return ausgabe.stdout.decode().strip()
+
+
+def vergleichen(baseline, ergebnisse, toleranz):
+    #Regressionen: Latenz und Speicher höher, Durchsatz tiefer als Baseline ± Toleranz
+    regressionen = []
+    for scale, modi in ergebnisse.items():
+        for modus, werte in modi.items():
+            alt = baseline.get(scale, {}).get(modus, {})
+            for name, wert in werte.items():
+                if name not in alt:
+                    continue
+                paare = []
+                if isinstance(wert, dict):
+                    paare = [(name + " " + k, wert[k], alt[name].get(k), 1, "ms") for k in ("p50_ms", "p95_ms") if k in wert]
+                elif name.endswith("_mb"):
+                    paare = [(name, wert, alt[name], 1, "mb")]
+                elif name == "throughput_rps":
+                    paare = [(name, wert, alt[name], -1, "rps")]
+                for bezeichnung, neu, vorher, richtung, einheit in paare:
+                    if not vorher:
+                        continue
+                    aenderung = (neu - vorher) / vorher
+                    markierung = ""
+                    if aenderung * richtung > toleranz and abs(neu - vorher) > MIN_DELTA[einheit]:
+                        markierung = "  REGRESSION"
+                        regressionen.append((scale, modus, bezeichnung))
+                    print("%-6s %-6s %-34s %10.2f %10.2f %+7.1f%%%s"
+                          % (scale, modus, bezeichnung, vorher, neu, aenderung * 100, markierung))
+    return regressionen
+
+
+def ausgeben(scale, modus, werte):
+    for name, wert in werte.items():
+        if isinstance(wert, dict):
+            print("%-6s %-6s %-28s n=%-5d p50 %9.2f ms  p95 %9.2f ms"
+                  % (scale, modus, name, wert["n"], wert.get("p50_ms", 0), wert.get("p95_ms", 0)))
+        else:
+            print("%-6s %-6s %-28s %s" % (scale, modus, name, wert))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", type=float, default=[1, 10, 100])
+    parser.add_argument("--data", default=os.path.join("/tmp", "covidiagrams-synthetic"),
+                        help="Verzeichnis für die synthetischen Snapshots")
+    parser.add_argument("--modes", nargs="+", default=["direkt", "http"], choices=["direkt", "http"])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--server", choices=["gunicorn", "werkzeug"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default="baseline", help="Name der Baseline in benchmarks/baselines")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--direct", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.direct:
+        print(json.dumps(direkt(args.repeat)))
+        sys.exit(0)
+
+    server = args.server
+    if server is None:
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:
+            server = "werkzeug"
+
+    ergebnisse = {}
+    for scale in args.scales:
+        name = "%gx" % scale
+        path = os.path.join(args.data, "scale-%g" % scale)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            meta = synthetic.generate(path, scale, args.seed)
+            print("%-6s Snapshot %s: %d Zeilen" % (name, path, meta["rows"]))
+        ergebnisse[name] = {}
+        if "direkt" in args.modes:
+            ergebnisse[name]["direkt"] = direkt_messen(path, args.repeat)
+            ausgeben(name, "direkt", ergebnisse[name]["direkt"])
+        if "http" in args.modes:
+            ergebnisse[name]["http"] = http_messen(path, args.clients, args.duration, server, args.workers, args.seed)
+            ausgeben(name, "http", ergebnisse[name]["http"])
+
+    datei = os.path.join(BASELINES, args.baseline + ".json")
+    if args.compare:
+        with open(datei, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\nBaseline %s (Commit %s)" % (datei, baseline.get("commit") or "unbekannt"))
+        print("%-6s %-6s %-34s %10s %10s %8s" % ("Daten", "Modus", "Messwert", "Baseline", "Jetzt", "Änderung"))
+        regressionen = vergleichen(baseline["results"], ergebnisse, args.tolerance)
+        if regressionen:
+            print("\n%d Regression(en) gegenüber %s" % (len(regressionen), datei))
+            sys.exit(1)
+    if args.save_baseline:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(datei, "w", encoding="utf-8") as f:
+            json.dump({"commit": commit(), "server": server, "clients": args.clients, "duration": args.duration,
+                       "cpus": os.cpu_count(), "python": sys.version.split()[0], "results": ergebnisse},
+                      f, indent=1, sort_keys=True)
+        print("Baseline gespeichert:", datei)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Bytes auf der Leitung für die Standardansicht von Tab 1 und Tab 2.
+
+Die Diagramm-Callbacks werden über den Flask-Testclient aufgerufen, wie es
+der Browser beim Öffnen des Tabs tut. Gemessen wird die Antwort ohne
+Kompression, mit gzip und mit Brotli, jeweils mit und ohne kompakte Figuren
+(payload.py). Der Figuren-Cache wird vor jeder Messung geleert.
+
+Aufruf:
+    COVIDIAGRAMS_SNAPSHOT=data/owid-snapshot python benchmarks/payload.py
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("COVIDIAGRAMS_CACHE_DIR", "")
+os.environ.setdefault("COVIDIAGRAMS_CLIENT_SERIES", "0")
+
+import dashboard
+
+#Standardansicht der Tabs: globaler Filter und Diagrammtypen wie im Layout
+ANSICHTEN = [
+    ("Tab 1 (Länder)", "location", "location-dropdown", ["Switzerland", "Austria", "Germany"]),
+    ("Tab 2 (Kontinente)", "continent", "continent-dropdown", ["Europe"]),
+]
+STANDARD = {'y-attribut': 'new_cases_per_million', 'x-attribut': 'new_deaths_per_million',
+            'sonstige-attribut': 'new_cases_per_million', 'x-radio': 'on', 'y-radio': 'off', 'glaettung': 'off',
+            'fenster': 7, 'aufloesung': 'auto', 'rangfolge': 'top', 'anzahl': 10}
+KODIERUNGEN = [("ohne", "identity"), ("gzip", "gzip"), ("brotli", "br")]
+
+
+def anfrage(scope, dropdown, auswahl):
+    #Request-Body des Diagramm-Callbacks eines Tabs, Diagramme wie in diagramm_panels nummeriert
+    dataset = dashboard.store.current
+    panels = [(nummer, chart) for nummer, (tab, s, chart) in enumerate(
+        ((tab, s, chart) for tab, s, charts in dashboard.PANELS for chart in charts), 1) if s == scope]
+
+    def alle(typ, werte):
+        return [{"id": dashboard.panel_id(typ, scope, nummer), "property": "value", "value": wert}
+                for (nummer, _), wert in zip(panels, werte)]
+
+    inputs = [{"id": dropdown, "property": "value", "value": auswahl},
+              {"id": scope + "-zeitraum", "property": "data", "value": None},
+              {"id": "dataset-version", "property": "data", "value": None}]
+    for typ, _ in dashboard.DIAGRAMM_FELDER[scope]:
+        if typ == 'diagramm-auswahl':
+            inputs.append(alle(typ, [chart for _, chart in panels]))
+        else:
+            inputs.append(alle(typ, [STANDARD[typ]] * len(panels)))
+    figur = json.dumps(dashboard.panel_id('diagramm-figur', scope, ["ALL"]), sort_keys=True, separators=(",", ":"))
+    return {
+        "output": "..%s-tagesreihen.data...%s-tagesreihen-schluessel.data...%s.data.." % (scope, scope, figur),
+        "outputs": [{"id": scope + "-tagesreihen", "property": "data"},
+                    {"id": scope + "-tagesreihen-schluessel", "property": "data"},
+                    [{"id": dashboard.panel_id('diagramm-figur', scope, nummer), "property": "data"}
+                     for nummer, _ in panels]],
+        "inputs": inputs,
+        "state": [{"id": scope + "-tagesreihen-schluessel", "property": "data", "value": None},
+                  {"id": "my-date-picker-range", "property": "start_date", "value": dataset.oldest_date},
+                  {"id": "my-date-picker-range", "property": "end_date", "value": dataset.newest_date},
+                  {"id": "viewport-width", "property": "data", "value": 1920}],
+        "changedPropIds": [dropdown + ".value"],
+    }
+
+if __name__ == "__main__":
+    client = dashboard.server.test_client()
+    print("%-20s %-8s %-8s %12s %10s" % ("Ansicht", "Figuren", "Kodierung", "Bytes", "Zeit [ms]"))
+    for name, scope, dropdown, auswahl in ANSICHTEN:
+        body = anfrage(scope, dropdown, auswahl)
+        for kompakt in [False, True]:
+            dashboard.COMPACT_FIGURES = kompakt
+            for kodierung_name, kodierung in KODIERUNGEN:
+                dashboard.figure_cache._entries.clear()
+                start = time.perf_counter()
+                antwort = client.post("/_dash-update-component", json=body,
+                                      headers={"Accept-Encoding": kodierung})
+                zeit = (time.perf_counter() - start) * 1000
+                assert antwort.status_code == 200, antwort.data[:200]
+                print("%-20s %-8s %-8s %12d %10.1f" % (name, "kompakt" if kompakt else "normal",
+                                                      kodierung_name, len(antwort.data), zeit))
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Rangliste: die N Länder mit dem höchsten bzw. tiefsten Mittelwert eines
+Attributs im Zeitraum, für jedes Attribut aus attribute_list.
+
+Verglichen werden:
+    pandas      Zeilen aller Länder im Zeitraum lesen, groupby("location")
+                mean() und sortieren (der übliche Weg)
+    cube        Mittelwerte aller Länder aus den Präfixsummen des Cubes und
+                Teilsortierung mit argpartition (Cube.location_ranking),
+                einmal mit leerem Cache der Länder-Präfixsummen und einmal
+                mit gefülltem
+
+Beide Wege müssen dieselben Länder in derselben Reihenfolge ergeben (bei
+gleichen Werten alphabetisch) und dieselben Mittelwerte (bis auf Rundung).
+Ausgegeben wird der Median pro Attribut über alle Attribute, pro Zeitraum
+und Reihenfolge.
+
+Aufruf:
+    python benchmarks/ranking.py [SNAPSHOT] [-n 10] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import snapshot
+from aggregates import RANKINGS
+from dataset import Dataset
+
+
+def messen(funktion, repeat, vorher=None):
+    funktion()
+    zeiten = []
+    for _ in range(repeat):
+        if vorher is not None:
+            vorher()
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    zeiten.sort()
+    return zeiten[len(zeiten) // 2] * 1000
+
+
+def pandas_rangliste(dataset, start_date, end_date, attribut, n, order):
+    #Alle Zeilen des Zeitraums, Mittelwert pro Land, nach Wert (bei gleichen Werten nach Land) sortiert
+    df = dataset.select("continent", dataset.continent_list, start_date, end_date, columns=[attribut])
+    mittel = df.groupby("location", observed=True)[attribut].mean().dropna().sort_index()
+    return mittel.sort_values(ascending=order == "bottom", kind="stable").head(n)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=os.environ.get("COVIDIAGRAMS_SNAPSHOT", snapshot.DEFAULT_PATH))
+    parser.add_argument("-n", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dataset = Dataset(args.path)
+    cube = dataset.cube
+    attribute = dataset.attribute_list
+    zeitraeume = [("ganzer Zeitraum", dataset.oldest_date), ("letzte 90 Tage", str(cube.dates[-90]))]
+    print("%d Länder, %d Zeilen, %d Attribute, N = %d" % (len(dataset.location_list), len(dataset.columns["date"]),
+                                                         len(attribute), args.n))
+
+    def cube_rangliste(start, attribut, order):
+        return cube.location_ranking("continent", dataset.continent_list, start, dataset.newest_date, attribut,
+                                     n=args.n, order=order)
+
+    fehler = []
+    print("%-16s %-8s %12s %16s %16s %8s" % ("Zeitraum", "Rang", "pandas [ms]", "cube leer [ms]", "cube Cache [ms]",
+                                             "Faktor"))
+    for zeitraum, start in zeitraeume:
+        for order in RANKINGS:
+            zeiten = {"pandas": [], "leer": [], "cache": []}
+            for attribut in attribute:
+                erwartet, df = pandas_rangliste(dataset, start, dataset.newest_date, attribut, args.n, order), \
+                    cube_rangliste(start, attribut, order)
+                if list(erwartet.index) != df["location"].tolist():
+                    fehler.append("%s %s %s: Länder" % (zeitraum, order, attribut))
+                elif not np.allclose(erwartet.to_numpy(dtype=np.float64), df[attribut].to_numpy(dtype=np.float64),
+                                     rtol=1e-9, atol=0):
+                    fehler.append("%s %s %s: Werte" % (zeitraum, order, attribut))
+
+                zeiten["pandas"].append(messen(lambda: pandas_rangliste(dataset, start, dataset.newest_date,
+                                                                        attribut, args.n, order), args.repeat))
+                zeiten["leer"].append(messen(lambda: cube_rangliste(start, attribut, order), args.repeat,
+                                             vorher=cube._location.clear))
+                zeiten["cache"].append(messen(lambda: cube_rangliste(start, attribut, order), args.repeat))
+            median = {name: float(np.median(werte)) for name, werte in zeiten.items()}
+            print("%-16s %-8s %12.2f %16.2f %16.2f %7.0f×" % (zeitraum, order, median["pandas"], median["leer"],
+                                                              median["cache"], median["pandas"] / median["cache"]))
+    for text in fehler:
+        print("Unterschied: %s" % text)
+    sys.exit(1 if fehler else 0)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Alle Diagramme eines Tabs in einem Request: einzeln, gemeinsam und gemeinsam
+mit Thread-Pool (ohne Figuren-Cache).
+
+    einzeln     ein render_panels pro Diagramm, wie früher ein Callback pro
+                Diagramm; jedes liest die Auswahl erneut
+    gemeinsam   ein render_panels für alle Diagramme des Tabs (eine Selection)
+    Pool N      wie gemeinsam, die Figuren werden in N Threads gebaut
+                (COVIDIAGRAMS_RENDER_THREADS)
+
+Gemessen werden Median von Laufzeit und CPU-Zeit des Prozesses. Die Figuren
+aller Varianten müssen gleich sein.
+
+Aufruf:
+    COVIDIAGRAMS_SNAPSHOT=data/owid-snapshot python benchmarks/render_pool.py [--repeat N] [--threads 2 4]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("COVIDIAGRAMS_CACHE_DIR", "")
+
+import dashboard
+from diagrams import Diagram, point_budget, render_panels
+from plotly.io.json import to_json_plotly
+
+Y, X, SONSTIGE = "new_cases_per_million", "new_deaths_per_million", "new_cases_per_million"
+#Tab, Bereich, Auswahl und Diagrammtypen der Diagramme des Tabs
+TABS = [
+    ("Tab 1 Linie + Balken", "location", ["Switzerland", "Austria", "Germany", "Italy", "France"], ["1", "2"]),
+    ("Tab 1 Linie + Streu", "location", ["Switzerland", "Austria", "Germany", "Italy", "France"], ["1", "3"]),
+    ("Tab 2 Treemap + Karte", "continent", ["Africa", "Asia", "Europe", "North America", "Oceania", "South America"],
+     ["4", "5"]),
+    ("Tab 2 Linie + Streu", "continent", ["Europe", "Asia"], ["1", "3"]),
+]
+
+
+def median(werte):
+    werte = sorted(werte)
+    return werte[len(werte) // 2]
+
+
+def messen(funktion, repeat):
+    ergebnis = funktion()
+    zeiten, cpu = [], []
+    for _ in range(repeat):
+        start, start_cpu = time.perf_counter(), time.process_time()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+        cpu.append(time.process_time() - start_cpu)
+    return median(zeiten) * 1000, median(cpu) * 1000, ergebnis
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--threads", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    dataset = dashboard.store.current
+    start_date, end_date = dataset.oldest_date, dataset.newest_date
+    varianten = ["einzeln", "gemeinsam"] + ["Pool %d" % n for n in args.threads]
+    print("%-24s %s" % ("Laufzeit / CPU [ms]", " ".join("%17s" % name for name in varianten)))
+    for name, scope, auswahl, typen in TABS:
+        diagrams = [Diagram(scope, typ, Y, X, SONSTIGE, points=point_budget(1920), decimation=dashboard.DECIMATION)
+                    for typ in typen]
+
+        def einzeln():
+            return [fig for diagram in diagrams
+                    for fig in render_panels(dataset, scope, auswahl, start_date, end_date, [diagram], compact=True)]
+
+        def gemeinsam(threads=1):
+            return lambda: render_panels(dataset, scope, auswahl, start_date, end_date, diagrams, compact=True,
+                                         threads=threads)
+
+        messungen = [messen(einzeln, args.repeat), messen(gemeinsam(), args.repeat)]
+        messungen += [messen(gemeinsam(n), args.repeat) for n in args.threads]
+        referenz = [to_json_plotly(fig) for fig in messungen[0][2]]
+        for _, _, figuren in messungen[1:]:
+            assert [to_json_plotly(fig) for fig in figuren] == referenz, name
+        print("%-24s %s" % (name, " ".join("%8.1f / %6.1f" % (zeit, cpu) for zeit, cpu, _ in messungen)))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-Benchmark der Auswahl (Länder, Zeitraum).
+
+Verglichen werden:
+    masken      boolesche Masken über alle Zeilen mit Datums-Strings und isin
+                (bisherige Filter in den Callbacks)
+    index       Binärsuche im sortierten (Land, Datum)-Index, nur die
+                ausgewählten Zeilenbereiche werden gelesen (Dataset.select)
+
+Aufruf:
+    python benchmarks/selection.py [SNAPSHOT] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot
+from dataset import Dataset
+
+
+def messen(funktion, repeat):
+    funktion()
+    zeiten = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    zeiten.sort()
+    return zeiten[len(zeiten) // 2] * 1000
+
+
+def masken(df, column, values, start_date, end_date):
+    df_timeperiod = df[(df["date"] >= start_date) & (df["date"] <= end_date)]
+    return df_timeperiod[df_timeperiod[column].isin(values)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=snapshot.DEFAULT_PATH)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    dataset = Dataset(args.path)
+    #DataFrame wie bisher: Text-Spalten und Datum als String
+    df, _ = snapshot.read_snapshot(args.path)
+    df = df.astype({"iso_code": object, "continent": object, "location": object})
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+
+    laender = dataset.location_list
+    ende = dataset.newest_date
+    monat = str(dataset.cube.dates[-30])
+    faelle = [
+        ("4 Länder, ganzer Zeitraum", "location", laender[:4], dataset.oldest_date, ende),
+        ("4 Länder, letzte 30 Tage", "location", laender[:4], monat, ende),
+        ("1 Kontinent, ganzer Zeitraum", "continent", dataset.continent_list[:1], dataset.oldest_date, ende),
+        ("alle Länder, letzte 30 Tage", "location", laender, monat, ende),
+    ]
+    spalten = ["new_cases_per_million"]
+
+    print("%-30s %12s %12s %8s" % ("Auswahl", "masken [ms]", "index [ms]", "Zeilen"))
+    for name, column, values, start_date, end_date in faelle:
+        zeit_masken = messen(lambda: masken(df, column, values, start_date, end_date)[["location", "date"] + spalten], args.repeat)
+        zeit_index = messen(lambda: dataset.select(column, values, start_date, end_date, spalten), args.repeat)
+        zeilen = len(dataset.select(column, values, start_date, end_date, spalten))
+        print("%-30s %12.2f %12.2f %8d" % (name, zeit_masken, zeit_index, zeilen))
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Anzahl Requests an die Worker für eine typische Sitzung.
+
+Die Sitzung wird anhand der registrierten Callbacks nachgespielt: beim Laden
+eines Tabs feuern alle Callbacks, deren Eingaben neu im Layout sind (ausser
+prevent_initial_call), bei jeder Eingabe die Callbacks mit dieser Eingabe,
+bei MATCH-Callbacks einmal pro betroffenem Diagramm. Gezählt werden
+Server-Callbacks (je ein HTTP-Request) und clientseitige Callbacks.
+
+Aufruf:
+    COVIDIAGRAMS_SNAPSHOT=data/owid-snapshot python benchmarks/session.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dashboard
+
+WILDCARDS = (["ALL"], ["MATCH"], ["ALLSMALLER"])
+
+
+def _id(text):
+    return json.loads(text) if text.startswith("{") else text
+
+
+def passt(muster, komponente):
+    #Passt eine (Wildcard-)ID aus einem Callback auf die ID einer Komponente?
+    if isinstance(muster, str) or isinstance(komponente, str):
+        return muster == komponente
+    return muster.keys() == komponente.keys() and all(
+        wert in WILDCARDS or wert == komponente[key] for key, wert in muster.items())
+
+
+def komponenten(layout):
+    #tab_layout gibt die Zeile als Tupel zurück
+    if isinstance(layout, tuple):
+        layout, = layout
+    ids = []
+    for komponente in [layout] + list(layout._traverse()):
+        wert = getattr(komponente, "id", None)
+        if wert is not None:
+            ids.append(wert)
+    return ids
+
+
+def ausgaben(callback):
+    #IDs der Ausgaben, auch bei mehreren Ausgaben ("..a.x...b.y..")
+    text = callback["output"]
+    teile = text[2:-2].split("...") if text.startswith("..") else [text]
+    return [_id(teil.rsplit(".", 1)[0]) for teil in teile]
+
+
+def ausloesen(vorhanden, neu=(), geaendert=()):
+    #Anzahl (server, client) der Callbacks, die feuern
+    server = client = 0
+    for callback in dashboard.app._callback_list:
+        eingaben = [(_id(e["id"]), e["property"]) for e in callback["inputs"]]
+        if not any(passt(ausgabe, k) for ausgabe in ausgaben(callback) for k in vorhanden):
+            continue
+        treffer = set()
+        for muster, eigenschaft in eingaben:
+            for komponente, prop in list(geaendert):
+                if passt(muster, komponente) and prop == eigenschaft:
+                    treffer.add(json.dumps(komponente, sort_keys=True))
+        if not callback["prevent_initial_call"]:
+            #Neue Komponenten lösen Callbacks aus, deren Ein- oder Ausgaben sie sind
+            for muster in [muster for muster, _ in eingaben] + ausgaben(callback):
+                for komponente in neu:
+                    if passt(muster, komponente):
+                        treffer.add(json.dumps(komponente, sort_keys=True))
+        if not treffer:
+            continue
+        if "MATCH" in callback["output"]:
+            #Einmal pro Diagramm (scope, index)
+            anzahl = len({(k.get("scope"), k.get("index")) for k in map(json.loads, treffer) if isinstance(k, dict)})
+        else:
+            anzahl = 1
+        if callback["clientside_function"]:
+            client += anzahl
+        else:
+            server += anzahl
+    return server, client
+
+
+def panel(typ, scope, index):
+    return dashboard.panel_id(typ, scope, index)
+
+
+if __name__ == "__main__":
+    basis = komponenten(dashboard.serve_layout())
+    tab1 = komponenten(dashboard.tab_layout(dashboard.store.current, "tab-1"))
+    tab2 = komponenten(dashboard.tab_layout(dashboard.store.current, "tab-2"))
+
+    sitzung = [
+        ("Seite laden (Tab 1)", basis + tab1, basis + tab1, []),
+        ("Y-Attribut Diagramm 1", basis + tab1, [], [(panel('y-attribut', 'location', 1), 'value')]),
+        ("Diagrammtyp Diagramm 2", basis + tab1, [], [(panel('diagramm-auswahl', 'location', 2), 'value')]),
+        ("X-Attribut Diagramm 2", basis + tab1, [], [(panel('x-attribut', 'location', 2), 'value')]),
+        ("Länder ändern", basis + tab1, [], [('location-dropdown', 'value')]),
+        ("Zeitraum ändern", basis + tab1, [], [('my-date-picker-range', 'start_date')]),
+        ("Wechsel zu Tab 2", basis + tab1, [], [('card-tabs', 'active_tab')]),
+        ("Tab 2 aufbauen", basis + tab2, tab2, []),
+        ("Sonstiges Attribut Diagramm 3", basis + tab2, [], [(panel('sonstige-attribut', 'continent', 3), 'value')]),
+        ("Diagrammtyp Diagramm 4", basis + tab2, [], [(panel('diagramm-auswahl', 'continent', 4), 'value')]),
+        ("Y-Attribut Diagramm 4", basis + tab2, [], [(panel('y-attribut', 'continent', 4), 'value')]),
+    ]
+
+    print("%-32s %8s %8s" % ("Schritt", "Server", "Client"))
+    summe_server = summe_client = 0
+    for name, vorhanden, neu, geaendert in sitzung:
+        server, client = ausloesen(vorhanden, neu, geaendert)
+        summe_server += server
+        summe_client += client
+        print("%-32s %8d %8d" % (name, server, client))
+    print("%-32s %8d %8d" % ("Summe", summe_server, summe_client))
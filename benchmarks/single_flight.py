@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+CPU-Zeit für gleichzeitige, identische Diagramm-Requests (geteilter Link).
+
+N Clients schicken im selben Moment denselben Request an den Callback der
+Kontinent-Diagramme (Tab 2 in der Standardeinstellung, alle Kontinente), bei
+leerem Figuren-Cache. Gemessen wird die gesamte CPU-Zeit und wie oft die
+Figuren berechnet wurden, mit und ohne Single-Flight:
+
+    threads     N Threads in einem Worker (gunicorn --threads), Cache im Speicher
+    processes   N Worker-Prozesse (fork) mit gemeinsamem Cache-Verzeichnis
+
+Aufruf:
+    COVIDIAGRAMS_SNAPSHOT=data/owid-snapshot python benchmarks/single_flight.py [--clients 1 2 4 8 16 32]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+os.environ.setdefault("COVIDIAGRAMS_CACHE_DIR", "")
+os.environ.setdefault("COVIDIAGRAMS_REFRESH_INTERVAL", "0")
+os.environ.setdefault("COVIDIAGRAMS_CLIENT_SERIES", "0")
+
+import dashboard
+import loadtest
+from cache import FigureCache
+
+
+def cpu(wer=resource.RUSAGE_SELF):
+    nutzung = resource.getrusage(wer)
+    return nutzung.ru_utime + nutzung.ru_stime
+
+
+def anfrage():
+    #Request der Kontinent-Diagramme mit den Standardwerten des Layouts
+    client = dashboard.server.test_client()
+    layout = json.loads(client.get("/_dash-layout").data)
+    tabs = {tab: json.loads(client.post(loadtest.CALLBACK_PATH, json=loadtest.anfrage_tab(tab)).data)
+            ["response"]["card-content"]["children"] for tab in ["tab-1", "tab-2"]}
+    callbacks = loadtest.diagramm_callbacks(json.loads(client.get("/_dash-dependencies").data))
+    mix = loadtest.Mix(layout, tabs, callbacks, 0)
+    return loadtest.anfrage_diagramme(callbacks["continent"], sorted(mix.auswahl["continent"]),
+                                      mix.start, mix.ende, mix.werte["continent"])
+
+
+def senden(body):
+    antwort = dashboard.server.test_client().post(loadtest.CALLBACK_PATH, json=body)
+    assert antwort.status_code == 200, antwort.data[:200]
+
+
+def threads(body, n, single_flight):
+    dashboard.figure_cache = FigureCache(lambda: dashboard.store.current.version, single_flight=single_flight)
+    barriere = threading.Barrier(n)
+
+    def client():
+        barriere.wait()
+        senden(body)
+
+    start, wand = cpu(), time.perf_counter()
+    alle = [threading.Thread(target=client) for _ in range(n)]
+    for thread in alle:
+        thread.start()
+    for thread in alle:
+        thread.join()
+    return cpu() - start, time.perf_counter() - wand, dashboard.figure_cache.stats()
+
+
+def _worker(body, barriere, ergebnis):
+    barriere.wait()
+    senden(body)
+    ergebnis.put(dashboard.figure_cache.stats())
+
+
+def processes(body, n, single_flight):
+    verzeichnis = tempfile.mkdtemp(prefix="covidiagrams-flight-")
+    try:
+        dashboard.figure_cache = FigureCache(lambda: dashboard.store.current.version, directory=verzeichnis,
+                                             single_flight=single_flight)
+        kontext = multiprocessing.get_context("fork")
+        barriere, ergebnis = kontext.Barrier(n), kontext.Queue()
+        start, wand = cpu(resource.RUSAGE_CHILDREN), time.perf_counter()
+        alle = [kontext.Process(target=_worker, args=(body, barriere, ergebnis)) for _ in range(n)]
+        for prozess in alle:
+            prozess.start()
+        statistik = {}
+        for _ in alle:
+            for name, wert in ergebnis.get().items():
+                statistik[name] = statistik.get(name, 0) + wert
+        for prozess in alle:
+            prozess.join()
+        return cpu(resource.RUSAGE_CHILDREN) - start, time.perf_counter() - wand, statistik
+    finally:
+        shutil.rmtree(verzeichnis)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    body = anfrage()
+    senden(body)
+    print("%-10s %8s %14s %14s %14s %14s" % ("Modus", "Clients", "CPU aus [s]", "CPU ein [s]",
+                                             "berechnet aus", "berechnet ein"))
+    for modus, messen in [("threads", threads), ("processes", processes)]:
+        for n in args.clients:
+            werte = []
+            for single_flight in (False, True):
+                zeit, _, statistik = messen(body, n, single_flight)
+                #Berechnete Diagramm-Sätze: Cache-Fehler, die nicht nach dem Warten bedient wurden
+                berechnet = (statistik["misses"] - statistik["coalesced"]) // len(body["outputs"][-1])
+                werte.append((zeit, berechnet))
+            print("%-10s %8d %14.2f %14.2f %14d %14d" % (modus, n, werte[0][0], werte[1][0], werte[0][1], werte[1][1]))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Geglättete Tageswerte aller Länder eines Kontinents.
+
+Verglichen werden:
+    pandas      groupby("location") und pro Land rolling() über Kalendertage
+                bzw. cumsum() (der übliche Weg)
+    cube        Differenzen der Präfixsummen des Cubes für alle Länder auf
+                einmal (Dataset.location_per_day mit smoothing), einmal mit
+                leerem Cache der Raster und einmal mit gefülltem
+
+Beide Wege müssen dieselben Werte ergeben (bis auf Rundung), für die Länder
+und für die Tagesmittel des Kontinents, über den ganzen Zeitraum und die
+letzten 90 Tage (das Fenster reicht dann vor den Beginn des Zeitraums).
+
+Aufruf:
+    python benchmarks/smoothing.py [SNAPSHOT] [--continent Europe] [--window 7] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import snapshot
+from dataset import Dataset
+
+ATTRIBUTE = ["new_cases_per_million", "new_deaths_per_million", "total_cases_per_million"]
+MODI = ["mean", "sum", "growth", "cumulative"]
+
+
+def messen(funktion, repeat, vorher=None):
+    funktion()
+    zeiten = []
+    for _ in range(repeat):
+        if vorher is not None:
+            vorher()
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    zeiten.sort()
+    return zeiten[len(zeiten) // 2] * 1000
+
+
+def pandas_glaetten(df, gruppe, attribute, modus, fenster, start_date, end_date):
+    #Pro Gruppe rolling() über fenster Kalendertage auf allen Tagen, danach der Zeitraum
+    def glaetten(serie):
+        serie = serie.droplevel(0)
+        if modus == "cumulative":
+            serie = serie[start_date:end_date]
+            return serie.fillna(0).cumsum().where(serie.notna().cumsum() > 0)
+        rolling = serie.rolling("%dD" % fenster, min_periods=1)
+        if modus == "mean":
+            return rolling.mean()[start_date:end_date]
+        summe = rolling.sum()
+        if modus == "sum":
+            return summe[start_date:end_date]
+        #Summe der fenster Tage davor: gleitende Summe am Tag fenster Tage früher
+        vorher = pd.Series(summe.to_numpy(), index=summe.index + pd.Timedelta(days=fenster))
+        vorher = vorher.reindex(summe.index).where(lambda werte: werte != 0)
+        return ((summe / vorher - 1) * 100)[start_date:end_date]
+
+    gruppen = df.set_index([gruppe, "date"]).groupby(level=0, sort=False)
+    return pd.DataFrame({attribut: gruppen[attribut].apply(glaetten).to_numpy() for attribut in attribute})
+
+
+def unterschiede(name, erwartet, df, attribute):
+    fehler = []
+    for attribut in attribute:
+        a, b = erwartet[attribut].to_numpy(dtype=np.float64), df[attribut].to_numpy(dtype=np.float64)
+        if a.shape != b.shape:
+            fehler.append("%s %s: %s / %s Zeilen" % (name, attribut, a.shape, b.shape))
+        elif not np.allclose(a, b, rtol=1e-7, atol=1e-9 * np.nanmax(np.abs(a), initial=1), equal_nan=True):
+            fehler.append("%s %s: Werte" % (name, attribut))
+    return fehler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=os.environ.get("COVIDIAGRAMS_SNAPSHOT", snapshot.DEFAULT_PATH))
+    parser.add_argument("--continent", default="Europe")
+    parser.add_argument("--window", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    dataset = Dataset(args.path)
+    cube = dataset.cube
+    kontinent = [args.continent]
+    ende = dataset.newest_date
+    zeitraeume = [("ganzer Zeitraum", dataset.oldest_date), ("letzte 90 Tage", str(cube.dates[-90]))]
+    #Alle Tage der Länder für pandas, wie für die Glättung nötig
+    laender = dataset.location_per_day("continent", kontinent, dataset.oldest_date, ende, ATTRIBUTE)
+    tagesmittel = cube.continent_per_day(kontinent, dataset.oldest_date, ende, ATTRIBUTE)
+    print("%d Länder, %d Zeilen, %d Attribute, Fenster %d Tage" % (
+        laender["location"].nunique(), len(laender), len(ATTRIBUTE), args.window))
+
+    def leeren():
+        #Raster und Länder-Präfixsummen neu berechnen
+        cube._windows.clear()
+        cube._location.clear()
+
+    fehler = []
+    print("%-16s %-12s %12s %16s %16s %8s" % ("Zeitraum", "Modus", "pandas [ms]", "cube leer [ms]",
+                                              "cube Cache [ms]", "Faktor"))
+    for zeitraum, start in zeitraeume:
+        for modus in MODI:
+            def cube_glaetten():
+                return dataset.location_per_day("continent", kontinent, start, ende, ATTRIBUTE, smoothing=modus,
+                                                window=args.window)
+
+            erwartet = pandas_glaetten(laender, "location", ATTRIBUTE, modus, args.window, start, ende)
+            fehler += unterschiede("%s %s Länder" % (zeitraum, modus), erwartet, cube_glaetten(), ATTRIBUTE)
+            erwartet = pandas_glaetten(tagesmittel, "continent", ATTRIBUTE, modus, args.window, start, ende)
+            fehler += unterschiede("%s %s Kontinent" % (zeitraum, modus), erwartet,
+                                   cube.continent_per_day(kontinent, start, ende, ATTRIBUTE, smoothing=modus,
+                                                          window=args.window), ATTRIBUTE)
+
+            zeit_pandas = messen(lambda: pandas_glaetten(laender, "location", ATTRIBUTE, modus, args.window, start,
+                                                         ende), args.repeat)
+            zeit_leer = messen(cube_glaetten, args.repeat, vorher=leeren)
+            zeit_cache = messen(cube_glaetten, args.repeat)
+            print("%-16s %-12s %12.1f %16.1f %16.1f %7.0f×" % (zeitraum, modus, zeit_pandas, zeit_leer, zeit_cache,
+                                                               zeit_pandas / zeit_cache))
+    for text in fehler:
+        print("Unterschied: %s" % text)
+    sys.exit(1 if fehler else 0)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Startzeit-Benchmark: OWID-CSV einlesen gegenüber Snapshot laden.
+
+Aufruf:
+    python benchmarks/startup.py [CSV-QUELLE] [SNAPSHOT] [--repeat N]
+
+Fehlt der Snapshot, wird er vorher aus der CSV-Quelle erstellt.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot
+
+
+def messen(funktion, repeat):
+    zeiten = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    return min(zeiten), sum(zeiten) / len(zeiten)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", default=snapshot.OWID_URL)
+    parser.add_argument("path", nargs="?", default=snapshot.DEFAULT_PATH)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.path, snapshot.META_FILE)):
+        snapshot.write_snapshot(snapshot.read_owid_csv(args.source), args.path, source=args.source)
+
+    csv_min, csv_avg = messen(lambda: snapshot.read_owid_csv(args.source), args.repeat)
+    snap_min, snap_avg = messen(lambda: snapshot.read_snapshot(args.path), args.repeat)
+
+    print("Quelle:   %s" % args.source)
+    print("Snapshot: %s" % args.path)
+    print("%-20s %10s %10s" % ("", "min [s]", "avg [s]"))
+    print("%-20s %10.3f %10.3f" % ("CSV einlesen", csv_min, csv_avg))
+    print("%-20s %10.3f %10.3f" % ("Snapshot laden", snap_min, snap_avg))
+    print("Faktor: %.1fx" % (csv_min / snap_min))
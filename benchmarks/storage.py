@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Speicher pro Spaltentyp: Snapshot in kompakter Form (storage.py) gegenüber
+float64-Spalten und, mit --csv, gegenüber dem DataFrame mit den
+Standard-Datentypen von pandas (Text als object, Zahlen als float64).
+
+Der Snapshot wird dafür einmal in beiden Formen geschrieben. Zusätzlich die
+Zeit zum Öffnen des Datasets (Aggregate) und einer Auswahl über den ganzen
+Zeitraum; die Werte beider Formen müssen gleich sein.
+
+Aufruf:
+    python benchmarks/storage.py SNAPSHOT [--csv QUELLE] [--repeat N]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import snapshot
+import storage
+from dataset import Dataset
+
+
+def typ(eintrag):
+    if eintrag["kind"] != "numeric":
+        return {"category": "Kategorie (Codes)", "date": "Datum"}[eintrag["kind"]]
+    if eintrag.get("storage") == "sparse":
+        return "Zahl dünn" + (" float32" if "decimals" in eintrag else " float64")
+    return "Zahl float32" if "decimals" in eintrag else "Zahl float64"
+
+
+def schreiben(dataset, path, kompakt):
+    #Snapshot aus dem Dataset schreiben, ohne kompakte Form mit float64-Spalten
+    encode = storage.encode
+    if not kompakt:
+        storage.encode = lambda values: ({}, {"values": values})
+    try:
+        snapshot.write_snapshot(dataset.frame(slice(None)), path, codebook=dataset.codebook)
+    finally:
+        storage.encode = encode
+    return Dataset(path)
+
+
+def zeit(funktion, repeat):
+    zeiten = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    return min(zeiten) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--csv")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="covidiagrams-storage-")
+    try:
+        quelle = Dataset(args.path)
+        breit = schreiben(quelle, os.path.join(tmp, "float64"), kompakt=False)
+        kompakt = schreiben(quelle, os.path.join(tmp, "kompakt"), kompakt=True)
+        for name in kompakt.column_names:
+            assert np.array_equal(np.asarray(breit.columns[name]), np.asarray(kompakt.columns[name]),
+                                  equal_nan=True), name
+
+        typen = {eintrag["name"]: typ(eintrag) for eintrag in kompakt.meta["columns"]}
+        zeilen = {}
+        for name, art in typen.items():
+            zeile = zeilen.setdefault(art, [0, 0, 0, 0])
+            zeile[0] += 1
+            zeile[2] += breit.columns[name].nbytes
+            zeile[3] += kompakt.columns[name].nbytes
+        if args.csv:
+            df = snapshot.read_owid_csv(args.csv)
+            for name, groesse in df.memory_usage(deep=True, index=False).items():
+                if name in typen:
+                    zeilen[typen[name]][1] += groesse
+
+        print("%d Zeilen" % kompakt.rows)
+        print("%-22s %7s %14s %14s %14s" % ("Spaltentyp", "Spalten", "pandas [MB]", "float64 [MB]", "kompakt [MB]"))
+        for art, (anzahl, pandas, vorher, nachher) in sorted(zeilen.items()):
+            print("%-22s %7d %14s %14.1f %14.1f" % (art, anzahl, "%.1f" % (pandas / 1e6) if args.csv else "-",
+                                                    vorher / 1e6, nachher / 1e6))
+        summe = [sum(werte[i] for werte in zeilen.values()) for i in range(4)]
+        print("%-22s %7d %14s %14.1f %14.1f" % ("Summe", summe[0], "%.1f" % (summe[1] / 1e6) if args.csv else "-",
+                                                summe[2] / 1e6, summe[3] / 1e6))
+
+        print()
+        print("%-22s %14s %14s" % ("Laufzeit [ms]", "float64", "kompakt"))
+        for name, messung in [
+            ("Dataset öffnen", lambda d: Dataset(d.path)),
+            ("Auswahl Europa", lambda d: d.select("continent", ["Europe"], d.oldest_date, d.newest_date)),
+        ]:
+            print("%-22s %14.1f %14.1f" % (name, zeit(lambda: messung(breit), args.repeat),
+                                           zeit(lambda: messung(kompakt), args.repeat)))
+    finally:
+        shutil.rmtree(tmp)
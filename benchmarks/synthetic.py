@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetische Snapshots im Schema der OWID-Covid-Daten.
+
+Gleiche Spalten, Kontinente, Anzahl Länder pro Kontinent und ungefähr gleicher
+Anteil fehlender Werte wie der OWID-Datensatz Ende 2021 (nach dem Bereinigen
+rund 150'000 Zeilen). Fehlende Werte kommen wie bei OWID in Blöcken vor: ein
+Land meldet eine Grösse gar nicht oder erst ab einem bestimmten Tag. Mit
+--scale wird der Zeitraum verlängert, der Datensatz hat dann SCALE-mal so
+viele Zeilen.
+
+Der Snapshot wird Spalte für Spalte im Format von snapshot.py geschrieben;
+auch der 100-fache Datensatz muss dafür nicht als DataFrame in den Speicher
+passen.
+
+Aufruf:
+    python benchmarks/synthetic.py ZIELVERZEICHNIS [--scale 1] [--seed 0]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot
+import storage
+
+#Länder pro Kontinent wie im OWID-Datensatz; bekannte Länder mit echtem Namen und ISO-Code
+CONTINENTS = [("Africa", 55), ("Asia", 49), ("Europe", 51), ("North America", 39),
+              ("Oceania", 23), ("South America", 14)]
+KNOWN = {
+    "Africa": [("ZAF", "South Africa"), ("NGA", "Nigeria"), ("EGY", "Egypt")],
+    "Asia": [("CHN", "China"), ("IND", "India"), ("JPN", "Japan")],
+    "Europe": [("AUT", "Austria"), ("FRA", "France"), ("DEU", "Germany"), ("ITA", "Italy"),
+               ("ESP", "Spain"), ("CHE", "Switzerland"), ("GBR", "United Kingdom")],
+    "North America": [("CAN", "Canada"), ("MEX", "Mexico"), ("USA", "United States")],
+    "Oceania": [("AUS", "Australia"), ("NZL", "New Zealand")],
+    "South America": [("ARG", "Argentina"), ("BRA", "Brazil"), ("CHL", "Chile")],
+}
+START = np.datetime64("2020-01-01")
+#Tage bei Faktor 1; die Reihen beginnen pro Land um bis zu MAX_OFFSET Tage später
+DAYS = 700
+MAX_OFFSET = 90
+
+TESTS_UNITS = ["tests performed", "people tested", "samples tested", "units unclear"]
+
+#Spalten in der Reihenfolge der OWID-CSV: (Name, Art, Anteil fehlender Werte)
+#Arten: neu (Tageswert), kumuliert, geglättet, rate (begrenzte Grösse), statisch (pro Land)
+COLUMNS = [
+    ("total_cases", "kumuliert", 0.03), ("new_cases", "neu", 0.03), ("new_cases_smoothed", "geglaettet", 0.04),
+    ("total_deaths", "kumuliert", 0.12), ("new_deaths", "neu", 0.12), ("new_deaths_smoothed", "geglaettet", 0.12),
+    ("total_cases_per_million", "kumuliert", 0.03), ("new_cases_per_million", "neu", 0.03),
+    ("new_cases_smoothed_per_million", "geglaettet", 0.04), ("total_deaths_per_million", "kumuliert", 0.12),
+    ("new_deaths_per_million", "neu", 0.12), ("new_deaths_smoothed_per_million", "geglaettet", 0.12),
+    ("reproduction_rate", "rate", 0.25), ("icu_patients", "neu", 0.87), ("icu_patients_per_million", "neu", 0.87),
+    ("hosp_patients", "neu", 0.85), ("hosp_patients_per_million", "neu", 0.85),
+    ("weekly_icu_admissions", "neu", 0.96), ("weekly_icu_admissions_per_million", "neu", 0.96),
+    ("weekly_hosp_admissions", "neu", 0.93), ("weekly_hosp_admissions_per_million", "neu", 0.93),
+    ("total_tests", "kumuliert", 0.58), ("new_tests", "neu", 0.6), ("total_tests_per_thousand", "kumuliert", 0.58),
+    ("new_tests_per_thousand", "neu", 0.6), ("new_tests_smoothed", "geglaettet", 0.5),
+    ("new_tests_smoothed_per_thousand", "geglaettet", 0.5), ("positive_rate", "rate", 0.55),
+    ("tests_per_case", "rate", 0.56), ("tests_units", "kategorie", 0.48),
+    ("total_vaccinations", "kumuliert", 0.76), ("people_vaccinated", "kumuliert", 0.77),
+    ("people_fully_vaccinated", "kumuliert", 0.79), ("total_boosters", "kumuliert", 0.95),
+    ("new_vaccinations", "neu", 0.8), ("new_vaccinations_smoothed", "geglaettet", 0.55),
+    ("total_vaccinations_per_hundred", "kumuliert", 0.76), ("people_vaccinated_per_hundred", "kumuliert", 0.77),
+    ("people_fully_vaccinated_per_hundred", "kumuliert", 0.79), ("total_boosters_per_hundred", "kumuliert", 0.95),
+    ("new_vaccinations_smoothed_per_million", "geglaettet", 0.55), ("new_people_vaccinated_smoothed", "geglaettet", 0.55),
+    ("new_people_vaccinated_smoothed_per_hundred", "geglaettet", 0.55), ("stringency_index", "rate", 0.2),
+    ("population", "statisch", 0.0), ("population_density", "statisch", 0.08), ("median_age", "statisch", 0.1),
+    ("aged_65_older", "statisch", 0.11), ("aged_70_older", "statisch", 0.1), ("gdp_per_capita", "statisch", 0.1),
+    ("extreme_poverty", "statisch", 0.4), ("cardiovasc_death_rate", "statisch", 0.1),
+    ("diabetes_prevalence", "statisch", 0.07), ("female_smokers", "statisch", 0.3), ("male_smokers", "statisch", 0.31),
+    ("handwashing_facilities", "statisch", 0.58), ("hospital_beds_per_thousand", "statisch", 0.18),
+    ("life_expectancy", "statisch", 0.01), ("human_development_index", "statisch", 0.03),
+    ("excess_mortality_cumulative_absolute", "kumuliert", 0.97), ("excess_mortality_cumulative", "rate", 0.97),
+    ("excess_mortality", "rate", 0.97), ("excess_mortality_cumulative_per_million", "kumuliert", 0.97),
+]
+
+#Tageswerte pro Einwohner nach Stichwort im Spaltennamen
+LEVELS = [("boosters", 2e-3), ("vaccin", 4e-3), ("tests", 2e-3), ("deaths", 2e-6), ("icu", 1e-5),
+          ("hosp", 6e-5), ("excess", 3e-6), ("cases", 1.5e-4)]
+PER_CAPITA = [("_per_million", 1e6), ("_per_thousand", 1e3), ("_per_hundred", 1e2)]
+#Wertebereich der begrenzten Grössen
+RATES = {"reproduction_rate": (0.5, 1.8), "positive_rate": (0.0, 0.35), "tests_per_case": (3.0, 400.0),
+         "stringency_index": (0.0, 90.0), "excess_mortality_cumulative": (-10.0, 40.0), "excess_mortality": (-20.0, 80.0)}
+STATIC = {"population_density": (2.0, 1000.0), "median_age": (15.0, 48.0), "aged_65_older": (1.0, 27.0),
+          "aged_70_older": (0.5, 18.0), "gdp_per_capita": (700.0, 100000.0), "extreme_poverty": (0.1, 77.0),
+          "cardiovasc_death_rate": (80.0, 700.0), "diabetes_prevalence": (1.0, 22.0), "female_smokers": (0.1, 44.0),
+          "male_smokers": (7.0, 78.0), "handwashing_facilities": (1.0, 99.0), "hospital_beds_per_thousand": (0.1, 13.0),
+          "life_expectancy": (53.0, 85.0), "human_development_index": (0.39, 0.96)}
+
+
+def locations():
+    #(iso_code, continent, location), alphabetisch nach Land wie in der OWID-CSV
+    laender = []
+    for continent, anzahl in CONTINENTS:
+        bekannt = KNOWN[continent]
+        laender += [(iso, continent, name) for iso, name in bekannt]
+        #AF, AS, EU, NA, OC, SA
+        woerter = continent.split()
+        kuerzel = (woerter[0][0] + woerter[1][0] if len(woerter) > 1 else continent[:2]).upper()
+        laender += [("%s%03d" % (kuerzel, i), continent, "%s %d" % (continent, i))
+                    for i in range(1, anzahl - len(bekannt) + 1)]
+    return sorted(laender, key=lambda land: land[2])
+
+
+def _codes(werte, kategorien):
+    #Integer-Codes wie pd.Categorical (kleinster vorzeichenbehafteter Typ, -1 = fehlt)
+    typ = np.int8 if len(kategorien) < 128 else np.int16 if len(kategorien) < 32768 else np.int32
+    return np.asarray(werte, dtype=typ)
+
+
+def _fehlend(rng, land, position, laengen, anteil):
+    #Blöcke fehlender Werte: ein Teil der Länder meldet gar nicht, die übrigen erst ab
+    #einem zufälligen Tag; dazu vereinzelte Lücken
+    if anteil <= 0:
+        return np.zeros(len(land), dtype=bool)
+    nie = max(anteil / 2, 2 * anteil - 1)
+    ab = rng.uniform(0, min(1.0, 2 * (anteil - nie) / (1 - nie)), len(laengen)) * laengen
+    ab[rng.random(len(laengen)) < nie] = np.inf
+    return (position < ab[land]) | (rng.random(len(land)) < 0.01)
+
+
+def _segment_cumsum(werte, grenzen):
+    #Kumulierte Summe innerhalb jedes Landes (Zeilenbereiche grenzen[l]:grenzen[l + 1])
+    summe = np.cumsum(werte)
+    vorher = np.concatenate([[0.0], summe])[grenzen[:-1]]
+    return summe - np.repeat(vorher, np.diff(grenzen))
+
+
+def generate(path, scale=1, seed=0):
+    rng = np.random.default_rng(seed)
+    laender = locations()
+    n_laender = len(laender)
+    tage = int(DAYS * scale)
+    #Jedes Land beginnt etwas später und hat Werte bis zum letzten Tag
+    versatz = rng.integers(0, MAX_OFFSET + 1, n_laender)
+    laengen = tage - versatz
+    grenzen = np.concatenate([[0], np.cumsum(laengen)])
+    land = np.repeat(np.arange(n_laender), laengen)
+    #Zeile innerhalb des Landes und Tag seit START
+    position = np.arange(len(land)) - np.repeat(grenzen[:-1], laengen)
+    tag = position + versatz[land]
+
+    einwohner = np.exp(rng.normal(np.log(8e6), 1.6, n_laender))
+    #Wellen pro Land: Phase und Stärke
+    phase = rng.uniform(0, 2 * np.pi, n_laender)
+    staerke = np.exp(rng.normal(0, 0.6, n_laender))
+    welle = (1.0 + 0.9 * np.sin(2 * np.pi * tag / 180.0 + phase[land])) * staerke[land]
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    spalten = []
+
+    def speichern(name, art, werte, kategorien=None):
+        eintrag = {"name": name, "file": "%03d.npy" % len(spalten), "kind": art}
+        if kategorien is not None:
+            eintrag["categories"] = kategorien
+        storage.save(path, eintrag, werte)
+        spalten.append(eintrag)
+
+    iso_codes = [l[0] for l in laender]
+    kontinente = list(dict.fromkeys(l[1] for l in laender))
+    kontinent_code = np.array([kontinente.index(l[1]) for l in laender])
+    speichern("iso_code", "category", _codes(land, iso_codes), iso_codes)
+    speichern("continent", "category", _codes(kontinent_code[land], kontinente), kontinente)
+    speichern("location", "category", _codes(land, [l[2] for l in laender]), [l[2] for l in laender])
+    speichern("date", "date", (START + tag.astype("timedelta64[D]")).astype("datetime64[ns]"))
+
+    for name, art, anteil in COLUMNS:
+        if art == "kategorie":
+            einheit = rng.integers(0, len(TESTS_UNITS), n_laender)
+            codes = np.where(_fehlend(rng, land, position, laengen, anteil), -1, einheit[land])
+            speichern(name, "category", _codes(codes, TESTS_UNITS), TESTS_UNITS)
+            continue
+        if art == "statisch":
+            if name == "population":
+                werte = einwohner
+            else:
+                unten, oben = STATIC[name]
+                werte = rng.uniform(unten, oben, n_laender)
+                werte[rng.random(n_laender) < anteil] = np.nan
+            speichern(name, "numeric", np.round(werte, 3)[land])
+            continue
+        if art == "rate":
+            unten, oben = RATES[name]
+            werte = unten + (oben - unten) * (0.5 + 0.5 * np.sin(2 * np.pi * tag / 120.0 + phase[land]))
+        else:
+            niveau = next(faktor for stichwort, faktor in LEVELS if stichwort in name)
+            werte = welle * (einwohner * niveau)[land]
+            if art != "geglaettet":
+                werte = werte * rng.lognormal(0, 0.35, len(land))
+            if art == "kumuliert":
+                werte = _segment_cumsum(werte, grenzen)
+            for endung, faktor in PER_CAPITA:
+                if name.endswith(endung):
+                    werte = werte / einwohner[land] * faktor
+        werte[_fehlend(rng, land, position, laengen, anteil)] = np.nan
+        speichern(name, "numeric", np.round(werte, 3))
+
+    meta = {
+        "format": snapshot.FORMAT_VERSION,
+        "rows": len(land),
+        "columns": spalten,
+        "source": "synthetic scale=%s seed=%d" % (scale, seed),
+        "created": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+    }
+    with open(os.path.join(path, snapshot.META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    pd.DataFrame({
+        "column": [eintrag["name"] for eintrag in spalten],
+        "source": "synthetic",
+        "category": "synthetic",
+        "description": ["Synthetic values shaped like OWID's %s" % eintrag["name"] for eintrag in spalten],
+    }).to_csv(os.path.join(path, snapshot.CODEBOOK_FILE), index=False)
+    return meta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    meta = generate(args.path, args.scale, args.seed)
+    print("%s: %d Zeilen, %d Spalten" % (args.path, meta["rows"], len(meta["columns"])))
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Latenz und Antwortgrösse beim Tab-Wechsel (Callback tab_content).
+
+Der Callback wird über den Flask-Testclient aufgerufen, wie es der Browser
+beim Wechsel des Tabs tut: einmal als erster Aufruf nach dem Start und dann
+wiederholt (Minimum). Zusätzlich die Grösse des Seitenlayouts, das einmal pro
+Seitenaufruf geladen wird.
+
+Aufruf:
+    COVIDIAGRAMS_SNAPSHOT=data/owid-snapshot python benchmarks/tab_content.py [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("COVIDIAGRAMS_CACHE_DIR", "")
+
+import dashboard
+
+TABS = ["tab-1", "tab-2", "tab-3"]
+
+
+def anfrage(tab):
+    return {
+        "output": "card-content.children",
+        "outputs": {"id": "card-content", "property": "children"},
+        "inputs": [{"id": "card-tabs", "property": "active_tab", "value": tab}],
+        "changedPropIds": ["card-tabs.active_tab"],
+    }
+
+
+def aufrufen(client, tab):
+    start = time.perf_counter()
+    antwort = client.post("/_dash-update-component", json=anfrage(tab),
+                          headers={"Accept-Encoding": "identity"})
+    zeit = (time.perf_counter() - start) * 1000
+    assert antwort.status_code == 200, antwort.data[:200]
+    return zeit, len(antwort.data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = dashboard.server.test_client()
+    layout = client.get("/_dash-layout", headers={"Accept-Encoding": "identity"})
+    print("Seitenlayout: %d Bytes" % len(layout.data))
+
+    print("%-8s %14s %14s %10s" % ("Tab", "erster [ms]", "danach [ms]", "Bytes"))
+    for tab in TABS:
+        erster, _ = aufrufen(client, tab)
+        zeiten = []
+        for _ in range(args.repeat):
+            zeit, groesse = aufrufen(client, tab)
+            zeiten.append(zeit)
+        print("%-8s %14.2f %14.2f %10d" % (tab, erster, min(zeiten), groesse))
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Speicherbedarf pro zusätzlichem Worker messen (nur Linux, /proc/<pid>/smaps_rollup).
+
+Der Master lädt die Daten wie Gunicorn mit preload_app, friert den Heap mit
+gc.freeze() ein und forkt N Worker. Jeder Worker führt eine Auswahl über den
+ganzen Zeitraum aus (wie ein Diagramm-Callback) und meldet seinen privaten
+Speicher (USS) und seinen proportionalen Anteil (PSS).
+
+Verglichen werden:
+    csv        DataFrame direkt aus der CSV mit Text-Spalten (bisheriger Stand)
+    dataframe  typisierter DataFrame aus dem Snapshot komplett im Speicher
+    mmap       Dataset mit memory-mapped Spalten (dataset.py)
+
+Mit --no-preload lädt jeder Worker die Daten selbst (Gunicorn ohne preload_app).
+
+Aufruf:
+    python benchmarks/worker_memory.py [SNAPSHOT] [--csv QUELLE] [--workers N] [--no-preload]
+"""
+
+import argparse
+import gc
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot
+from dataset import Dataset
+
+
+def speicher(pid="self"):
+    #Pss und privaten Speicher (Private_Clean + Private_Dirty) in kB lesen
+    werte = {}
+    with open("/proc/%s/smaps_rollup" % pid) as f:
+        for zeile in f:
+            teile = zeile.split()
+            if len(teile) == 3 and teile[2] == "kB":
+                werte[teile[0].rstrip(":")] = int(teile[1])
+    return werte["Pss"], werte["Private_Clean"] + werte["Private_Dirty"]
+
+
+def arbeit_dataframe(df):
+    auswahl = df[(df["date"] >= "2020-01-01") & df["continent"].isin(["Europe"])]
+    return auswahl.groupby(["location"], observed=True).mean(numeric_only=True)
+
+
+def arbeit_mmap(dataset):
+    auswahl = dataset.select("continent", ["Europe"], "2020-01-01", dataset.newest_date)
+    return auswahl.groupby(["location"]).mean(numeric_only=True)
+
+
+def laden(backend, quelle):
+    if backend == "csv":
+        return snapshot.read_owid_csv(quelle), arbeit_dataframe
+    if backend == "dataframe":
+        return snapshot.read_snapshot(quelle)[0], arbeit_dataframe
+    return Dataset(quelle), arbeit_mmap
+
+
+def messen(backend, quelle, workers, preload):
+    if preload:
+        daten, arbeit = laden(backend, quelle)
+        arbeit(daten)
+        gc.collect()
+        gc.freeze()
+
+    #Alle Worker laufen gleichzeitig und messen erst, wenn jeder seine Auswahl
+    #ausgeführt hat, damit geteilte Seiten auch als geteilt gezählt werden
+    master_pss, master_uss = speicher()
+    kinder = []
+    for _ in range(workers):
+        an_kind, von_master = os.pipe()
+        an_master, von_kind = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(von_master)
+            os.close(an_master)
+            if not preload:
+                daten, arbeit = laden(backend, quelle)
+            arbeit(daten)
+            os.write(von_kind, b"bereit")
+            os.read(an_kind, 1)
+            os.write(von_kind, ("%d %d" % speicher()).encode())
+            os.read(an_kind, 1)
+            os._exit(0)
+        os.close(an_kind)
+        os.close(von_kind)
+        kinder.append((pid, von_master, an_master))
+    for _, _, an_master in kinder:
+        os.read(an_master, 6)
+    ergebnisse = []
+    for _, von_master, an_master in kinder:
+        os.write(von_master, b"m")
+        ergebnisse.append(tuple(int(x) for x in os.read(an_master, 64).split()))
+    for pid, von_master, an_master in kinder:
+        os.write(von_master, b"x")
+        os.close(von_master)
+        os.close(an_master)
+        os.waitpid(pid, 0)
+    gc.unfreeze()
+
+    uss = sum(e[1] for e in ergebnisse) / len(ergebnisse)
+    pss = sum(e[0] for e in ergebnisse) / len(ergebnisse)
+    print("%-10s %-10s master USS %8.1f MB | pro Worker USS %8.1f MB, PSS %8.1f MB"
+          % (backend, "preload" if preload else "no-preload", master_uss / 1024, uss / 1024, pss / 1024))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=snapshot.DEFAULT_PATH)
+    parser.add_argument("--csv", help="OWID-CSV für den Vergleich mit dem bisherigen Stand")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--no-preload", dest="preload", action="store_false")
+    args = parser.parse_args()
+
+    varianten = [("dataframe", args.path), ("mmap", args.path)]
+    if args.csv:
+        varianten.insert(0, ("csv", args.csv))
+    #Jede Variante in einem eigenen Prozess messen, damit sich die Heaps nicht vermischen
+    for backend, quelle in varianten:
+        pid = os.fork()
+        if pid == 0:
+            messen(backend, quelle, args.workers, args.preload)
+            os._exit(0)
+        os.waitpid(pid, 0)
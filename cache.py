@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Serverseitiger Cache für die Diagramme der Callbacks.
+
+Viele Besucher öffnen das Dashboard mit derselben Auswahl. Die fertigen
+Figuren werden deshalb als JSON unter einem Schlüssel aus Callback-Name,
+Datenstand (Dataset.version) und normalisierten Eingaben abgelegt:
+
+    - im Speicher des Workers (LRU mit Ablaufzeit)
+    - optional in einem lokalen Verzeichnis, das sich alle Gunicorn-Worker teilen
+
+Ändert sich der Snapshot, ändert sich auch der Schlüssel; alte Einträge werden
+nicht mehr getroffen und laufen ab.
+
+Fehlt ein Eintrag, rechnet ihn nur ein Request (single_flight): gleichzeitige
+Requests mit denselben Schlüsseln warten im Worker auf ein Lock und zwischen
+den Workern auf eine Sperrdatei im Cache-Verzeichnis und lesen danach das
+Ergebnis aus dem Cache.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import stage
+
+_DATUM = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def normalize(value):
+    #Eingaben vergleichbar machen: Mehrfachauswahl ohne Reihenfolge, Datum ohne Uhrzeit
+    if isinstance(value, (list, tuple)):
+        return tuple(sorted(normalize(v) for v in value))
+    if isinstance(value, str) and _DATUM.match(value):
+        return value[:10]
+    return value
+
+
+class FigureCache:
+
+    def __init__(self, version, max_entries=256, ttl=3600, directory=None, max_files=2000, single_flight=True):
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.max_files = max_files
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0}
+        self.single_flight = single_flight
+        #Laufende Berechnungen: Schlüssel -> [Lock, Anzahl Requests]
+        self._flights = {}
+        if directory:
+            os.makedirs(os.path.join(directory, "locks"), exist_ok=True)
+
+    def key(self, name, args, version=None):
+        #version: Datenstand, aus dem die Figur berechnet wird; ohne Angabe der aktuelle.
+        #Wechselt der Datenstand während eines Callbacks, landet die Figur so
+        #trotzdem unter dem Stand, aus dem sie stammt
+        if version is None:
+            version = self.version()
+        roh = json.dumps([name, version, [normalize(a) for a in args]], default=str)
+        return hashlib.sha1(roh.encode("utf-8")).hexdigest()
+
+    def _count(self, zaehler):
+        with self._lock:
+            self.counters[zaehler] += 1
+
+    def get(self, key):
+        jetzt = time.time()
+        with self._lock:
+            eintrag = self._entries.get(key)
+            if eintrag is not None:
+                if jetzt - eintrag[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return eintrag[1]
+                del self._entries[key]
+        if self.directory:
+            pfad = os.path.join(self.directory, key + ".json")
+            try:
+                if jetzt - os.path.getmtime(pfad) < self.ttl:
+                    with open(pfad, encoding="utf-8") as f:
+                        daten = f.read()
+                    self._remember(key, daten, os.path.getmtime(pfad))
+                    self._count("disk_hits")
+                    return daten
+            except OSError:
+                pass
+        self._count("misses")
+        return None
+
+    def _remember(self, key, daten, zeit):
+        with self._lock:
+            self._entries[key] = (zeit, daten)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set(self, key, daten):
+        self._remember(key, daten, time.time())
+        if self.directory:
+            #Atomar schreiben, damit andere Worker nie eine halbe Datei lesen
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(daten)
+            os.replace(tmp, os.path.join(self.directory, key + ".json"))
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune()
+
+    def _prune(self):
+        #Abgelaufene und überzählige Dateien (die ältesten zuerst) löschen
+        try:
+            dateien = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                       if name.endswith(".json")]
+            dateien.sort(key=os.path.getmtime)
+            sperren = [os.path.join(self.directory, "locks", name)
+                       for name in os.listdir(os.path.join(self.directory, "locks"))]
+        except OSError:
+            return
+        grenze = time.time() - self.ttl
+        for i, pfad in enumerate(dateien):
+            try:
+                if i < len(dateien) - self.max_files or os.path.getmtime(pfad) < grenze:
+                    os.remove(pfad)
+            except OSError:
+                pass
+        for pfad in sperren:
+            try:
+                if os.path.getmtime(pfad) < grenze:
+                    os.remove(pfad)
+            except OSError:
+                pass
+
+    @contextmanager
+    def flight(self, keys):
+        #Fehlende Einträge keys nur in einem Request berechnen. Gibt True zurück,
+        #wenn ein anderer Request sie gerade berechnet hat: dann zuerst den Cache
+        #erneut lesen (resolve) und nur noch berechnen, was weiterhin fehlt
+        if not self.single_flight:
+            yield False
+            return
+        key = hashlib.sha1("".join(keys).encode("ascii")).hexdigest()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = [threading.Lock(), 0]
+            flight[1] += 1
+        try:
+            gewartet = not flight[0].acquire(blocking=False)
+            if gewartet:
+                with stage("wait"):
+                    flight[0].acquire()
+            try:
+                if self.directory:
+                    with open(os.path.join(self.directory, "locks", key), "w") as sperre:
+                        try:
+                            fcntl.flock(sperre, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except OSError:
+                            #Ein anderer Worker rechnet
+                            gewartet = True
+                            with stage("wait"):
+                                fcntl.flock(sperre, fcntl.LOCK_EX)
+                        yield gewartet
+                else:
+                    yield gewartet
+            finally:
+                flight[0].release()
+        finally:
+            with self._lock:
+                flight[1] -= 1
+                if flight[1] == 0:
+                    del self._flights[key]
+
+    def resolve(self, key):
+        #Eintrag nach dem Warten auf einen anderen Request lesen
+        with self._lock:
+            eintrag = self._entries.get(key)
+            if eintrag is not None:
+                self._entries.move_to_end(key)
+        daten = eintrag[1] if eintrag is not None else None
+        if daten is None and self.directory:
+            try:
+                with open(os.path.join(self.directory, key + ".json"), encoding="utf-8") as f:
+                    daten = f.read()
+                self._remember(key, daten, time.time())
+            except OSError:
+                pass
+        if daten is not None:
+            self._count("coalesced")
+        return daten
+
+    def stats(self):
+        with self._lock:
+            statistik = dict(self.counters)
+            statistik["entries"] = len(self._entries)
+        #Zusammengelegte Requests wurden zuerst als misses gezählt und dann aus dem Cache bedient
+        anfragen = statistik["memory_hits"] + statistik["disk_hits"] + statistik["misses"]
+        treffer = anfragen - statistik["misses"] + statistik["coalesced"]
+        statistik["hit_rate"] = treffer / anfragen if anfragen else 0.0
+        return statistik
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Dimensionskatalog eines Snapshots: Länder, Kontinente und ISO-Codes mit
+Integer-Codes.
+
+Der Katalog wird beim Laden in einem vektorisierten Durchgang über die
+Code-Spalten gebaut (die Zeilen sind nach Land und Datum sortiert). Pro Land
+stehen Kontinent, ISO-Code, erstes und letztes Datum und der Zeilenbereich
+bereit, pro Kontinent seine Länder. Filter und Aggregate arbeiten mit den
+Codes; Namen werden erst für die Ausgabe an Plotly nachgeschlagen (label).
+Fehlende Werte haben den Code -1 und werden als None ausgegeben.
+"""
+
+import numpy as np
+
+#Schlüsselspalten, die für Plotly Express als Text ausgegeben werden
+KEY_COLUMNS = ["iso_code", "continent", "location"]
+
+
+class Catalog:
+
+    def __init__(self, categories, location, continent, iso_code, date):
+        #Namen als Object-Arrays (Code -> Name) und Dictionaries (Name -> Code)
+        self.names = {name: np.asarray(categories[name], dtype=object) for name in KEY_COLUMNS}
+        self._codes = {name: {wert: code for code, wert in enumerate(categories[name])} for name in KEY_COLUMNS}
+
+        location = np.asarray(location, dtype=np.int64)
+        n_laender = len(self.names["location"])
+        #Zeilenbereich jedes Landes: location_offsets[l] bis location_offsets[l + 1]
+        self.location_offsets = np.searchsorted(location, np.arange(n_laender + 1))
+        erste, letzte = self.location_offsets[:-1], self.location_offsets[1:] - 1
+        #Kontinent und ISO-Code jedes Landes (aus den Zeilen des Landes, -1 wenn keine einen hat)
+        self.location_continent = _per_location(continent, erste, self.location_offsets)
+        self.location_iso_code = _per_location(iso_code, erste, self.location_offsets)
+        #Erstes und letztes Datum jedes Landes
+        self.location_first_date = np.asarray(date[erste], dtype="datetime64[ns]")
+        self.location_last_date = np.asarray(date[letzte], dtype="datetime64[ns]")
+
+        #Alphabetischer Rang der Länder, wie groupby(["location", ...]) sortiert
+        self.location_rank = np.empty(n_laender, dtype=np.int64)
+        self.location_rank[np.argsort(self.names["location"], kind="stable")] = np.arange(n_laender)
+
+        #Länder jedes Kontinents, alphabetisch
+        reihenfolge = np.lexsort((self.location_rank, self.location_continent))
+        grenzen = np.searchsorted(self.location_continent[reihenfolge], np.arange(len(self.names["continent"]) + 1))
+        self.continent_locations = [reihenfolge[a:b] for a, b in zip(grenzen[:-1], grenzen[1:])]
+
+    def label(self, column, codes):
+        #Namen zu Codes einer Schlüsselspalte; fehlende Werte (Code -1) als None statt des letzten Namens
+        codes = np.asarray(codes, dtype=np.int64)
+        namen = np.full(codes.shape, None, dtype=object)
+        vorhanden = codes >= 0
+        namen[vorhanden] = self.names[column][codes[vorhanden]]
+        return namen
+
+    def codes(self, column, values):
+        #Werte einer Schlüsselspalte in ihre Integer-Codes übersetzen (unbekannte fallen weg)
+        codes = self._codes[column]
+        return np.array([codes[wert] for wert in values if wert in codes], dtype=np.int64)
+
+    def locations(self, column, values):
+        #Codes der ausgewählten Länder bzw. der Länder der ausgewählten Kontinente, alphabetisch
+        codes = self.codes(column, values)
+        if column == "location":
+            laender = np.unique(codes)
+        elif len(codes):
+            laender = np.concatenate([self.continent_locations[code] for code in codes])
+        else:
+            laender = codes
+        return laender[np.argsort(self.location_rank[laender], kind="stable")]
+
+
+def _per_location(codes, erste, offsets):
+    #Grösster Code der Zeilen jedes Landes: der Wert des Landes, auch wenn einzelne Zeilen fehlen (-1)
+    codes = np.asarray(codes, dtype=np.int64)
+    ergebnis = np.full(len(erste), -1, dtype=np.int64)
+    vorhanden = offsets[1:] > erste
+    if vorhanden.any():
+        ergebnis[vorhanden] = np.maximum.reduceat(codes, erste[vorhanden])
+    return ergebnis
@@ -3,19 +3,34 @@
 @author: Marina Inglin
 """
 
-import pandas as pd
-import plotly.express as px
-import numpy as np
+import os
+import json
 import dash
 from dash import dcc
 from dash import html
 import dash_bootstrap_components as dbc
-from datetime import datetime, timedelta
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State, ALL, MATCH, ClientsideFunction
+from dash.exceptions import PreventUpdate
+import flask
+from flask_compress import Compress
+import snapshot
+from dataset import DatasetStore, open_dataset
+from refresh import Refresher
+from cache import FigureCache
+from metrics import Metrics
+from export import Export
+from diagrams import (CHARTS, FILTERS, GRANULARITIES, RANKING_CHARTS, RANKING_SIZES, RANKINGS, SMOOTHING,
+                      SMOOTHING_CHARTS, WINDOWS, Diagram, point_budget, render_panels)
+from series import MAX_VALUES, figure_defaults, series_key, series_store
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 app.title = "CoviDiagrams"
 server = app.server
+#Antworten (v.a. die Figuren der Callbacks) mit Brotli bzw. gzip komprimieren
+server.config["COMPRESS_ALGORITHM"] = os.environ.get("COVIDIAGRAMS_COMPRESS", "br,gzip").split(",")
+server.config["COMPRESS_BR_LEVEL"] = 4
+server.config["COMPRESS_LEVEL"] = 6
+Compress(server)
 app.config.suppress_callback_exceptions = True
 #-------------------------------------------------------
 # DATEN
@@ -23,97 +38,230 @@ app.config.suppress_callback_exceptions = True
 
 #Daten am Bildschirm ausgeben
 import plotly.io as pio
+from plotly.io.json import to_json_plotly
 pio.renderers.default = "browser"
 
-#Covid-Daten einlesen
-df = pd.read_csv("https://covid.ourworldindata.org/data/owid-covid-data.csv")
-#Codebook einlesen
-df_codebook = pd.read_csv("https://raw.githubusercontent.com/owid/covid-19-data/28810794703c2e8ff1b37b8d08fef6e8f69880c2/public/data/owid-covid-codebook.csv")
-#Liste der Variablen aus Codebook
-df_attribute_codebook = df_codebook['column'].tolist()
-
-#Leerzellen rausfiltern und Zeilen bei denen continent keinen Wert haben löschen
-df.replace("", np.NaN, inplace=True)
-df.dropna(subset=['continent'], axis=0, inplace=True)
-df.dropna(subset=['location'], axis=0, inplace=True)
-
-#Länderliste aus Datenquelle um Länder-Dropdown automatisch zu erstellen
-location_column = df['location'].tolist()
-location_list = []
-for i in location_column:
-    if i not in location_list:
-        location_list.append(i)
-        
-#Kontinentliste aus Datenquelle um Kontinent-Dropdown automatisch zu erstellen
-continent_column = df['continent'].tolist()
-continent_list = []
-for i in continent_column:
-    if i not in continent_list:
-        continent_list.append(i)
-
-#Start- und Enddatum aus Datenquelle für Date-Picker
-date_column = df['date'].tolist()
-oldest_date = min(date_column)
-newest_date = max(date_column)
-#Defaultwerte die Daten
-startdatum=oldest_date
-#-- startdatum = (datetime.strptime(newest_date, "%Y-%m-%d")) - timedelta(days=7)
-enddatum = newest_date
-
-#Liste der Attribute die in den Dropdown Filter zur Auswahl stehen sollen
-attribute_list = df.columns.tolist()
-#Attribute die nicht zur Auswahl stehen sollen entfernen
-if 'iso_code' in attribute_list:
-    attribute_list.remove('iso_code')
-
-if 'continent' in attribute_list:
-    attribute_list.remove('continent')    
-
-if 'location' in attribute_list:
-    attribute_list.remove('location')  
-
-if 'date' in attribute_list:
-    attribute_list.remove('date')    
-
-if 'tests_units' in attribute_list:
-    attribute_list.remove('tests_units')      
-                 
+#Covid-Daten und Codebook aus dem Snapshot öffnen (wird mit snapshot.py erstellt).
+#Die Spalten sind memory-mapped und werden von allen Gunicorn-Workern geteilt.
+SNAPSHOT_PATH = os.environ.get("COVIDIAGRAMS_SNAPSHOT", snapshot.DEFAULT_PATH)
+#Der aktuelle Datenstand wird im Hintergrund aktualisiert (siehe refresh.py);
+#Callbacks lesen ihn jeweils einmal mit store.current und arbeiten danach nur mit
+#diesem (schreibgeschützten) Dataset, auch wenn ein anderer Thread inzwischen
+#einen neuen Stand einwechselt
+store = DatasetStore(open_dataset(SNAPSHOT_PATH))
+REFRESH_INTERVAL = float(os.environ.get("COVIDIAGRAMS_REFRESH_INTERVAL", 3600))
+refresher = Refresher(store, SNAPSHOT_PATH,
+                      source=os.environ.get("COVIDIAGRAMS_REFRESH_SOURCE", snapshot.OWID_URL),
+                      interval=REFRESH_INTERVAL)
+df_codebook = store.current.codebook
+#Beschreibung jeder Variable aus dem Codebook, wird einmal an den Browser geschickt
+codebook_beschreibungen = dict(zip(df_codebook['column'], df_codebook['description']))
+
+#Cache für fertige Diagramme (im Worker und in einem von allen Workern geteilten Verzeichnis);
+#COVIDIAGRAMS_CACHE_DIR="" schaltet den Verzeichnis-Cache aus
+CACHE_DIR = os.environ.get("COVIDIAGRAMS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(SNAPSHOT_PATH)), "cache"))
+figure_cache = FigureCache(lambda: store.current.version, directory=CACHE_DIR or None)
+
+#Ausdünnen der Tageswerte in Linien- und Streudiagrammen: "minmax", "lttb" oder "off"
+DECIMATION = os.environ.get("COVIDIAGRAMS_DECIMATION", "minmax")
+#Daten-Arrays der Figuren verkleinern (Datum ohne Uhrzeit, float32 bzw. gerundet), "0" schaltet aus
+COMPACT_FIGURES = os.environ.get("COVIDIAGRAMS_COMPACT", "1") != "0"
+#Figuren eines Requests in so vielen Threads parallel bauen (1 = nacheinander)
+RENDER_THREADS = int(os.environ.get("COVIDIAGRAMS_RENDER_THREADS", 1))
+#Tagesreihen einer Auswahl mit bis zu so vielen Werten (Zeilen × Attribute) an den Browser schicken,
+#der neue Zeiträume dann selbst zeichnet (siehe series.py); "0" zeichnet immer auf dem Server
+CLIENT_SERIES = int(os.environ.get("COVIDIAGRAMS_CLIENT_SERIES", MAX_VALUES))
 
 #-------------------------------------------------------
 #LAYOUT
 #-------------------------------------------------------
 
-app.layout = html.Div(
-    [       
-         #Header
-         dbc.Row(dbc.Col(html.H1("CoviDiagrams"), className="header", width=12)),
+def dropdown_options(dataset):
+    #Optionen der Länder-, Kontinent- und Attribut-Dropdowns eines Datenstands
+    return {
+        "location": [{'label': x, 'value': x} for x in dataset.location_list],
+        "continent": [{'label': x, 'value': x} for x in dataset.continent_list],
+        "attribute": [{'label': x.replace("_", " "), 'value': x} for x in dataset.attribute_list],
+    }
+
+def serve_layout():
+    #Bei jedem Laden der Seite neu gebaut, damit Version und Dropdowns zum aktuellen Datenstand passen
+    return html.Div(
+        [       
+             #Header
+             dbc.Row(dbc.Col(html.H1("CoviDiagrams"), className="header", width=12)),
      
-         #Tabs
-         dbc.Row(dbc.Col(children=[
-                 dbc.CardHeader(
-                 dbc.Tabs(
-                        [
-                            dbc.Tab(label="By Country", tab_id="tab-1"),
-                            dbc.Tab(label="By Continent", tab_id="tab-2"),
-                            dbc.Tab(label="About", tab_id="tab-3", tab_style={"marginLeft": "auto"}),
-                        ],
-                        id="card-tabs",
-                        active_tab="tab-1",
-                 )),
-                 dbc.CardBody(id="card-content", className="card-text"),
-             ], className="tabs", width=12)),
+             #Tabs
+             dbc.Row(dbc.Col(children=[
+                     dbc.CardHeader(
+                     dbc.Tabs(
+                            [
+                                dbc.Tab(label="By Country", tab_id="tab-1"),
+                                dbc.Tab(label="By Continent", tab_id="tab-2"),
+                                dbc.Tab(label="About", tab_id="tab-3", tab_style={"marginLeft": "auto"}),
+                            ],
+                            id="card-tabs",
+                            active_tab="tab-1",
+                     )),
+                     dbc.CardBody(id="card-content", className="card-text"),
+                 ], className="tabs", width=12)),
                 
-         #Footer
-         dbc.Row(dbc.Col(html.Div(children=[
-                html.P(['The complete COVID-19 dataset is a collection of the COVID-19 data maintained by ', 
-                        html.A("Our World in Data.", href ="https://ourworldindata.org/coronavirus", target="_blank"),
-                        html.Br(), 
-                        'The dataset and more information about it can be found ',
-                        html.A("here.", href ="https://github.com/owid/covid-19-data/tree/master/public/data", target="_blank")
-                        ]),
-
-                ]), className="footer", width=12)),    
-],className = 'container')
+             #Footer
+             dbc.Row(dbc.Col(html.Div(children=[
+                    html.P(['The complete COVID-19 dataset is a collection of the COVID-19 data maintained by ', 
+                            html.A("Our World in Data.", href ="https://ourworldindata.org/coronavirus", target="_blank"),
+                            html.Br(), 
+                            'The dataset and more information about it can be found ',
+                            html.A("here.", href ="https://github.com/owid/covid-19-data/tree/master/public/data", target="_blank")
+                            ]),
+
+                    ]), className="footer", width=12)),    
+
+             #Prüft regelmässig, ob ein neuer Datenstand eingewechselt wurde
+             dcc.Interval(id="refresh-interval", interval=max(REFRESH_INTERVAL, 60) * 1000,
+                          disabled=REFRESH_INTERVAL <= 0),
+             dcc.Store(id="dataset-version", data=store.current.version),
+             #Fensterbreite im Browser, bestimmt das Punktebudget der Tageswerte
+             dcc.Store(id="viewport-width"),
+             #Codebook für die Beschreibungen der Attribute (clientseitig nachgeschlagen)
+             dcc.Store(id="codebook", data=codebook_beschreibungen),
+             #Optionen der Dropdowns, einmal geschickt und von allen Dropdowns verwendet
+             dcc.Store(id="dropdown-options", data=dropdown_options(store.current)),
+             #Template, Farben usw. der Figuren, die der Browser aus den Tagesreihen zeichnet
+             dcc.Store(id="figure-defaults", data=figure_defaults()),
+    ],className = 'container')
+
+app.layout = serve_layout
+
+#-----------------
+#DIAGRAMME
+#-----------------
+#Diagramme pro Tab: Bereich und voreingestellter Diagrammtyp je Diagramm.
+#Ein weiterer Eintrag ergibt ein weiteres Diagramm, die Callbacks passen sich an.
+PANELS = [
+    ("tab-1", "location", ['1', '2']),
+    ("tab-2", "continent", ['4', '5']),
+]
+
+def panel_id(typ, scope, index):
+    return {"type": typ, "scope": scope, "index": index}
+
+def scope_id(typ, scope):
+    return "%s-%s" % (scope, typ)
+
+def diagramm_panels(active_tab):
+    #Diagramme des Tabs, durchnummeriert über alle Tabs
+    panels = []
+    nummer = 0
+    for tab, scope, charts in PANELS:
+        for chart in charts:
+            nummer += 1
+            if tab == active_tab:
+                panels.append(diagramm_panel(scope, nummer, chart))
+    return panels
+
+def attribut_filter(achse, scope, index, titel, value, vorher=(), nachher=()):
+    #Dropdown eines Attributs mit Beschreibung aus dem Codebook
+    #(Optionen aus dem Store "dropdown-options", siehe register_attribut)
+    return html.Div(id=panel_id(achse + '-filter', scope, index), 
+                children = list(vorher) + [
+                    html.H3(titel),
+                    dcc.Dropdown(id=panel_id(achse + '-attribut', scope, index),
+                            value = value,
+                            persistence=True,
+                            persistence_type="memory"),
+                    html.Div(id=panel_id(achse + '-beschreibung', scope, index), className="variableDescription"),
+                    ] + list(nachher), style= {'display': 'block'})
+
+def diagramm_panel(scope, index, chart):
+    #Filter X Attribut mit Auswahl Tageswerte / Mittelwert über den Zeitraum
+    x_radio = [dcc.RadioItems(id=panel_id('x-radio', scope, index),
+                    options=[
+                        {'label': ' Values per day', 'value': 'on'},
+                        {'label': ' Average value over the selected time period', 'value': 'off'}
+                        ],
+                    value='on',
+                    persistence=True,
+                    persistence_type="memory",
+                    labelStyle={'display': 'block'}),
+               html.Br()]
+    #Filter Y Attribut, bei Kontinenten mit Auswahl pro Land / pro Kontinent
+    y_radio = []
+    if scope == "continent":
+        y_radio = [html.Br(),
+                   dcc.RadioItems(id=panel_id('y-radio', scope, index),
+                        options=[
+                            {'label': ' Values per country (per continent)', 'value': 'on'},
+                            {'label': ' Average over countries (per continent)', 'value': 'off'}
+                            ],
+                        value='off',
+                        persistence=True,
+                        persistence_type="memory",
+                        labelStyle={'display': 'block'})]
+    filter = [attribut_filter('x', scope, index, "Select X-Axis:", 'new_deaths_per_million', vorher=x_radio),
+              attribut_filter('y', scope, index, "Select Y-Axis:", 'new_cases_per_million', nachher=y_radio)]
+    #Filter für Sonstige Attribute (Treemap, Choropleth)
+    if scope == "continent":
+        filter.append(attribut_filter('sonstige', scope, index, "Select:", 'new_cases_per_million'))
+    #Glättung der Tageswerte (Linien- und Streudiagramm) mit Fenster in Tagen, Auflösung Tag/Woche/Monat
+    filter.append(html.Div(id=panel_id('glaettung-filter', scope, index),
+                children = [
+                    html.H3("Smoothing:"),
+                    dcc.Dropdown(id=panel_id('glaettung', scope, index),
+                            options = [{"label": label, "value": value} for label, value, _ in SMOOTHING],
+                            value = 'off',
+                            clearable=False,
+                            persistence=True,
+                            persistence_type="memory"),
+                    html.H3("Window:"),
+                    dcc.Dropdown(id=panel_id('fenster', scope, index),
+                            options = [{"label": "%d days" % tage, "value": tage} for tage in WINDOWS],
+                            value = 7,
+                            clearable=False,
+                            persistence=True,
+                            persistence_type="memory"),
+                    html.H3("Resolution:"),
+                    dcc.Dropdown(id=panel_id('aufloesung', scope, index),
+                            options = [{"label": label, "value": value} for label, value, _ in GRANULARITIES],
+                            value = 'auto',
+                            clearable=False,
+                            persistence=True,
+                            persistence_type="memory"),
+                    ], style= {'display': 'block'}))
+    #Rangliste: höchste bzw. tiefste Werte und Anzahl Länder
+    filter.append(html.Div(id=panel_id('rangliste-filter', scope, index),
+                children = [
+                    html.H3("Ranking:"),
+                    dcc.Dropdown(id=panel_id('rangfolge', scope, index),
+                            options = [{"label": label, "value": value} for label, value in RANKINGS],
+                            value = 'top',
+                            clearable=False,
+                            persistence=True,
+                            persistence_type="memory"),
+                    html.H3("Countries:"),
+                    dcc.Dropdown(id=panel_id('anzahl', scope, index),
+                            options = [{"label": "%d" % anzahl, "value": anzahl} for anzahl in RANKING_SIZES],
+                            value = 10,
+                            clearable=False,
+                            persistence=True,
+                            persistence_type="memory"),
+                    ], style= {'display': 'none'}))
+
+    return dbc.Col(html.Div(children=[
+                html.H2("Diagram %d" % index),
+                dcc.Dropdown(id=panel_id('diagramm-auswahl', scope, index),
+                            options = [{"label": label, "value": value} for label, value in CHARTS[scope]
+                                       ],
+                            value = chart,
+                            multi = False,
+                            persistence=True,
+                            persistence_type="memory",
+                            style = {"width": "100%"}), 
+                dcc.Graph(id=panel_id('diagramm-graph', scope, index)),
+                #Figur vom Server bzw. Beschreibung des Diagramms, wenn der Browser selbst zeichnet
+                dcc.Store(id=panel_id('diagramm-figur', scope, index)),
+                ] + filter), className="diagramm", lg=5, md=12)
+
 
 #-----------------
 #TABS
@@ -122,6 +270,30 @@ app.layout = html.Div(
     Output("card-content", "children"), [Input("card-tabs", "active_tab")]
 )
 def tab_content(active_tab):
+    #Layout pro Datenstand und Tab nur einmal bauen und als fertige JSON-Struktur ausliefern
+    global tab_layouts
+    dataset = store.current
+    schluessel = (dataset.version, active_tab)
+    layout = tab_layouts.get(schluessel)
+    if layout is None:
+        layout = json.loads(to_json_plotly(tab_layout(dataset, active_tab)))
+        #Layouts älterer Datenstände verwerfen
+        tab_layouts = {k: v for k, v in tab_layouts.items() if k[0] == dataset.version}
+        tab_layouts[schluessel] = layout
+    return layout
+
+tab_layouts = {}
+
+def tab_layout(dataset, active_tab):
+    #Länder-, Kontinent- und Attribut-Optionen kommen aus dem Store "dropdown-options"
+    #Start- und Enddatum aus Datenquelle für Date-Picker
+    oldest_date = dataset.oldest_date
+    newest_date = dataset.newest_date
+    #Defaultwerte die Daten
+    startdatum=oldest_date
+    #-- startdatum = (datetime.strptime(newest_date, "%Y-%m-%d")) - timedelta(days=7)
+    enddatum = newest_date
+
     if active_tab is not None:
         #TAB1 - LÄNDER
         if active_tab == "tab-1":
@@ -133,8 +305,6 @@ def tab_content(active_tab):
                                 #DROPDOWN LÄNDERAUSWAHL
                                 html.H3("Select country:"),     
                                      dcc.Dropdown(id='location-dropdown',
-                                     options = [{'label': x, 'value': x} for x in location_list
-                                                ],
                                      value = ["Switzerland", "Austria", "Germany"],
                                      multi = True,
                                      searchable=True,
@@ -158,136 +328,14 @@ def tab_content(active_tab):
                                      persistence=True,
                                      persistence_type="memory",
                                      ),
+                                #Tagesreihen für das Zeichnen im Browser, ihr Schlüssel und Zeitraum für den Server (siehe register_diagramme)
+                                dcc.Store(id=scope_id('tagesreihen', 'location')),
+                                dcc.Store(id=scope_id('tagesreihen-schluessel', 'location')),
+                                dcc.Store(id=scope_id('zeitraum', 'location')),
                                 ]), className="global_filter", lg=2, md=12),
                             
-                            #DIAGRAMM1
-                            dbc.Col(html.Div(children=[
-                                #DROPDOWN1
-                                html.H2("Diagram 1"),
-                                dcc.Dropdown(id='diagramm1_auswahl',
-                                            options = [
-                                                 {"label": "line diagram", "value": '1'},
-                                                 {"label": "bar chart", "value": '2'},
-                                                 {"label": "scatter plot", "value": '3'},
-                                                 ],
-                                            value = '1',
-                                            multi = False,
-                                            persistence=True,
-                                            persistence_type="memory",
-                                            style = {"width": "100%"}), 
-                                #GRAPH1
-                                dcc.Graph(id='diagramm1_graph'),
-                                #FILTER1
-                                    #Attribut Filter unter Diagramm 1
-                                    #Filter X Attribut von Diagramm 1
-                                    html.Div(id="diagramm1_x_attribute_filter", 
-                                        children = [
-                                            #Radio Filter X Attribut Diagramm 1
-                                            dcc.RadioItems(id='diagramm1_x_radio_filter',
-                                                options=[
-                                                    {'label': ' Values per day', 'value': 'on'},
-                                                    {'label': ' Average value over the selected time period', 'value': 'off'}
-                                                    ],
-                                                value='on',
-                                                persistence=True,
-                                                persistence_type="memory",
-                                                labelStyle={'display': 'block'}), 
-                                            
-                                            html.Br(),  
-                                            #Dropdown X Attribut von Diagramm 1
-                                            html.H3("Select X-Axis:"),
-                                            dcc.Dropdown(id='diagramm1_dropdown_x_attribute',
-                                                    options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                               ],
-                                                    value = 'new_deaths_per_million',
-                                                    persistence=True,
-                                                    persistence_type="memory"),
-                                                    #X Variable Description für Diagamm 1
-                                                    html.Div(id='diagramm1_description_x_attribut', className="variableDescription" )               
-                                                    ], style= {'display': 'block'}), 
-                                       
-                                    #Filter Y Attribut von Diagramm 1
-                                    html.Div(id="diagramm1_y_attribute_filter", 
-                                        children = [
-                                        #Dropdown Y Attribut von Diagramm 1
-                                        html.H3("Select Y-Axis:"),
-                                        dcc.Dropdown(id='diagramm1_dropdown_y_attribute',
-                                                options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                           ],
-                                                value = 'new_cases_per_million',
-                                                persistence=True,
-                                                persistence_type="memory"),
-                                                #Y Variable Description für Diagramm 1
-                                                html.Div(id='diagramm1_description_y_attribut', className="variableDescription" )               
-                                                ], style= {'display': 'block'}),
-                                    
-                                ]), className="diagramm", lg=5, md=12),
-
-
-                            #DIAGRAMM2
-                            dbc.Col(html.Div(children=[
-                                #DROPDOWN2
-                                html.H2("Diagram 2"),
-                                dcc.Dropdown(id='diagramm2_auswahl',
-                                            options = [
-                                                 {"label": "line diagram", "value": '1'},
-                                                 {"label": "bar chart", "value": '2'},
-                                                 {"label": "scatter plot", "value": '3'},
-                                                 ],
-                                            value = '2',
-                                            multi = False,
-                                            persistence=True,
-                                            persistence_type="memory",
-                                            style = {"width": "100%"}),   
-                                #GRAPH2
-                                    dcc.Graph(id='diagramm2_graph'),
-                                #FILTER2
-                                  #Attribut Filter unter Diagramm2
-                                  #Filter X-Attribut von Diagramm 2
-                                  html.Div(id="diagramm2_x_attribute_filter", 
-                                      children = [
-                                      #Radio Filter X Attribut Diagramm 2
-                                      dcc.RadioItems(id='diagramm2_x_radio_filter',
-                                      options=[
-                                                  {'label': ' Values per day', 'value': 'on'},
-                                                  {'label': ' Average value over the selected time period', 'value': 'off'}
-                                                  ],
-                                      value='on',
-                                      persistence=True,
-                                      persistence_type="memory",
-                                      labelStyle={'display': 'block'}),   
-                                      
-                                      html.Br(),  
-                                      #Dropdown X Attribut von Diagramm 2 
-                                      html.H3("Select X-Axis:"),
-                                      dcc.Dropdown(id='diagramm2_dropdown_x_attribute',
-                                              options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                         ],                                    
-                                              value = 'new_deaths_per_million',
-                                              persistence=True,
-                                              persistence_type="memory"),
-                                              #X Variable Description für Diagamm 2
-                                              html.Div(id='diagramm2_description_x_attribut', className="variableDescription" )               
-                                              ], style= {'display': 'block'}),
-                                  
-                                  
-                                  #Filter Y-Attribut von Diagramm 2
-                                  html.Div(id="diagramm2_y_attribute_filter", 
-                                      children = [
-                                      #Dropdown Y Attribut von Diagramm 2
-                                      html.H3("Select Y-Axis:"),
-                                      dcc.Dropdown(id='diagramm2_dropdown_y_attribute',
-                                              options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                         ],                                        
-                                              value = 'new_cases_per_million',
-                                              persistence=True,
-                                              persistence_type="memory"),
-                                              #Y Variable Description für Diagamm 2
-                                              html.Div(id='diagramm2_description_y_attribut', className="variableDescription" )               
-                                              ], style= {'display': 'block'}),
-                                                    
-                                ]), className="diagramm", lg=5, md=12),
-                        ]
+                            #DIAGRAMME (siehe PANELS)
+                        ] + diagramm_panels("tab-1")
                     ),
         #TAB2
         elif active_tab == "tab-2":
@@ -299,8 +347,6 @@ def tab_content(active_tab):
                                 #Kontinente
                                 html.H3("Select continent:"),     
                                      dcc.Dropdown(id='continent-dropdown',
-                                     options = [{'label': x, 'value': x} for x in continent_list
-                                                ],
                                      value = ["Europe"],
                                      multi = True,
                                      searchable=True,
@@ -323,196 +369,14 @@ def tab_content(active_tab):
                                      end_date=enddatum,
                                      persistence=True,
                                      persistence_type="memory"                                     ),
+                                #Tagesreihen für das Zeichnen im Browser und Zeitraum für den Server (siehe register_diagramme)
+                                dcc.Store(id=scope_id('tagesreihen', 'continent')),
+                                dcc.Store(id=scope_id('tagesreihen-schluessel', 'continent')),
+                                dcc.Store(id=scope_id('zeitraum', 'continent')),
                                 ]), className="global_filter", lg=2, md=12),
                             
-                            #DIAGRAMM3
-                            dbc.Col(html.Div(children=[
-                                #DROPDOWN3
-                                html.H2("Diagram 3"),
-                                dcc.Dropdown(id='diagramm3_auswahl',
-                                            options = [
-                                                 {"label": "line diagram", "value": '1'},
-                                                 {"label": "bar chart", "value": '2'},
-                                                 {"label": "scatter plot", "value": '3'},
-                                                 {"label": "treemap", "value": '4'},
-                                                 {"label": "choropleth", "value": '5'},
-                                                 ],
-                                            value = '4',
-                                            multi = False,
-                                            persistence=True,
-                                            persistence_type="memory",
-                                            style = {"width": "100%"}), 
-                                #GRAPH3
-                                dcc.Graph(id='diagramm3_graph'),
-                                #FILTER3
-                                    #Attribut Filter unter Diagramm 3
-                                    #Filter X-Attribut von Diagramm 3
-                                    html.Div(id="diagramm3_x_attribute_filter", 
-                                        children = [
-                                            #Radio Filter X Attribut Diagramm 3 
-                                            dcc.RadioItems(id='diagramm3_x_radio_filter',
-                                                options=[
-                                                    {'label': ' Values per day', 'value': 'on'},
-                                                    {'label': ' Average value over the selected time period', 'value': 'off'}
-                                                    ],
-                                                value='on',
-                                                persistence=True,
-                                                persistence_type="memory",
-                                                labelStyle={'display': 'block'}),   
-                                        
-                                        html.Br(),
-                                        #Dropdown X Attribut von Diagramm 3
-                                        html.H3("Select X-Axis:"),
-                                        dcc.Dropdown(id='diagramm3_dropdown_x_attribute',
-                                                options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                           ],
-                                                value = 'new_deaths_per_million',
-                                                persistence=True,
-                                                persistence_type="memory"),
-                                                #X Variable Description für Diagamm 3
-                                                html.Div(id='diagramm3_description_x_attribut', className="variableDescription")               
-                                                ], style= {'display': 'block'}),
-                                       
-                                    #Filter Y-Attribut von Diagramm 3
-                                    html.Div(id="diagramm3_y_attribute_filter", 
-                                        children = [
- 
-                                        #Dropdown Y Attribut von Diagramm 3 
-                                        html.H3("Select Y-Axis:"),
-                                        dcc.Dropdown(id='diagramm3_dropdown_y_attribute',
-                                                options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                           ],
-                                                value = 'new_cases_per_million',
-                                                persistence=True,
-                                                persistence_type="memory"),
-                                                #Y Variable Description für Diagamm 3
-                                                html.Div(id='diagramm3_description_y_attribut', className="variableDescription"),
-                                         html.Br(),                                        
-                                         #Radio Filter Y Attribut Diagramm 3                                   
-                                         dcc.RadioItems(id='diagramm3_y_radio_filter',
-                                                options=[
-                                                    {'label': ' Values per country (per continent)', 'value': 'on'},
-                                                    {'label': ' Average over countries (per continent)', 'value': 'off'}
-                                                    ],
-                                                value='off',
-                                                persistence=True,
-                                                persistence_type="memory",
-                                                labelStyle={'display': 'block'}),                                         
-                                                                   
-                                        ], style= {'display': 'block'}),                                            
-
-                                    #Filter links für Sonstige Attribute
-                                    html.Div(id="diagramm3_sonstige_attribute_filter", 
-                                        children = [
-                                        #Dropdown Sonstige Attribut von Diagramm 3
-                                        html.H3("Select:"),
-                                        dcc.Dropdown(id='diagramm3_dropdown_sonstige_attribute',
-                                                options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                           ],
-                                                value = 'new_cases_per_million',
-                                                persistence=True,
-                                                persistence_type="memory"),
-                                                #Sonstige Variable Description für Diagamm 3
-                                                html.Div(id='diagramm3_description_sonstige_attribut', className="variableDescription")               
-                                                ], style= {'display': 'block'}),  
-                                        
-                                ]), className="diagramm", lg=5, md=12),
-
-
-                            #DIAGRAMM4
-                            dbc.Col(html.Div(children=[
-                                #DROPDOWN4
-                                html.H2("Diagram 4"),
-                                dcc.Dropdown(id='diagramm4_auswahl',
-                                            options = [
-                                                 {"label": "line diagram", "value": '1'},
-                                                 {"label": "bar chart", "value": '2'},
-                                                 {"label": "scatter plot", "value": '3'},
-                                                 {"label": "treemap", "value": '4'},
-                                                 {"label": "choropleth", "value": '5'},
-                                                 ],
-                                            value = '5',
-                                            multi = False,
-                                            persistence=True,
-                                            persistence_type="memory",
-                                            style = {"width": "100%"}), 
-                                #GRAPH4
-                                dcc.Graph(id='diagramm4_graph'),
-                                #FILTER4
-                                    #Filter unter Diagramm 4
-                                    #Filter  X Attribut Diagramm 4
-                                    html.Div(id="diagramm4_x_attribute_filter", 
-                                        children = [
-                                            #Radio Filter X Attribut Diagramm 4
-                                            dcc.RadioItems(id='diagramm4_x_radio_filter',
-                                                options=[
-                                                    {'label': ' Values per day', 'value': 'on'},
-                                                    {'label': ' Average value over the selected time period', 'value': 'off'}
-                                                    ],
-                                                value='on',
-                                                persistence=True,
-                                                persistence_type="memory",
-                                                labelStyle={'display': 'block'}),   
-                                        
-                                        html.Br(),
-                                        #Dropdown X Attribut von Diagramm 4 
-                                        html.H3("Select X-Axis:"),
-                                        dcc.Dropdown(id='diagramm4_dropdown_x_attribute',
-                                                options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                           ],
-                                                value = 'new_deaths_per_million',
-                                                persistence=True,
-                                                persistence_type="memory"),
-                                                #X Variable Description für Diagamm 4
-                                                html.Div(id='diagramm4_description_x_attribut', className="variableDescription")               
-                                                ], style= {'display': 'block'}),
-                                       
-                                    #Filter links für Y Attribut
-                                    html.Div(id="diagramm4_y_attribute_filter", 
-                                        children = [
-                                          
-                                       #Dropdown Y Attribut von Diagramm 4 
-                                        html.H3("Select Y-Axis:"),
-                                        dcc.Dropdown(id='diagramm4_dropdown_y_attribute',
-                                                options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                           ],
-                                                #Standard Wert
-                                                value = 'new_cases_per_million',
-                                                persistence=True,
-                                                persistence_type="memory"),
-                                                #Y Variable Description für Diagamm 4
-                                                html.Div(id='diagramm4_description_y_attribut', className="variableDescription"),
-                                        html.Br(),                                        
-                                        #Radio Filter Y Attribut Diagramm 4 
-                                         dcc.RadioItems(id='diagramm4_y_radio_filter',
-                                                options=[
-                                                    {'label': ' Values per country (per continent)', 'value': 'on'},
-                                                    {'label': ' Average over countries (per continent)', 'value': 'off'}
-                                                    ],
-                                                value='off',
-                                                persistence=True,
-                                                persistence_type="memory",
-                                                labelStyle={'display': 'block'}),                                         
-                                                                   
-                                        ], style= {'display': 'block'}),                                            
-
-                                    #Filter links für Sonstige Attribute
-                                    html.Div(id="diagramm4_sonstige_attribute_filter", 
-                                        children = [
-                                        #Dropdown Sonstige Attribut von Diagramm 4
-                                        html.H3("Select:"),
-                                        dcc.Dropdown(id='diagramm4_dropdown_sonstige_attribute',
-                                                options = [{'label': x.replace("_", " "), 'value': x} for x in attribute_list
-                                                           ],
-                                                value = 'new_cases_per_million',
-                                                persistence=True,
-                                                persistence_type="memory"),
-                                                #Sonstige Variable Description für Diagamm 4
-                                                html.Div(id='diagramm4_description_sonstige_attribut', className="variableDescription")               
-                                                ], style= {'display': 'block'}),  
-                                        
-                                ]), className="diagramm", lg=5, md=12),
-                        ]
+                            #DIAGRAMME (siehe PANELS)
+                        ] + diagramm_panels("tab-2")
                     ),
         #TAB3
         elif active_tab == "tab-3":
@@ -528,463 +392,224 @@ def tab_content(active_tab):
 
 
 #----------------
-# Diagramm 1
+# Diagramme
 #----------------
-@app.callback(Output('diagramm1_graph', 'figure'),
-    [Input('location-dropdown', 'value'),
-     Input('my-date-picker-range', 'start_date'),
-     Input('my-date-picker-range', 'end_date'),
-     Input('diagramm1_auswahl', 'value'),
-     Input('diagramm1_dropdown_y_attribute', 'value'),
-     Input('diagramm1_dropdown_x_attribute', 'value'),
-     Input('diagramm1_x_radio_filter', 'value')
-     ]
+#Eingaben eines Diagramms und die zugehörigen Argumente von Diagram
+DIAGRAMM_FELDER = {
+    "location": [('diagramm-auswahl', 'chart'), ('y-attribut', 'y_attribut'), ('x-attribut', 'x_attribut'),
+                 ('x-radio', 'x_radio'), ('glaettung', 'smoothing'), ('fenster', 'window'),
+                 ('aufloesung', 'granularity'), ('rangfolge', 'ranking'), ('anzahl', 'ranking_size')],
+    "continent": [('diagramm-auswahl', 'chart'), ('y-attribut', 'y_attribut'), ('x-attribut', 'x_attribut'),
+                  ('sonstige-attribut', 'sonstige_attribut'), ('x-radio', 'x_radio'), ('y-radio', 'y_radio'),
+                  ('glaettung', 'smoothing'), ('fenster', 'window'), ('aufloesung', 'granularity'),
+                  ('rangfolge', 'ranking'), ('anzahl', 'ranking_size')],
+}
+#Globaler Filter des Tabs
+SCOPE_DROPDOWN = {"location": 'location-dropdown', "continent": 'continent-dropdown'}
+
+def register_diagramme(scope):
+    felder = DIAGRAMM_FELDER[scope]
+
+    #Alle Diagramme des Tabs in einem Request; Diagramme mit derselben Auswahl teilen sich die Daten.
+    #Bei kleinen Auswahlen gehen nur die Tagesreihen und die Beschreibung der Diagramme an den
+    #Browser, der die Figuren selbst zeichnet; sonst die Figuren. Hat der Browser die Tagesreihen
+    #mit demselben Schlüssel schon, bleibt der Store unverändert. Der Zeitraum löst den Request nur
+    #über den Store "zeitraum" aus, den der Browser ohne Tagesreihen setzt (Datenstand: neue
+    #Tagesreihen bzw. Figuren)
+    @app.callback(Output(scope_id('tagesreihen', scope), 'data'),
+        Output(scope_id('tagesreihen-schluessel', scope), 'data'),
+        Output(panel_id('diagramm-figur', scope, ALL), 'data'),
+        Input(SCOPE_DROPDOWN[scope], 'value'),
+        Input(scope_id('zeitraum', scope), 'data'),
+        Input('dataset-version', 'data'),
+        *[Input(panel_id(typ, scope, ALL), 'value') for typ, _ in felder],
+        State(scope_id('tagesreihen-schluessel', scope), 'data'),
+        State('my-date-picker-range', 'start_date'),
+        State('my-date-picker-range', 'end_date'),
+        State('viewport-width', 'data')
+    )
+    def update_diagramme(auswahl, zeitraum, version, *werte):
+        *werte, schluessel, start_date, end_date, breite = werte
+        points = point_budget(breite)
+        diagrams = [Diagram(scope, points=points, decimation=DECIMATION,
+                            **{name: wert for (_, name), wert in zip(felder, panel)})
+                    for panel in zip(*werte)]
+        dataset = store.current
+        key = series_key(dataset, scope, auswahl, diagrams, max_values=CLIENT_SERIES)
+        if key is not None:
+            beschreibungen = [{"diagram": dict(vars(diagram))} for diagram in diagrams]
+            if key == schluessel:
+                return dash.no_update, dash.no_update, beschreibungen
+            return (series_store(dataset, scope, auswahl, diagrams, cache=figure_cache, max_values=CLIENT_SERIES),
+                    key, beschreibungen)
+        return None, None, render_panels(dataset, scope, auswahl, start_date, end_date, diagrams,
+                                         cache=figure_cache, compact=COMPACT_FIGURES, threads=RENDER_THREADS)
+
+    #Neuer Zeitraum: ohne Tagesreihen an den Server, sonst zeichnet der Browser
+    app.clientside_callback(
+        ClientsideFunction(namespace="covidiagrams", function_name="zeitraum"),
+        Output(scope_id('zeitraum', scope), 'data'),
+        Input('my-date-picker-range', 'start_date'),
+        Input('my-date-picker-range', 'end_date'),
+        State(scope_id('tagesreihen', scope), 'data')
+    )
+
+    #Figuren der Diagramme aus den Tagesreihen bzw. vom Server (assets/diagrams.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace="covidiagrams", function_name="diagramme"),
+        Output(panel_id('diagramm-graph', scope, ALL), 'figure'),
+        Input(scope_id('tagesreihen', scope), 'data'),
+        Input(panel_id('diagramm-figur', scope, ALL), 'data'),
+        Input('my-date-picker-range', 'start_date'),
+        Input('my-date-picker-range', 'end_date'),
+        State('figure-defaults', 'data')
+    )
+    return update_diagramme
+
+update_location_diagramme = register_diagramme("location")
+update_continent_diagramme = register_diagramme("continent")
+
+#Fensterbreite beim Laden und bei jedem Tab-Wechsel merken
+app.clientside_callback(
+    "function(active_tab) { return window.innerWidth; }",
+    Output('viewport-width', 'data'),
+    Input('card-tabs', 'active_tab')
 )
-def update_diagramm1_graph(land_auswahl, start_date, end_date, diagramm_auswahl, y_attribut, x_attribut, x_radio):
-    
-    #Daten nach gewähltem Datum filtern (Date-Picker)
-    df_timeperiod=df[(df["date"]>= start_date) & (df["date"]<= end_date)]
-
-    #Daten nach gewählten Ländern filtern (Dropdown)
-    df_timeperiod_location = df_timeperiod[df_timeperiod['location'].isin(land_auswahl)] 
-    
-    #DATENSETS
-    # Tagesdurchschnitt pro Land berechnen
-    df_location_per_day=df_timeperiod_location.groupby(["location", "date"], as_index=False).mean()
-    # Durchschnittswerte über ausgewählten Zeitpunkt
-    df_location_per_timeperiod=df_timeperiod_location.groupby(["location"], as_index=False).mean()
-
-    #Plotly Diagramme
-    if diagramm_auswahl == "1":
-    #Liniendiagramm (y-Achse: Attribut von Filter 1)
-        fig = px.line(df_location_per_day, x="date", y=y_attribut, color='location', symbol="location")
-    elif diagramm_auswahl == "2":
-    #Balkendiagramm  (y-Achse: Attribut von Filter 1, x-Achse: Attribut von Filter 2)
-        fig = px.bar( df_location_per_timeperiod, x="location", y=y_attribut, color='location')
-    elif diagramm_auswahl == "3":
-    #Streudiagramm  (y-Achse: Attribut von Filter 1, x-Achse: Attribut von Filter 2)
-        if x_radio =="on":
-            fig = px.scatter(df_location_per_day, x=x_attribut, y=y_attribut, color='location', symbol="location", hover_data=["date"])
-        else:
-            fig = px.scatter(df_location_per_timeperiod, x=x_attribut, y=y_attribut, color='location', symbol="location")
-    return fig
-
-
-#Diagramm1: Filter für X-Attribut ein/ausblenden
-@app.callback(
-    Output('diagramm1_x_attribute_filter', 'style'),
-    Input('diagramm1_auswahl', 'value')
-)
-def show_diagramm1_X_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '3':
-        return {'display': 'block'}
-    else:
-        return {'display': 'none'} 
-    
-#Diagramm1: Beschreibung X-Variable
-@app.callback(
-    Output('diagramm1_description_x_attribut', 'children'),
-    [Input('diagramm1_dropdown_x_attribute', 'value')]
-)
-def update_diagramm1_beschreibung_x_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung)
 
-#Diagramm1: Filter für Y-Attribut ein/ausblenden
-@app.callback(
-    Output('diagramm1_y_attribute_filter', 'style'),
-    Input('diagramm1_auswahl', 'value')
-)
-def show_diagramm1_Y_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '1' or diagramm_auswahl == '2' or diagramm_auswahl == '3':
-        return {'display': 'block'}
-    else:
-        return {'display': 'none'}
-
-#Diagramm1: Beschreibung Y-Variable
-@app.callback(
-    Output('diagramm1_description_y_attribut', 'children'),
-    [Input('diagramm1_dropdown_y_attribute', 'value')]
-)
-def update_diagramm1_beschreibung_y_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung)
 
-#----------------
-# Diagramm 2
-#----------------
-@app.callback(Output('diagramm2_graph', 'figure'),
-    [Input('location-dropdown', 'value'),
-     Input('my-date-picker-range', 'start_date'),
-     Input('my-date-picker-range', 'end_date'),
-     Input('diagramm2_auswahl', 'value'),
-     Input('diagramm2_dropdown_y_attribute', 'value'),
-     Input('diagramm2_dropdown_x_attribute', 'value'),
-     Input('diagramm2_x_radio_filter', 'value')
-     ]
-)
-def update_diagramm2_graph(land_auswahl, start_date, end_date, diagramm_auswahl, y_attribut, x_attribut, x_radio):
-    
-    #Daten nach gewähltem Datum filtern (Date-Picker)
-    df_timeperiod=df[(df["date"]>= start_date) & (df["date"]<= end_date)]
-
-    #Daten nach gewählten Ländern filtern (Dropdown)
-    df_timeperiod_location = df_timeperiod[df_timeperiod['location'].isin(land_auswahl)] 
-    
-    #DATENSETS
-    # Tagesdurchschnitt pro Land berechnen
-    df_location_per_day=df_timeperiod_location.groupby(["location", "date"], as_index=False).mean()
-    # Durchschnittswerte über ausgewählten Zeitpunkt
-    df_location_per_timeperiod=df_timeperiod_location.groupby(["location"], as_index=False).mean()
-
-    #Plotly Diagramme
-    if diagramm_auswahl == "1":
-    #Liniendiagramm (y-Achse: Attribut von Filter 1)
-        fig = px.line(df_location_per_day, x="date", y=y_attribut, color='location', symbol="location")
-    elif diagramm_auswahl == "2":
-    #Balkendiagramm  (y-Achse: Attribut von Filter 1, x-Achse: Attribut von Filter 2)
-        fig = px.bar( df_location_per_timeperiod, x="location", y=y_attribut, color='location')
-    elif diagramm_auswahl == "3":
-    #Streudiagramm  (y-Achse: Attribut von Filter 1, x-Achse: Attribut von Filter 2)
-        if x_radio =="on":
-            fig = px.scatter(df_location_per_day, x=x_attribut, y=y_attribut, color='location', symbol="location", hover_data=["date"])
-        else:
-            fig = px.scatter( df_location_per_timeperiod, x=x_attribut, y=y_attribut, color='location', symbol="location")
-    return fig
-
-
-#Diagramm2: Filter für X-Attribut ein/ausblenden
-@app.callback(
-    Output('diagramm2_x_attribute_filter', 'style'),
-    Input('diagramm2_auswahl', 'value')
-)
-def show_diagramm2_X_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '3':
-        return {'display': 'block'}
-    else:
-        return {'display': 'none'}  
- 
-#Diagramm2: Beschreibung X-Variable
-@app.callback(
-    Output('diagramm2_description_x_attribut', 'children'),
-    [Input('diagramm2_dropdown_x_attribute', 'value')]
-)
-def update_diagramm2_beschreibung_x_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung)     
- 
-#Diagramm2: Filter für Y-Attribut ein/ausblenden
-@app.callback(
-    Output('diagramm2_y_attribute_filter', 'style'),
-    Input('diagramm2_auswahl', 'value')
+def register_attribut(achse):
+    #Filter für das Attribut je nach Diagrammtyp ein/ausblenden, im Browser
+    #(Nummer der Diagramme, bei denen Filter angezeigt werden soll: FILTERS)
+    app.clientside_callback(
+        """function(diagramm_auswahl) {
+            return %s.includes(diagramm_auswahl) ? {'display': 'block'} : {'display': 'none'};
+        }""" % json.dumps(FILTERS[achse]),
+        Output({"type": achse + '-filter', "scope": MATCH, "index": MATCH}, 'style'),
+        Input({"type": 'diagramm-auswahl', "scope": MATCH, "index": MATCH}, 'value')
+    )
+
+    #Optionen aller Dropdowns der Achse aus dem Store übernehmen
+    app.clientside_callback(
+        """function(options, ids) {
+            return ids.map(function() { return options.attribute; });
+        }""",
+        Output({"type": achse + '-attribut', "scope": ALL, "index": ALL}, 'options'),
+        Input('dropdown-options', 'data'),
+        State({"type": achse + '-attribut', "scope": ALL, "index": ALL}, 'id')
+    )
+
+    #Beschreibung des Attributs aus dem Codebook im Browser
+    app.clientside_callback(
+        """function(attribut, codebook) {
+            return {namespace: 'dash_html_components', type: 'P', props: {children: codebook[attribut]}};
+        }""",
+        Output({"type": achse + '-beschreibung', "scope": MATCH, "index": MATCH}, 'children'),
+        Input({"type": achse + '-attribut', "scope": MATCH, "index": MATCH}, 'value'),
+        State('codebook', 'data')
+    )
+
+for achse in FILTERS:
+    register_attribut(achse)
+
+#Glättung nur bei Diagrammen mit Tageswerten anzeigen (SMOOTHING_CHARTS)
+app.clientside_callback(
+    """function(diagramm_auswahl) {
+        return %s.includes(diagramm_auswahl) ? {'display': 'block'} : {'display': 'none'};
+    }""" % json.dumps(SMOOTHING_CHARTS),
+    Output({"type": 'glaettung-filter', "scope": MATCH, "index": MATCH}, 'style'),
+    Input({"type": 'diagramm-auswahl', "scope": MATCH, "index": MATCH}, 'value')
 )
-def show_diagramm2_Y_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '1' or diagramm_auswahl == '2' or diagramm_auswahl == '3':
-        return {'display': 'block'}    
-    else:
-        return {'display': 'none'}
-
-#Diagramm2: Beschreibung Y-Variable
-@app.callback(
-    Output('diagramm2_description_y_attribut', 'children'),
-    [Input('diagramm2_dropdown_y_attribute', 'value')]
+
+#Reihenfolge und Anzahl nur bei der Rangliste anzeigen (RANKING_CHARTS)
+app.clientside_callback(
+    """function(diagramm_auswahl) {
+        return %s.includes(diagramm_auswahl) ? {'display': 'block'} : {'display': 'none'};
+    }""" % json.dumps(RANKING_CHARTS),
+    Output({"type": 'rangliste-filter', "scope": MATCH, "index": MATCH}, 'style'),
+    Input({"type": 'diagramm-auswahl', "scope": MATCH, "index": MATCH}, 'value')
 )
-def update_diagramm2_beschreibung_y_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung)
+
+#Länder- und Kontinent-Dropdown: Optionen aus dem Store übernehmen
+for dropdown, optionen in [('location-dropdown', 'location'), ('continent-dropdown', 'continent')]:
+    app.clientside_callback(
+        "function(options) { return options.%s; }" % optionen,
+        Output(dropdown, 'options'),
+        Input('dropdown-options', 'data')
+    )
 
 #----------------
-# Diagramm 3
+# Datenstand
 #----------------
-@app.callback(Output('diagramm3_graph', 'figure'),
-    [Input('continent-dropdown', 'value'),
-     Input('my-date-picker-range', 'start_date'),
-     Input('my-date-picker-range', 'end_date'),
-     Input('diagramm3_auswahl', 'value'),
-     Input('diagramm3_dropdown_y_attribute', 'value'),
-     Input('diagramm3_dropdown_x_attribute', 'value'),
-     Input('diagramm3_dropdown_sonstige_attribute', 'value'),
-     Input('diagramm3_x_radio_filter', 'value'),
-     Input('diagramm3_y_radio_filter', 'value')
-     ]
-)
-def update_diagramm3_graph(kontinent_auswahl, start_date, end_date, diagramm_auswahl, y_attribut, x_attribut, sonstige_attribut, x_radio, y_radio):
-    #Daten nach gewähltem Datum filtern (Date-Picker)
-    df_timeperiod=df[(df["date"]>= start_date) & (df["date"]<= end_date)]
-    
-    #Daten nach gewählten Kontinent filtern (Dropdown)     
-    df_timeperiod_continent = df_timeperiod[df_timeperiod['continent'].isin(kontinent_auswahl)] 
-    
-    #DATENSETS
-    #Tagesdurchschnitt der Länder des gewählten Kontinents berechnen
-    df_location_per_day=df_timeperiod_continent.groupby(["location", "date", "continent"], as_index=False).mean()
-    #Tagesdurchschnitt pro Kontinent berechnen    
-    df_continent_per_day=df_timeperiod_continent.groupby(["continent", "date"], as_index=False).mean()
-    # Durchschnittswert der Länder des gewählten Kontinents über den ausgewählten Zeitpunkt
-    df_location_per_timeperiod=df_timeperiod_continent.groupby(["continent", "location"], as_index=False).mean()
-    # Durchschnittswerte des Kontinents über ausgewählten Zeitpunkt und all seine Länder
-    df_continent_per_timeperiod=df_timeperiod_continent.groupby(["continent"], as_index=False).mean()
-    
-    #Werteverteilung
-    df_verteilung=df_timeperiod_continent.groupby(["continent", "location"], as_index=False).mean()
-  
-    #Map
-    df_map=df_timeperiod_continent.groupby(["iso_code", "location", "continent"], as_index=False).mean()  
-
-    #Plotly Diagramme
-    #Liniendiagramm     
-    if diagramm_auswahl == "1":
-        if y_radio =="on":
-            fig = px.line(df_location_per_day, x="date", y=y_attribut, color='location', symbol='location', hover_name='location')
-        else:
-            fig = px.line(df_continent_per_day, x="date", y=y_attribut, color='continent', symbol="continent")
-    #Balkendiagramm     
-    elif diagramm_auswahl == "2":
-        if y_radio =="on":
-            fig = px.bar(df_location_per_timeperiod, x="continent", y=y_attribut, color='continent', hover_name='location')
-        else:
-            fig = px.bar(df_continent_per_timeperiod, x="continent", y=y_attribut, color='continent')
-    #Streudiagramm    
-    elif diagramm_auswahl == "3":
-        if x_radio =="on":
-           if y_radio =="on":         
-               fig = px.scatter(df_location_per_day, x=x_attribut, y=y_attribut, color='continent', symbol="continent",  hover_name='location', hover_data=["date"])
-           else:
-               fig = px.scatter(df_continent_per_day, x=x_attribut, y=y_attribut, color='continent', symbol="continent", hover_data=["date"])
-        elif x_radio =="off":    
-            if y_radio =="on":         
-                fig = px.scatter(df_location_per_timeperiod, x=x_attribut, y=y_attribut, color='continent', symbol="continent", hover_name='location')
-            else:
-                fig = px.scatter(df_continent_per_timeperiod, x=x_attribut, y=y_attribut, color='continent', symbol="continent")
-    #Treemap   
-    elif diagramm_auswahl == "4":
-        fig = px.treemap(df_verteilung, path=[px.Constant("Total"), 'continent', 'location'], values=sonstige_attribut, color_discrete_sequence=["#b4dee3", "#8cc9d5", "#5da3c6", "#4071b4", "#3b4286", "#1d1d3b"])
-        fig.update_traces(root_color="#e5ecf6")
-        fig.update_layout(margin = dict(t=20, l=0, r=0, b=0))
-        
-    # Choropleth   
-    elif diagramm_auswahl == "5":
-        fig = px.choropleth(df_map, locations="iso_code", color=sonstige_attribut, color_continuous_scale="ice", hover_name="location")
-        fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
-    return fig
-
-#Diagramm3: Filter für X-Attribut ein/ausblenden
+#Neuer Datenstand: Version merken, nur dann werden Date-Picker und Dropdowns aktualisiert
 @app.callback(
-    Output('diagramm3_x_attribute_filter', 'style'),
-    Input('diagramm3_auswahl', 'value')
+    Output('dataset-version', 'data'),
+    Input('refresh-interval', 'n_intervals'),
+    State('dataset-version', 'data'),
+    prevent_initial_call=True
 )
-def show_diagramm3_X_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '3':
-        return {'display': 'block'}
-    else:
-        return {'display': 'none'} 
-
-#Diagramm3: Beschreibung X-Variable
-@app.callback(
-    Output('diagramm3_description_x_attribut', 'children'),
-    [Input('diagramm3_dropdown_x_attribute', 'value')]
-)
-def update_diagramm3_beschreibung_x_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung)  
+def update_dataset_version(n_intervals, version):
+    aktuell = store.current.version
+    if aktuell == version:
+        raise PreventUpdate
+    return aktuell
 
-#Diagramm3: Filter für Y-Attribut ein/ausblenden
-@app.callback(
-    Output('diagramm3_y_attribute_filter', 'style'),
-    Input('diagramm3_auswahl', 'value')
-)
-def show_diagramm3_Y_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '1' or diagramm_auswahl == '2' or diagramm_auswahl == '3':
-        return {'display': 'block'}
-    else:
-        return {'display': 'none'}
-
-#Diagramm3: Beschreibung Y-Variable
+#Date-Picker: Grenzen an den neuen Datenstand anpassen
 @app.callback(
-    Output('diagramm3_description_y_attribut', 'children'),
-    [Input('diagramm3_dropdown_y_attribute', 'value')]
+    [Output('my-date-picker-range', 'min_date_allowed'),
+     Output('my-date-picker-range', 'max_date_allowed')],
+    Input('dataset-version', 'data'),
+    prevent_initial_call=True
 )
-def update_diagramm3_beschreibung_y_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung)
+def update_date_picker(version):
+    dataset = store.current
+    return dataset.oldest_date, dataset.newest_date
 
-#Diagramm3: Filter für Sonstig Attribut ein/ausblenden
-@app.callback(
-    Output('diagramm3_sonstige_attribute_filter', 'style'),
-    Input('diagramm3_auswahl', 'value')
-)
-def show_diagramm3_sonstige_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '4' or diagramm_auswahl == '5':
-        return {'display': 'block'}
-    else:
-        return {'display': 'none'}
-
-#Diagramm3: Beschreibung Sonstige-Variable
+#Dropdowns: neue Länder, Kontinente und Attribute aufnehmen
 @app.callback(
-    Output('diagramm3_description_sonstige_attribut', 'children'),
-    [Input('diagramm3_dropdown_sonstige_attribute', 'value')]
+    Output('dropdown-options', 'data'),
+    Input('dataset-version', 'data'),
+    prevent_initial_call=True
 )
-def update_diagramm3_beschreibung_sonstige_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung)
+def update_dropdown_options(version):
+    return dropdown_options(store.current)
 
 #----------------
-# Diagramm 4
+# Cache-Statistik
 #----------------
-@app.callback(Output('diagramm4_graph', 'figure'),
-    [Input('continent-dropdown', 'value'),
-     Input('my-date-picker-range', 'start_date'),
-     Input('my-date-picker-range', 'end_date'),
-     Input('diagramm4_auswahl', 'value'),
-     Input('diagramm4_dropdown_y_attribute', 'value'),
-     Input('diagramm4_dropdown_x_attribute', 'value'),
-     Input('diagramm4_dropdown_sonstige_attribute', 'value'),
-     Input('diagramm4_x_radio_filter', 'value'),
-     Input('diagramm4_y_radio_filter', 'value')
-     ]
-)
-def update_diagramm4_graph(kontinent_auswahl, start_date, end_date, diagramm_auswahl, y_attribut, x_attribut, sonstige_attribut, x_radio, y_radio):
-    #Daten nach gewähltem Datum filtern (Date-Picker)
-    df_timeperiod=df[(df["date"]>= start_date) & (df["date"]<= end_date)]
-    
-    #Daten nach gewählten Kontinent filtern (Dropdown)     
-    df_timeperiod_continent = df_timeperiod[df_timeperiod['continent'].isin(kontinent_auswahl)] 
-    
-    #DATENSETS
-    #Tagesdurchschnitt der Länder des gewählten Kontinents berechnen
-    df_location_per_day=df_timeperiod_continent.groupby(["location", "date", "continent"], as_index=False).mean()
-    #Tagesdurchschnitt pro Kontinent berechnen    
-    df_continent_per_day=df_timeperiod_continent.groupby(["continent", "date"], as_index=False).mean()
-    # Durchschnittswert der Länder des gewählten Kontinents über den ausgewählten Zeitpunkt
-    df_location_per_timeperiod=df_timeperiod_continent.groupby(["continent", "location"], as_index=False).mean()
-    # Durchschnittswerte des Kontinents über ausgewählten Zeitpunkt und all seine Länder
-    df_continent_per_timeperiod=df_timeperiod_continent.groupby(["continent"], as_index=False).mean()
-    
-    #Werteverteilung
-    df_verteilung=df_timeperiod_continent.groupby(["continent", "location"], as_index=False).mean()
-  
-    #Map
-    df_map=df_timeperiod_continent.groupby(["iso_code", "location", "continent"], as_index=False).mean()  
-
-    #Plotly Diagramme
-    #Liniendiagramm     
-    if diagramm_auswahl == "1":
-        if y_radio =="on":
-            fig = px.line(df_location_per_day, x="date", y=y_attribut, color='location', symbol='location', hover_name='location')
-        else:
-            fig = px.line(df_continent_per_day, x="date", y=y_attribut, color='continent', symbol="continent")
-    #Balkendiagramm     
-    elif diagramm_auswahl == "2":
-        if y_radio =="on":
-            fig = px.bar(df_location_per_timeperiod, x="continent", y=y_attribut, color='continent', hover_name='location')
-        else:
-            fig = px.bar(df_continent_per_timeperiod, x="continent", y=y_attribut, color='continent')
-    #Streudiagramm    
-    elif diagramm_auswahl == "3":
-        if x_radio =="on":
-           if y_radio =="on":         
-               fig = px.scatter(df_location_per_day, x=x_attribut, y=y_attribut, color='continent', symbol="continent",  hover_name='location', hover_data=["date"])
-           else:
-               fig = px.scatter(df_continent_per_day,x=x_attribut, y=y_attribut, color='continent', symbol="continent", hover_data=["date"])
-        elif x_radio =="off":    
-            if y_radio =="on":         
-                fig = px.scatter(df_location_per_timeperiod, x=x_attribut, y=y_attribut, color='continent', symbol="continent", hover_name='location')
-            else:
-                fig = px.scatter(df_continent_per_timeperiod,x=x_attribut, y=y_attribut, color='continent', symbol="continent")
-    #Treemap   
-    elif diagramm_auswahl == "4":
-        fig = px.treemap(df_verteilung, path=[px.Constant("Total"), 'continent', 'location'], values=sonstige_attribut, color_discrete_sequence=["#b4dee3", "#8cc9d5", "#5da3c6", "#4071b4", "#3b4286", "#1d1d3b"])
-        fig.update_traces(root_color="#e5ecf6")
-        fig.update_layout(margin = dict(t=20, l=0, r=0, b=0))
-        
-    # Choropleth   
-    elif diagramm_auswahl == "5":
-        fig = px.choropleth(df_map, locations="iso_code", color=sonstige_attribut, color_continuous_scale="ice", hover_name="location")
-        fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
-    return fig
-
-#Diagramm4: Filter für X-Attribut ein/ausblenden
-@app.callback(
-    Output('diagramm4_x_attribute_filter', 'style'),
-    Input('diagramm4_auswahl', 'value')
-)
-def show_diagramm4_X_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '3':
-        return {'display': 'block'}
-    else:
-        return {'display': 'none'} 
-
-#Diagramm4: Beschreibung X-Variable
-@app.callback(
-    Output('diagramm4_description_x_attribut', 'children'),
-    [Input('diagramm4_dropdown_x_attribute', 'value')]
-)
-def update_diagramm4_beschreibung_x_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung) 
+@server.route("/cache-stats")
+def cache_stats():
+    return flask.jsonify(figure_cache.stats())
 
-#Diagramm4: Filter für Y-Attribut ein/ausblenden
-@app.callback(
-    Output('diagramm4_y_attribute_filter', 'style'),
-    Input('diagramm4_auswahl', 'value')
-)
-def show_diagramm4_Y_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '1' or diagramm_auswahl == '2' or diagramm_auswahl == '3':
-        return {'display': 'block'}
-    else:
-        return {'display': 'none'}
-
-#Diagramm4: Beschreibung Y-Variable
-@app.callback(
-    Output('diagramm4_description_y_attribut', 'children'),
-    [Input('diagramm4_dropdown_y_attribute', 'value')]
-)
-def update_diagramm4_beschreibung_y_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung)
+#----------------
+# Export
+#----------------
+#Zahlen der Auswahl als CSV, Arrow oder NDJSON: /export/<table>.<format> (siehe export.py)
+export = Export(store)
+export.init_app(server)
 
-#Diagramm4: Filter für Sonstig Attribut ein/ausblenden
-@app.callback(
-    Output('diagramm4_sonstige_attribute_filter', 'style'),
-    Input('diagramm4_auswahl', 'value')
-)
-def show_diagramm4_sonstige_attribut(diagramm_auswahl):
-    #Nummer der Diagramme, bei denen Filter angezeigt werden soll
-    if diagramm_auswahl == '4' or diagramm_auswahl == '5':
-        return {'display': 'block'}
-    else:
-        return {'display': 'none'}
-
-#Diagramm4: Beschreibung Sonstige-Variable
-@app.callback(
-    Output('diagramm4_description_sonstige_attribut', 'children'),
-    [Input('diagramm4_dropdown_sonstige_attribute', 'value')]
-)
-def update_diagramm4_beschreibung_sonstige_variable(attribut):
-    index = df_attribute_codebook.index(attribut)
-    beschreibung = df_codebook.iloc[index]['description']
-    return html.P(beschreibung)
+#----------------
+# Messwerte
+#----------------
+#Zeiten pro Verarbeitungsschritt (Server-Timing-Header) und /metrics für Prometheus;
+#COVIDIAGRAMS_PROFILE_RATE > 0 zeichnet diesen Anteil der Callbacks mit cProfile auf
+metrics = Metrics(profile_rate=float(os.environ.get("COVIDIAGRAMS_PROFILE_RATE", 0)),
+                  profile_callback=os.environ.get("COVIDIAGRAMS_PROFILE_CALLBACK", ""),
+                  profile_dir=os.environ.get("COVIDIAGRAMS_PROFILE_DIR"),
+                  allow=os.environ.get("COVIDIAGRAMS_METRICS_ALLOW", "127.0.0.1,::1").split(","))
+metrics.register("covidiagrams_figure_cache_requests_total", "counter",
+                 "Abfragen des Figuren-Caches (memory_hits, disk_hits, misses; coalesced: nach Warten aus dem Cache)",
+                 lambda: {k: v for k, v in figure_cache.stats().items() if k in ("memory_hits", "disk_hits", "misses", "coalesced")})
+metrics.register("covidiagrams_figure_cache_hit_rate", "gauge", "Trefferquote des Figuren-Caches",
+                 lambda: figure_cache.stats()["hit_rate"])
+metrics.register("covidiagrams_figure_cache_entries", "gauge", "Figuren im Speicher des Workers",
+                 lambda: figure_cache.stats()["entries"])
+metrics.register("covidiagrams_dataset_rows", "gauge", "Zeilen des aktuellen Datenstands",
+                 lambda: store.current.rows)
+metrics.init_app(server)
 
 #---------------------------------------
 
 if __name__ == "__main__":
     print("RUN")
+    refresher.start()
     app.run_server()
\ No newline at end of file
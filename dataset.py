@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Datenzugriff des Dashboards auf einen Snapshot (siehe snapshot.py).
+
+Die Spalten werden als schreibgeschützte, memory-mapped NumPy-Arrays geöffnet.
+Alle Gunicorn-Worker teilen sich dadurch dieselben Seiten im Page-Cache,
+statt je eine eigene Kopie des OWID-Datensatzes im Speicher zu halten.
+Nur die für einen Callback ausgewählten Zeilen werden als DataFrame kopiert.
+
+Die Zeilen sind nach Land und Datum sortiert. Eine Auswahl (Länder, Zeitraum)
+wird per Binärsuche in eine Liste zusammenhängender Zeilenbereiche übersetzt,
+ohne die nicht ausgewählten Zeilen anzufassen.
+
+Ein Dataset ist nach dem Öffnen schreibgeschützt: Attribute lassen sich nicht
+mehr setzen, Spalten und Kategorien sind nur lesbar und alle Arrays (auch die
+des Katalogs und des Cubes) haben flags.writeable = False. Callbacks in
+mehreren Threads eines Workers (gunicorn --threads) teilen sich so eine Kopie
+der Daten. Neue Daten kommen als neues Dataset mit eigener Version und werden
+im DatasetStore eingewechselt.
+"""
+
+import os
+import threading
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+import snapshot
+import storage
+from aggregates import Cube, freeze
+from catalog import KEY_COLUMNS, Catalog
+
+#Sortierschlüssel einer Zeile: Land * DAY_SPAN + Tage seit 1970
+DAY_SPAN = 1 << 20
+
+
+def _day(datum):
+    return np.datetime64(pd.Timestamp(datum), "D").astype(np.int64)
+
+
+class Dataset:
+
+    def __init__(self, path, mmap=True, previous=None):
+        self.path = path
+        self.meta = snapshot.read_meta(path)
+        self.rows = self.meta["rows"]
+        #Datenstand, z.B. für die Schlüssel des Diagramm-Caches
+        self.version = snapshot.version(self.meta)
+        self.columns = {}
+        self.categories = {}
+        for eintrag in self.meta["columns"]:
+            #Zahlenspalten als float32 oder dünn besetzt lesen sich wie float64 (siehe storage.py)
+            values = storage.load(path, eintrag, self.rows, mmap)
+            self.columns[eintrag["name"]] = values
+            if eintrag["kind"] == "category":
+                self.categories[eintrag["name"]] = tuple(eintrag["categories"])
+
+        codebook_path = os.path.join(path, snapshot.CODEBOOK_FILE)
+        self.codebook = pd.read_csv(codebook_path) if os.path.exists(codebook_path) else None
+
+        #Index über die nach (Land, Datum) sortierten Zeilen
+        land = np.asarray(self.columns["location"], dtype=np.int64)
+        tag = self.columns["date"].astype("datetime64[D]").astype(np.int64)
+        self.row_key = land * DAY_SPAN + tag
+        if np.any(np.diff(self.row_key) <= 0):
+            raise ValueError("Snapshot %s ist nicht nach Land und Datum sortiert" % path)
+
+        #Dimensionskatalog: Länder, Kontinente und ISO-Codes mit Integer-Codes
+        self.catalog = Catalog(self.categories, land, self.columns["continent"],
+                               self.columns["iso_code"], self.columns["date"])
+
+        #Vorberechnete Aggregate (Präfixsummen) für die Diagramme; wurden nur Zeilen
+        #an den vorherigen Datenstand angehängt, werden nur diese neu eingerechnet
+        self.cube = Cube(self, previous=previous.cube if previous is not None else None)
+
+        #Start- und Enddatum für den Date-Picker
+        self.oldest_date = str(self.cube.dates[0])
+        self.newest_date = str(self.cube.dates[-1])
+
+        #Ab hier schreibgeschützt
+        self.columns = MappingProxyType(self.columns)
+        self.categories = MappingProxyType(self.categories)
+        for teil in (self, self.catalog, self.cube):
+            freeze(vars(teil))
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("Datenstand %s ist schreibgeschützt" % self.version)
+        object.__setattr__(self, name, value)
+
+    @property
+    def column_names(self):
+        return [eintrag["name"] for eintrag in self.meta["columns"]]
+
+    @property
+    def location_list(self):
+        return list(self.categories["location"])
+
+    @property
+    def continent_list(self):
+        return list(self.categories["continent"])
+
+    @property
+    def attribute_list(self):
+        #Attribute, die in den Dropdown Filtern zur Auswahl stehen
+        return list(self.cube.attributes)
+
+    def new_rows(self, df):
+        #Zeilen von df, deren Datum nach dem letzten Datum des jeweiligen Landes liegt
+        letztes_datum = dict(zip(self.categories["location"], self.catalog.location_last_date))
+        datum = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]")
+        grenze = np.array([letztes_datum.get(land, np.datetime64("NaT")) for land in df["location"]],
+                          dtype="datetime64[ns]")
+        neu = np.isnat(grenze) | (datum > grenze)
+        return df[neu]
+
+    def codes(self, column, values):
+        #Werte einer Schlüsselspalte in ihre Integer-Codes übersetzen
+        return self.catalog.codes(column, values)
+
+    def projection(self, columns=None):
+        #Schlüsselspalten, Datum und die angeforderten Attribute (ohne Duplikate)
+        if columns is None:
+            return self.column_names
+        angefordert = set(KEY_COLUMNS) | {"date"} | set(columns)
+        return [name for name in self.column_names if name in angefordert]
+
+    def locations(self, column, values):
+        #Codes der ausgewählten Länder bzw. der Länder der ausgewählten Kontinente,
+        #alphabetisch sortiert wie bei groupby(["location", ...])
+        return self.catalog.locations(column, values)
+
+    def row_ranges(self, column, values, start_date, end_date):
+        #Zeilenbereiche [von, bis) der Auswahl per Binärsuche im Sortierschlüssel
+        laender = self.locations(column, values)
+        von = np.searchsorted(self.row_key, laender * DAY_SPAN + _day(start_date), side="left")
+        bis = np.searchsorted(self.row_key, laender * DAY_SPAN + _day(end_date), side="right")
+        vorhanden = bis > von
+        return von[vorhanden], bis[vorhanden]
+
+    def select(self, column, values, start_date, end_date, columns=None):
+        #Zeilen nach Zeitraum und Land/Kontinent auswählen und nur die angeforderten Spalten kopieren
+        von, bis = self.row_ranges(column, values, start_date, end_date)
+        return self.frame(slice_ranges(von, bis), columns)
+
+    def location_per_day(self, column, values, start_date, end_date, columns=None, smoothing="off", window=7):
+        #Werte pro Land und Tag; (location, date) ist eindeutig und die Auswahl
+        #bereits nach Land und Datum sortiert, ein groupby ist nicht nötig.
+        #smoothing: gleitende Werte über window Tage aus dem Cube statt der Tageswerte
+        if smoothing == "off":
+            return self.select(column, values, start_date, end_date, columns)
+        von, bis = self.row_ranges(column, values, start_date, end_date)
+        zeilen = slice_ranges(von, bis)
+        df = self.frame(zeilen, columns)
+        laender, tage = take(self.cube.row_location, zeilen), take(self.cube.row_day, zeilen)
+        for attribut in df.columns:
+            if attribut in self.cube.attributes:
+                df[attribut] = self.cube.location_window(attribut, laender, tage, start_date, smoothing, window)
+        return df
+
+    def frame(self, rows, columns=None):
+        spalten = self.projection(columns)
+        data = {}
+        for name in spalten:
+            values = take(self.columns[name], rows)
+            if name in KEY_COLUMNS:
+                #Schlüsselspalten als Text, damit Plotly Express nicht über alle Kategorien gruppiert
+                data[name] = self.catalog.label(name, values)
+            elif name in self.categories:
+                data[name] = pd.Categorical.from_codes(values, self.categories[name])
+            else:
+                data[name] = values
+        return pd.DataFrame(data, columns=spalten)
+
+
+class DatasetStore:
+    #Hält den aktuellen Datenstand. Callbacks lesen store.current einmal und
+    #arbeiten danach mit diesem Objekt, auch wenn inzwischen ein neuer Stand
+    #eingewechselt wird.
+
+    def __init__(self, dataset):
+        self._current = dataset
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        return self._current
+
+    def swap(self, dataset):
+        with self._lock:
+            alt = self._current
+            self._current = dataset
+        return alt
+
+
+def slice_ranges(von, bis):
+    return [slice(a, b) for a, b in zip(von.tolist(), bis.tolist())]
+
+
+def take(values, rows):
+    #Zeilen als Index-Array oder als Liste zusammenhängender Bereiche lesen
+    if isinstance(rows, list):
+        if not rows:
+            return values[:0].copy()
+        if isinstance(values, storage.Column):
+            return values.take_ranges(rows)
+        return np.concatenate([values[bereich] for bereich in rows])
+    return values[rows]
+
+
+def open_dataset(path=snapshot.DEFAULT_PATH):
+    #Fehlt der Snapshot oder ist er veraltet, wird er einmalig aus der OWID-CSV erstellt
+    if not snapshot.is_current(path):
+        snapshot.ingest(snapshot.OWID_URL, path, snapshot.CODEBOOK_URL)
+    return Dataset(path)
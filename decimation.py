@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Ausdünnen von Tageswerten für Linien- und Streudiagramme.
+
+Bei langen Zeiträumen und vielen Ländern zeichnet Plotly mehr Punkte, als das
+Diagramm Pixel breit ist. Jede Serie (ein Land bzw. Kontinent, nach Datum
+sortiert) wird deshalb auf ein Punktebudget reduziert:
+
+    minmax  Die Serie wird in gleich grosse Abschnitte geteilt, pro Abschnitt
+            bleiben der kleinste und der grösste Wert. Spitzen bleiben sichtbar.
+    lttb    Largest-Triangle-Three-Buckets: pro Abschnitt der Punkt, der mit
+            seinen Nachbarn das grösste Dreieck bildet (glattere Linien).
+
+Erster und letzter Punkt jeder Serie bleiben immer erhalten. Abschnitte ohne
+gültigen Wert behalten eine Zeile, damit Lücken in Linien sichtbar bleiben.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+METHODS = ["minmax", "lttb", "off"]
+
+
+def _groups(keys):
+    #Start und Länge der zusammenhängenden Serien (Zeilen sind nach Serie sortiert)
+    keys = np.asarray(keys)
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return starts, np.diff(np.r_[starts, len(keys)])
+
+
+def minmax(keys, y, points):
+    #Zeilen-Indizes: pro Serie und Abschnitt Minimum und Maximum von y
+    y = np.asarray(y, dtype=np.float64)
+    starts, laengen = _groups(keys)
+    n_abschnitte = max(points // 2, 1)
+
+    serie = np.repeat(np.arange(len(starts)), laengen)
+    position = np.arange(len(y)) - np.repeat(starts, laengen)
+    abschnitt = position * n_abschnitte // np.repeat(laengen, laengen)
+    #Kurze Serien bleiben vollständig: jede Zeile ist ein eigener Abschnitt
+    kurz = np.repeat(laengen <= points, laengen)
+    zelle = np.where(kurz, position, abschnitt) + serie * max(points, 1)
+
+    fehlend = np.isnan(y)
+    reihenfolge = np.lexsort((y, fehlend, zelle))
+    zelle_sortiert = zelle[reihenfolge]
+    erste = np.flatnonzero(np.r_[True, zelle_sortiert[1:] != zelle_sortiert[:-1]])
+    anzahl_gueltig = np.add.reduceat((~fehlend[reihenfolge]).astype(np.int64), erste) if len(erste) else erste
+    letzte = erste + np.maximum(anzahl_gueltig, 1) - 1
+
+    behalten = np.zeros(len(y), dtype=bool)
+    behalten[reihenfolge[erste]] = True
+    behalten[reihenfolge[letzte]] = True
+    behalten[starts] = True
+    behalten[starts + laengen - 1] = True
+    return np.flatnonzero(behalten)
+
+
+def lttb(keys, y, points):
+    #Zeilen-Indizes nach Largest-Triangle-Three-Buckets, x ist die Position in der Serie.
+    #Serien gleicher Länge werden gemeinsam Abschnitt für Abschnitt verarbeitet.
+    y = np.asarray(y, dtype=np.float64)
+    starts, laengen = _groups(keys)
+    behalten = [np.arange(start, start + laenge)
+                for start, laenge in zip(starts.tolist(), laengen.tolist()) if laenge <= max(points, 3)]
+    for laenge in np.unique(laengen[laengen > max(points, 3)]).tolist():
+        anfang = starts[laengen == laenge]
+        werte = y[anfang[:, None] + np.arange(laenge)]
+        gueltig = ~np.isnan(werte)
+        null = np.where(gueltig, werte, 0.0)
+        zeilen = np.arange(len(anfang))
+        grenzen = np.linspace(1, laenge - 1, points - 1).astype(np.int64)
+        grenzen = np.unique(np.r_[grenzen, laenge - 1])
+        auswahl = [np.zeros(len(anfang), dtype=np.int64)]
+        for i in range(len(grenzen) - 1):
+            von, bis = grenzen[i], grenzen[i + 1]
+            #Mittelwert des nächsten Abschnitts bzw. letzter Punkt
+            naechster_bis = grenzen[i + 2] if i + 2 < len(grenzen) else laenge
+            anzahl = gueltig[:, bis:naechster_bis].sum(axis=1)
+            cx = (bis + naechster_bis - 1) / 2.0
+            cy = np.where(anzahl > 0, null[:, bis:naechster_bis].sum(axis=1) / np.maximum(anzahl, 1), 0.0)
+            a = auswahl[-1]
+            ay = null[zeilen, a]
+            kandidaten = np.arange(von, bis)
+            flaeche = np.abs((a - cx)[:, None] * (werte[:, von:bis] - ay[:, None])
+                             - (a[:, None] - kandidaten) * (cy - ay)[:, None])
+            #Fehlende Werte nur, wenn der ganze Abschnitt fehlt (Lücke bleibt sichtbar)
+            flaeche = np.where(gueltig[:, von:bis], flaeche, -1.0)
+            auswahl.append(von + np.argmax(flaeche, axis=1))
+        auswahl.append(np.full(len(anfang), laenge - 1))
+        behalten.append((anfang[:, None] + np.stack(auswahl, axis=1)).ravel())
+    if not behalten:
+        return np.zeros(0, dtype=np.int64)
+    return np.unique(np.concatenate(behalten))
+
+
+def decimate(df, group, columns, points, method="minmax"):
+    #DataFrame (nach Serie und Datum sortiert) auf etwa points Punkte pro Serie reduzieren;
+    #bei mehreren Spalten (Streudiagramm) bleiben die Extremwerte jeder Spalte erhalten
+    if method == "off" or not points or len(df) == 0:
+        return df
+    keys = df[group].to_numpy()
+    auswahl = lttb if method == "lttb" else minmax
+    zeilen = [auswahl(keys, df[spalte].to_numpy(dtype=np.float64, na_value=np.nan), points)
+              for spalte in OrderedDict.fromkeys(columns)]
+    zeilen = np.unique(np.concatenate(zeilen))
+    if len(zeilen) == len(df):
+        return df
+    return df.iloc[zeilen].reset_index(drop=True)
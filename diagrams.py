@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+Render-Pipeline der Diagramme.
+
+Ein Diagramm wird durch eine Diagram-Beschreibung festgelegt: Bereich (Länder
+oder Kontinente), Diagrammtyp, Attribute und Zeitmodus (Tageswerte oder
+Mittelwert über den Zeitraum). Tageswerte lassen sich glätten (gleitender
+Mittelwert bzw. Summe über N Tage, Wachstum gegenüber den N Tagen davor,
+Summe seit Beginn des Zeitraums, siehe aggregates.py) oder pro Woche bzw.
+Monat mitteln; "auto" nimmt die feinste Stufe, bei der eine Serie über den
+Zeitraum ins Punktebudget passt. Die Rangliste zeigt die N Länder mit dem
+höchsten bzw. tiefsten Mittelwert über den Zeitraum, im Tab der Länder aus
+allen Ländern, im Tab der Kontinente aus den Ländern der Auswahl. render()
+zeichnet daraus die Figur.
+
+Alle Diagramme eines Tabs werden in einem Request gezeichnet und teilen sich
+eine Selection: Diagramme mit derselben Länder- bzw. Kontinentauswahl und
+demselben Zeitraum lesen die Zeilen und Mittelwerte nur einmal. Mit threads > 1
+werden die Figuren danach parallel in einem Thread-Pool gebaut.
+
+Tageswerte in Linien- und Streudiagrammen werden auf ein Punktebudget pro
+Serie ausgedünnt, das sich nach der Breite des Diagramms richtet (siehe
+decimation.py). Ab WEBGL_THRESHOLD Punkten zeichnet der Browser mit WebGL.
+
+Die Figuren entstehen ohne plotly.express direkt aus graph_objects (siehe
+figures.py), mit demselben Ergebnis.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from plotly.io.json import to_json_plotly
+
+import figures
+from aggregates import period_count
+from decimation import decimate
+from metrics import stage
+from payload import compact_figure
+
+#Diagrammtypen pro Bereich (Werte der Diagramm-Dropdowns)
+CHARTS = {
+    "location": [("line diagram", "1"), ("bar chart", "2"), ("scatter plot", "3"), ("ranking", "6")],
+    "continent": [("line diagram", "1"), ("bar chart", "2"), ("scatter plot", "3"),
+                  ("treemap", "4"), ("choropleth", "5"), ("ranking", "6")],
+}
+
+#Nummer der Diagramme, bei denen der jeweilige Attribut-Filter angezeigt wird
+FILTERS = {"x": ["3"], "y": ["1", "2", "3", "6"], "sonstige": ["4", "5"]}
+
+#Glättung der Tageswerte: Beschriftung der Auswahl und der Achse (mit Fenster in Tagen)
+SMOOTHING = [
+    ("Values per day", "off", "%s"),
+    ("Rolling mean", "mean", "%s (%d-day mean)"),
+    ("Rolling sum", "sum", "%s (%d-day sum)"),
+    ("Growth over the previous window (%)", "growth", "%s (%d-day growth, %%)"),
+    ("Cumulative since start of period", "cumulative", "%s (cumulative)"),
+]
+#Fenster der Glättung in Tagen
+WINDOWS = [3, 7, 14, 28]
+#Diagrammtypen mit Tageswerten, bei denen Glättung und Auflösung angezeigt werden
+SMOOTHING_CHARTS = ["1", "3"]
+#Rangliste: Beschriftung der Auswahl und Reihenfolge (aggregates.RANKINGS), Anzahl Länder
+RANKINGS = [("Highest", "top"), ("Lowest", "bottom")]
+RANKING_SIZES = [5, 10, 20, 50]
+#Diagrammtypen, bei denen Reihenfolge und Anzahl der Rangliste angezeigt werden
+RANKING_CHARTS = ["6"]
+#Auflösung der Tageswerte: Beschriftung der Auswahl und der Achse
+GRANULARITIES = [
+    ("Auto", "auto", "%s"),
+    ("Day", "day", "%s"),
+    ("Week", "week", "%s (weekly mean)"),
+    ("Month", "month", "%s (monthly mean)"),
+]
+
+#Ab dieser Anzahl Zeilen werden Linien und Punkte mit WebGL (scattergl) gezeichnet
+WEBGL_THRESHOLD = 1000
+
+#Punktebudget pro Serie, wenn die Breite des Browserfensters unbekannt ist
+DEFAULT_POINTS = 1000
+
+TREEMAP_COLORS = ["#b4dee3", "#8cc9d5", "#5da3c6", "#4071b4", "#3b4286", "#1d1d3b"]
+TREEMAP_ROOT_COLOR = "#e5ecf6"
+TREEMAP_MARGIN = dict(t=20, l=0, r=0, b=0)
+CHOROPLETH_SCALE = "ice"
+CHOROPLETH_MARGIN = {"r":0,"t":0,"l":0,"b":0}
+
+
+class Diagram:
+    #Beschreibung eines Diagramms; x_radio: Tageswerte ("on") oder Mittelwert über
+    #den Zeitraum ("off"), y_radio (nur Kontinente): pro Land ("on") oder pro Kontinent ("off"),
+    #smoothing: Glättung der Tageswerte über window Tage (SMOOTHING), granularity: Tage,
+    #Wochen oder Monate bzw. "auto" (GRANULARITIES; geglättete Werte immer pro Tag),
+    #ranking/ranking_size: Reihenfolge und Anzahl Länder der Rangliste (RANKINGS)
+
+    def __init__(self, scope, chart, y_attribut, x_attribut=None, sonstige_attribut=None,
+                 x_radio="on", y_radio="off", points=None, decimation="minmax", smoothing="off", window=7,
+                 granularity="day", ranking="top", ranking_size=10):
+        self.scope = scope
+        self.chart = chart
+        self.y_attribut = y_attribut
+        self.x_attribut = x_attribut
+        self.sonstige_attribut = sonstige_attribut
+        self.x_radio = x_radio
+        self.y_radio = y_radio
+        #Punktebudget pro Serie für Tageswerte (None = alle Punkte)
+        self.points = points
+        self.decimation = decimation
+        self.smoothing = smoothing or "off"
+        self.window = int(window or 7)
+        self.granularity = granularity or "day"
+        self.ranking = ranking or "top"
+        self.ranking_size = int(ranking_size or 10)
+
+    @property
+    def attributes(self):
+        #Nur die Attribute des gewählten Diagramms werden gelesen und gemittelt
+        if self.chart == "3":
+            return [self.x_attribut, self.y_attribut]
+        if self.chart == "4" or self.chart == "5":
+            return [self.sonstige_attribut]
+        return [self.y_attribut]
+
+    @property
+    def daily(self):
+        #Zeichnet Tageswerte (Linie, Streudiagramm mit x_radio "on"), sonst nur Mittelwerte über den Zeitraum
+        return self.chart == "1" or (self.chart == "3" and self.x_radio == "on")
+
+    def key(self):
+        return [self.scope, self.chart, self.y_attribut, self.x_attribut, self.sonstige_attribut,
+                self.x_radio, self.y_radio, self.points, self.decimation, self.smoothing, self.window,
+                self.granularity, self.ranking, self.ranking_size]
+
+    def resolution(self, start_date, end_date):
+        #Stufe der Tageswerte im Zeitraum: bei "auto" die feinste, bei der jede Serie
+        #höchstens points Punkte hat
+        if self.smoothing != "off" or self.granularity == "day":
+            return "day"
+        if self.granularity != "auto":
+            return self.granularity
+        if not self.points or not start_date or not end_date:
+            return "day"
+        for stufe in ["day", "week"]:
+            if period_count(start_date, end_date, stufe) <= self.points:
+                return stufe
+        return "month"
+
+    def label(self, attribut, stufe="day"):
+        #Spalte bzw. Achsentitel eines Attributs in Tageswerten, mit Glättung bzw. Auflösung
+        if self.smoothing != "off":
+            beschriftung = next(text for _, modus, text in SMOOTHING if modus == self.smoothing)
+            return beschriftung % ((attribut,) if "%d" not in beschriftung else (attribut, self.window))
+        return next(text for _, wert, text in GRANULARITIES if wert == stufe) % attribut
+
+    def per_day(self, df, group, stufe="day"):
+        #Tageswerte einer Serie pro Land bzw. Kontinent auf das Punktebudget ausdünnen;
+        #geglättete bzw. gemittelte Spalten heissen wie ihr Achsentitel (label)
+        spalten = [self.x_attribut, self.y_attribut] if self.chart == "3" else [self.y_attribut]
+        with stage("decimate"):
+            df = decimate(df, group, spalten, self.points, self.decimation)
+        namen = {spalte: self.label(spalte, stufe) for spalte in spalten}
+        if any(spalte != name for spalte, name in namen.items()):
+            df = df.rename(columns=namen)
+        return df
+
+
+def point_budget(width):
+    #Punkte pro Serie aus der Fensterbreite: ein Diagramm ist ab 992px 5/12 breit,
+    #darunter so breit wie das Fenster; auf 100 gerundet, damit der Cache greift
+    if not width:
+        return DEFAULT_POINTS
+    breite = width * 5 // 12 if width >= 992 else width
+    return max(200, -(-breite // 100) * 100)
+
+
+def _render_mode(df):
+    return "webgl" if len(df) > WEBGL_THRESHOLD else "svg"
+
+
+class Selection:
+    #Auswahl (Länder bzw. Kontinente, Zeitraum) eines Requests; jede Tabelle wird
+    #beim ersten Zugriff mit den Attributen aller Diagramme berechnet
+
+    def __init__(self, dataset, scope, values, start_date, end_date, attributes):
+        self.dataset = dataset
+        self.scope = scope
+        self.values = values
+        self.start_date = start_date
+        self.end_date = end_date
+        self.attributes = list(OrderedDict.fromkeys(attributes))
+        self._frames = {}
+        #Diagramme im Thread-Pool teilen sich die Selection: ein Lock pro Tabelle, damit jede
+        #Tabelle nur einmal und verschiedene Tabellen gleichzeitig berechnet werden
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def _frame(self, key, funktion, *args, **kwargs):
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._frames:
+                #Zeilen lesen ("filter") bzw. Mittelwerte aus den Aggregaten ("aggregate")
+                with stage("filter" if key[0] == "location_per_day" else "aggregate"):
+                    self._frames[key] = funktion(*args, **kwargs)
+            return self._frames[key]
+
+    def location_per_day(self, smoothing="off", window=7, stufe="day"):
+        #Werte pro Land und Tag, mit smoothing geglättet bzw. gemittelt pro Woche oder Monat (stufe)
+        if stufe != "day":
+            return self._frame(("location_per_interval", stufe), self.dataset.cube.location_per_interval,
+                               self.scope, self.values, self.start_date, self.end_date, self.attributes, stufe)
+        if smoothing == "off":
+            window = 7
+        return self._frame(("location_per_day", smoothing, window), self.dataset.location_per_day, self.scope,
+                           self.values, self.start_date, self.end_date, self.attributes, smoothing=smoothing,
+                           window=window)
+
+    def location_per_period(self, by=("location",)):
+        #Mittelwert pro Land über den Zeitraum
+        return self._frame(("location_per_period",) + tuple(by), self.dataset.cube.location_per_period,
+                           self.scope, self.values, self.start_date, self.end_date, self.attributes, by=by)
+
+    def continent_per_day(self, smoothing="off", window=7, stufe="day"):
+        #Tagesmittel pro Kontinent, mit smoothing geglättet bzw. gemittelt pro Woche oder Monat (stufe)
+        if stufe != "day":
+            return self._frame(("continent_per_interval", stufe), self.dataset.cube.continent_per_interval,
+                               self.values, self.start_date, self.end_date, self.attributes, stufe)
+        if smoothing == "off":
+            window = 7
+        return self._frame(("continent_per_day", smoothing, window), self.dataset.cube.continent_per_day,
+                           self.values, self.start_date, self.end_date, self.attributes, smoothing=smoothing,
+                           window=window)
+
+    def location_ranking(self, attribut, order="top", n=10):
+        #Die n Länder mit dem höchsten bzw. tiefsten Mittelwert über den Zeitraum: im Tab
+        #der Länder aus allen Ländern, sonst aus den Ländern der ausgewählten Kontinente
+        if self.scope == "location":
+            column, values = "continent", self.dataset.continent_list
+        else:
+            column, values = self.scope, self.values
+        return self._frame(("location_ranking", attribut, order, n), self.dataset.cube.location_ranking, column,
+                           values, self.start_date, self.end_date, attribut, n=n, order=order)
+
+    def continent_per_period(self):
+        #Mittelwert pro Kontinent über den Zeitraum
+        return self._frame("continent_per_period", self.dataset.cube.continent_per_period, self.values,
+                           self.start_date, self.end_date, self.attributes)
+
+
+def render(selection, diagram):
+    if diagram.scope == "location":
+        return _render_location(selection, diagram)
+    return _render_continent(selection, diagram)
+
+
+def _render_location(selection, diagram):
+    y_attribut, x_attribut = diagram.y_attribut, diagram.x_attribut
+    stufe = diagram.resolution(selection.start_date, selection.end_date)
+    if diagram.chart == "1":
+    #Liniendiagramm (y-Achse: Attribut von Filter 1)
+        df = diagram.per_day(selection.location_per_day(diagram.smoothing, diagram.window, stufe), 'location', stufe)
+        fig = figures.line(df, x="date", y=diagram.label(y_attribut, stufe), color='location', render_mode=_render_mode(df))
+    elif diagram.chart == "2":
+    #Balkendiagramm, Durchschnittswerte über ausgewählten Zeitpunkt
+        fig = figures.bar(selection.location_per_period(), x="location", y=y_attribut)
+    elif diagram.chart == "3":
+    #Streudiagramm  (y-Achse: Attribut von Filter 1, x-Achse: Attribut von Filter 2)
+        if diagram.x_radio == "on":
+            df = diagram.per_day(selection.location_per_day(diagram.smoothing, diagram.window, stufe), 'location', stufe)
+            fig = figures.scatter(df, x=diagram.label(x_attribut, stufe), y=diagram.label(y_attribut, stufe), color='location', hover_data=["date"], render_mode=_render_mode(df))
+        else:
+            fig = figures.scatter(selection.location_per_period(), x=x_attribut, y=y_attribut, color='location')
+    elif diagram.chart == "6":
+    #Rangliste, Länder mit dem höchsten bzw. tiefsten Durchschnittswert über den ausgewählten Zeitpunkt
+        fig = figures.bar(selection.location_ranking(y_attribut, diagram.ranking, diagram.ranking_size), x="location", y=y_attribut, hover_name='continent')
+    return fig
+
+
+def _render_continent(selection, diagram):
+    y_attribut, x_attribut, sonstige_attribut = diagram.y_attribut, diagram.x_attribut, diagram.sonstige_attribut
+    stufe = diagram.resolution(selection.start_date, selection.end_date)
+    #Liniendiagramm
+    if diagram.chart == "1":
+        if diagram.y_radio == "on":
+            #Tageswerte der Länder des gewählten Kontinents
+            df = diagram.per_day(selection.location_per_day(diagram.smoothing, diagram.window, stufe), 'location', stufe)
+            fig = figures.line(df, x="date", y=diagram.label(y_attribut, stufe), color='location', hover_name='location', render_mode=_render_mode(df))
+        else:
+            #Tagesdurchschnitt pro Kontinent
+            df = diagram.per_day(selection.continent_per_day(diagram.smoothing, diagram.window, stufe), 'continent', stufe)
+            fig = figures.line(df, x="date", y=diagram.label(y_attribut, stufe), color='continent', render_mode=_render_mode(df))
+    #Balkendiagramm
+    elif diagram.chart == "2":
+        if diagram.y_radio == "on":
+            # Durchschnittswert der Länder des gewählten Kontinents über den ausgewählten Zeitpunkt
+            fig = figures.bar(selection.location_per_period(by=["continent", "location"]), x="continent", y=y_attribut, hover_name='location')
+        else:
+            # Durchschnittswerte des Kontinents über ausgewählten Zeitpunkt und all seine Länder
+            fig = figures.bar(selection.continent_per_period(), x="continent", y=y_attribut)
+    #Streudiagramm
+    elif diagram.chart == "3":
+        if diagram.x_radio == "on":
+            if diagram.y_radio == "on":
+                df = diagram.per_day(selection.location_per_day(diagram.smoothing, diagram.window, stufe), 'location', stufe)
+                fig = figures.scatter(df, x=diagram.label(x_attribut, stufe), y=diagram.label(y_attribut, stufe), color='continent', hover_name='location', hover_data=["date"], render_mode=_render_mode(df))
+            else:
+                df = diagram.per_day(selection.continent_per_day(diagram.smoothing, diagram.window, stufe), 'continent', stufe)
+                fig = figures.scatter(df, x=diagram.label(x_attribut, stufe), y=diagram.label(y_attribut, stufe), color='continent', hover_data=["date"], render_mode=_render_mode(df))
+        else:
+            if diagram.y_radio == "on":
+                fig = figures.scatter(selection.location_per_period(by=["continent", "location"]), x=x_attribut, y=y_attribut, color='continent', hover_name='location')
+            else:
+                fig = figures.scatter(selection.continent_per_period(), x=x_attribut, y=y_attribut, color='continent')
+    #Treemap, Werteverteilung
+    elif diagram.chart == "4":
+        fig = figures.treemap(selection.location_per_period(by=["continent", "location"]), path=["Total", 'continent', 'location'], values=sonstige_attribut, colors=TREEMAP_COLORS,
+                              root_color=TREEMAP_ROOT_COLOR, margin=TREEMAP_MARGIN)
+    # Choropleth
+    elif diagram.chart == "5":
+        fig = figures.choropleth(selection.location_per_period(by=["iso_code", "location", "continent"]), locations="iso_code", color=sonstige_attribut, color_continuous_scale=CHOROPLETH_SCALE, hover_name="location",
+                                 margin=CHOROPLETH_MARGIN)
+    #Rangliste der Länder des gewählten Kontinents
+    elif diagram.chart == "6":
+        fig = figures.bar(selection.location_ranking(y_attribut, diagram.ranking, diagram.ranking_size), x="location", y=y_attribut, hover_name='continent')
+    return fig
+
+
+def render_panels(dataset, scope, values, start_date, end_date, diagrams, cache=None, compact=False, threads=1):
+    #Figuren aller Diagramme eines Tabs. Figuren aus dem Cache werden übernommen,
+    #die übrigen Diagramme teilen sich eine Selection. compact: Daten-Arrays
+    #für die Antwort verkleinern (siehe payload.py); threads: Figuren parallel bauen
+    figuren = [None] * len(diagrams)
+    fehlend = []
+    for i, diagram in enumerate(diagrams):
+        key = None
+        if cache is not None:
+            with stage("cache"):
+                key = cache.key("diagramm", [values, start_date, end_date] + diagram.key(), dataset.version)
+                daten = cache.get(key)
+            if daten is not None:
+                with stage("serialize"):
+                    figuren[i] = json.loads(daten)
+                continue
+        fehlend.append((i, key))
+    if not fehlend:
+        return figuren
+    if cache is None:
+        _render_missing(dataset, scope, values, start_date, end_date, diagrams, fehlend, figuren, None, compact,
+                        threads)
+        return figuren
+
+    #Gleichzeitige Requests mit denselben fehlenden Diagrammen (z.B. ein geteilter
+    #Link) rechnen nur einmal, die übrigen warten und lesen das Ergebnis aus dem Cache
+    with cache.flight([key for _, key in fehlend]) as gewartet:
+        if gewartet:
+            with stage("cache"):
+                noch_fehlend = []
+                for i, key in fehlend:
+                    daten = cache.resolve(key)
+                    if daten is None:
+                        noch_fehlend.append((i, key))
+                    else:
+                        figuren[i] = json.loads(daten)
+            fehlend = noch_fehlend
+        if fehlend:
+            _render_missing(dataset, scope, values, start_date, end_date, diagrams, fehlend, figuren, cache, compact,
+                            threads)
+    return figuren
+
+
+def _render_missing(dataset, scope, values, start_date, end_date, diagrams, fehlend, figuren, cache, compact,
+                    threads):
+    attribute = [attribut for i, _ in fehlend for attribut in diagrams[i].attributes]
+    selection = Selection(dataset, scope, values, start_date, end_date, attribute)
+    serialisieren = cache is not None
+    if threads > 1 and len(fehlend) > 1:
+        #Die Schritte in den Threads des Pools werden nicht einzeln erfasst,
+        #sondern zusammen als "figure"
+        with stage("figure"):
+            ergebnisse = list(_pool(threads).map(
+                lambda eintrag: _figure(selection, diagrams[eintrag[0]], compact, serialisieren), fehlend))
+    else:
+        ergebnisse = [_figure(selection, diagrams[i], compact, serialisieren) for i, _ in fehlend]
+    for (i, key), (fig, daten) in zip(fehlend, ergebnisse):
+        if cache is not None:
+            with stage("cache"):
+                cache.set(key, daten)
+        figuren[i] = fig
+
+
+def _figure(selection, diagram, compact, serialisieren):
+    #Figur und (für den Cache) ihr JSON
+    with stage("figure"):
+        fig = render(selection, diagram)
+    daten = None
+    with stage("serialize"):
+        if compact:
+            compact_figure(fig)
+        if serialisieren:
+            daten = to_json_plotly(fig)
+            fig = json.loads(daten)
+    return fig, daten
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(threads):
+    #Ein Pool pro Prozess und Grösse, erst beim ersten Gebrauch gestartet
+    #(Threads überleben den Fork der Gunicorn-Worker nicht)
+    with _pools_lock:
+        schluessel = (os.getpid(), threads)
+        pool = _pools.get(schluessel)
+        if pool is None:
+            pool = _pools[schluessel] = ThreadPoolExecutor(threads, thread_name_prefix="render")
+        return pool
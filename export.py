@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Export der Zahlen hinter den Diagrammen als CSV, Arrow IPC oder NDJSON.
+
+    GET /export/<table>.<format>?scope=location&values=Germany&values=Austria
+        &start_date=2021-01-01&end_date=2021-12-31
+        &attributes=new_cases_per_million&granularity=week
+
+table ist eine der Tabellen, aus denen die Callbacks zeichnen (TABLES):
+
+    location_per_day        Zeilen des Snapshots pro Land und Tag, mit
+                            granularity week bzw. month die Wochen- bzw.
+                            Monatsmittel pro Land (Cube)
+    location_per_period     Mittelwert pro Land über den Zeitraum
+    continent_per_day       Tagesmittel pro Kontinent (bzw. Wochen- oder
+                            Monatsmittel)
+    continent_per_period    Mittelwert pro Kontinent über den Zeitraum
+
+scope wählt wie in den Tabs nach Ländern ("location") oder Kontinenten
+("continent"); values ist die Auswahl (mehrfach, ohne values alle),
+attributes die Spalten (mehrfach, ohne attributes alle). Ohne Zeitraum gilt
+der ganze Datenstand. Unbekannte Länder und Kontinente fallen weg wie in den
+Dropdowns.
+
+Die Antwort wird in Stücken von höchstens chunk_values Werten (Zeilen ×
+Spalten) geschrieben (chunked transfer encoding). Die Zeilen des Snapshots
+werden stückweise aus den memory-mapped Spalten kopiert; der Speicher hängt
+nicht von der Grösse der Auswahl ab. Die Aggregate des Cubes sind klein
+(eine Zeile pro Land bzw. Kontinent und Periode) und werden ebenfalls
+stückweise serialisiert.
+
+Der ETag ist ein Hash aus Datenstand und Anfrage; er ist schwach, weil er den
+Inhalt bezeichnet und nicht die Bytes (die hängen z.B. von pandas und pyarrow
+ab). Ein erneuter Download mit If-None-Match bekommt 304,
+ohne dass Daten gelesen werden.
+"""
+
+import hashlib
+import io
+import json
+
+import flask
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from aggregates import PERIODS
+from catalog import KEY_COLUMNS
+from dataset import slice_ranges
+
+#Formate und ihr Content-Type
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson", "arrow": "application/vnd.apache.arrow.stream"}
+TABLES = ["location_per_day", "location_per_period", "continent_per_day", "continent_per_period"]
+#Werte (Zeilen × Spalten) pro Stück der Antwort
+CHUNK_VALUES = 200000
+
+
+def _row_chunks(von, bis, size):
+    #Zeilenbereiche [von, bis) in Stücke von höchstens size Zeilen aufteilen
+    teil_von, teil_bis, anzahl = [], [], 0
+    for a, b in zip(von.tolist(), bis.tolist()):
+        while a < b:
+            e = min(b, a + size - anzahl)
+            teil_von.append(a)
+            teil_bis.append(e)
+            anzahl += e - a
+            a = e
+            if anzahl == size:
+                yield np.array(teil_von, dtype=np.int64), np.array(teil_bis, dtype=np.int64)
+                teil_von, teil_bis, anzahl = [], [], 0
+    if anzahl:
+        yield np.array(teil_von, dtype=np.int64), np.array(teil_bis, dtype=np.int64)
+
+
+def _dates(df):
+    #Datum als Text "YYYY-MM-DD"
+    if "date" in df:
+        df = df.assign(date=df["date"].dt.strftime("%Y-%m-%d"))
+    return df
+
+
+def _csv(frames):
+    for nummer, df in enumerate(frames):
+        yield df.to_csv(index=False, header=nummer == 0, date_format="%Y-%m-%d").encode("utf-8")
+
+
+def _ndjson(frames):
+    #Eine Zeile pro Datensatz; fehlende Werte als null, Zahlen kürzestmöglich wie im CSV (repr)
+    for df in frames:
+        df = _dates(df)
+        namen = list(df.columns)
+        spalten = [df[name].astype(object).where(df[name].notna(), None).tolist() for name in namen]
+        yield "".join(json.dumps(dict(zip(namen, zeile)), separators=(",", ":"), allow_nan=False) + "\n"
+                      for zeile in zip(*spalten)).encode("utf-8")
+
+
+def _arrow(frames):
+    #IPC-Stream: Schema aus dem ersten Stück (Datum als date32), danach ein RecordBatch pro Stück
+    sink, writer, schema = io.BytesIO(), None, None
+    for df in frames:
+        tabelle = pa.Table.from_pandas(df, preserve_index=False)
+        if writer is None:
+            #Leere Textspalten (Auswahl ohne Zeilen) als string statt null
+            schema = pa.schema([pa.field("date", pa.date32()) if feld.name == "date"
+                                else pa.field(feld.name, pa.string()) if pa.types.is_null(feld.type) else feld
+                                for feld in tabelle.schema])
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_table(tabelle.cast(schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+
+SERIALIZERS = {"csv": _csv, "ndjson": _ndjson, "arrow": _arrow}
+
+
+class Export:
+    #Route /export/<table>.<format> auf dem jeweils aktuellen Datenstand des Stores
+
+    def __init__(self, store, chunk_values=CHUNK_VALUES):
+        self.store = store
+        self.chunk_values = chunk_values
+
+    def init_app(self, server):
+        server.add_url_rule("/export/<table>.<format>", "export", self._export)
+
+    def request(self, dataset, table, args):
+        #Auswahl aus den Query-Parametern, geprüft und mit den Vorgaben ergänzt
+        scope = args.get("scope", "continent" if table.startswith("continent") else "location")
+        if scope not in ("location", "continent") or (table.startswith("continent") and scope != "continent"):
+            flask.abort(400, "scope: location oder continent (Tabellen der Kontinente nur continent)")
+        values = args.getlist("values") or (dataset.location_list if scope == "location" else dataset.continent_list)
+        try:
+            start_date, end_date = (str(pd.Timestamp(args.get(name, vorgabe)).date()) for name, vorgabe in
+                                    [("start_date", dataset.oldest_date), ("end_date", dataset.newest_date)])
+        except ValueError:
+            flask.abort(400, "start_date und end_date: Datum YYYY-MM-DD")
+        granularity = args.get("granularity", "day")
+        if granularity not in ["day"] + PERIODS or (granularity != "day" and not table.endswith("_per_day")):
+            flask.abort(400, "granularity: day, %s (nur Tabellen pro Tag)" % ", ".join(PERIODS))
+        #Zeilen des Snapshots: alle Spalten ausser Schlüssel und Datum, Aggregate: Attribute des Cubes
+        if table == "location_per_day" and granularity == "day":
+            erlaubt = [name for name in dataset.column_names if name not in KEY_COLUMNS and name != "date"]
+        else:
+            erlaubt = list(dataset.cube.attributes)
+        attributes = args.getlist("attributes") or erlaubt
+        unbekannt = [name for name in attributes if name not in erlaubt]
+        if unbekannt:
+            flask.abort(400, "attributes: unbekannt %s" % ", ".join(unbekannt))
+        return {"scope": scope, "values": sorted(set(values)), "start_date": start_date, "end_date": end_date,
+                "attributes": list(dict.fromkeys(attributes)), "granularity": granularity}
+
+    def frames(self, dataset, table, scope, values, start_date, end_date, attributes, granularity="day"):
+        #Die Tabelle in Stücken von höchstens chunk_values Werten (mindestens ein, evtl. leeres Stück)
+        cube = dataset.cube
+        zeilen = max(1, self.chunk_values // (len(dataset.projection(attributes)) or 1))
+        if table == "location_per_day" and granularity == "day":
+            von, bis = dataset.row_ranges(scope, values, start_date, end_date)
+            leer = True
+            for teil_von, teil_bis in _row_chunks(von, bis, zeilen):
+                leer = False
+                yield dataset.frame(slice_ranges(teil_von, teil_bis), attributes)
+            if leer:
+                yield dataset.frame([], attributes)
+            return
+        if table == "location_per_day":
+            df = cube.location_per_interval(scope, values, start_date, end_date, attributes, granularity)
+        elif table == "location_per_period":
+            df = cube.location_per_period(scope, values, start_date, end_date, attributes)
+        elif granularity != "day":
+            df = cube.continent_per_interval(values, start_date, end_date, attributes, granularity)
+        elif table == "continent_per_day":
+            df = cube.continent_per_day(values, start_date, end_date, attributes)
+        else:
+            df = cube.continent_per_period(values, start_date, end_date, attributes)
+        for start in range(0, max(len(df), 1), zeilen):
+            yield df.iloc[start:start + zeilen]
+
+    def _export(self, table, format):
+        if table not in TABLES or format not in FORMATS:
+            flask.abort(404)
+        #Ein Datenstand für die ganze Antwort, auch wenn inzwischen ein neuer eingewechselt wird
+        dataset = self.store.current
+        anfrage = self.request(dataset, table, flask.request.args)
+        roh = json.dumps([dataset.version, table, format, anfrage], sort_keys=True)
+        etag = hashlib.sha1(roh.encode("utf-8")).hexdigest()
+        if flask.request.if_none_match.contains_weak(etag):
+            antwort = flask.Response(status=304)
+        else:
+            antwort = flask.Response(SERIALIZERS[format](self.frames(dataset, table, **anfrage)),
+                                     mimetype=FORMATS[format])
+            antwort.headers["Content-Disposition"] = 'attachment; filename="%s.%s"' % (table, format)
+        antwort.set_etag(etag, weak=True)
+        return antwort
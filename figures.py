@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Figuren direkt aus graph_objects, ohne plotly.express.
+
+plotly.express prüft bei jedem Aufruf seine Argumente, gruppiert den DataFrame
+mit pandas und validiert danach jede Eigenschaft jedes Traces sowie das ganze
+Layout mit Template. Die Funktionen hier bauen dieselben Figuren (Traces,
+Farben, Symbole, Hover-Texte, Achsen und Legende wie plotly.express mit dem
+Standard-Template) direkt aus den Spalten:
+
+    - die Zeilen sind bereits nach Land bzw. Kontinent sortiert; jede Gruppe
+      ist ein Bereich der NumPy-Arrays (sonst eine Auswahl von Zeilen in der
+      Reihenfolge des ersten Auftretens, wie bei plotly.express)
+    - Traces und Figur werden ohne Validierung erstellt (_validate=False);
+      alle Werte entstehen hier und entsprechen denen, die plotly.express nach
+      der Validierung übergibt
+    - Texte (Namen, Hover-Texte) sind Unicode-Arrays statt Arrays von
+      Python-Objekten: go.Figure und to_plotly_json() kopieren die Arrays mit
+      deepcopy, das Objekt-Arrays Element für Element kopiert (_text); das
+      JSON ist dasselbe
+    - das Layout hängt nur von Diagrammtyp und Titeln ab und wird pro
+      Kombination einmal gebaut (_layout); das Standard-Template setzt
+      go.Figure selbst
+
+benchmarks/figures.py vergleicht Figuren und Laufzeit mit plotly.express.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+#Farben und Symbole der Gruppen, wie plotly.express mit dem Standard-Template
+COLORS = list(pio.templates[pio.templates.default].layout.colorway)
+SYMBOLS = ["circle", "diamond", "square", "x", "cross"]
+
+
+def _text(spalte):
+    #Textspalte als Unicode-Array, über die eindeutigen Werte (fehlende Werte: Objekt-Array)
+    codes, werte = pd.factorize(spalte)
+    if (codes < 0).any():
+        return spalte.to_numpy()
+    return np.asarray(werte, dtype=str)[codes]
+
+
+def _groups(keys):
+    #[(Name, Zeilen)] in der Reihenfolge des ersten Auftretens; Zeilen ist ein
+    #Bereich, wenn jede Gruppe zusammenhängt (nach Gruppe sortierte Zeilen)
+    if len(keys) == 0:
+        return []
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    namen = keys[starts].tolist()
+    if len(set(namen)) == len(namen):
+        enden = np.r_[starts[1:], len(keys)].tolist()
+        return [(name, slice(von, bis)) for name, von, bis in zip(namen, starts.tolist(), enden)]
+    codes, namen = pd.factorize(keys)
+    reihenfolge = np.argsort(codes, kind="stable")
+    grenzen = np.searchsorted(codes[reihenfolge], np.arange(len(namen) + 1)).tolist()
+    return [(name, reihenfolge[grenzen[i]:grenzen[i + 1]]) for i, name in enumerate(namen.tolist())]
+
+
+@lru_cache(maxsize=256)
+def _layout(art, x=None, y=None, legende=None, sonstige=None):
+    #Layout ohne Template und ohne datenabhängige Teile, pro Kombination einmal gebaut
+    if art == "treemap":
+        return {"legend": {"tracegroupgap": 0}, "margin": {"t": 60}}
+    if art == "choropleth":
+        return {"geo": {"domain": {"x": [0.0, 1.0], "y": [0.0, 1.0]}, "center": {}},
+                "coloraxis": {"colorbar": {"title": {"text": sonstige}}},
+                "legend": {"tracegroupgap": 0}, "margin": {"t": 60}}
+    layout = {"xaxis": {"anchor": "y", "domain": [0.0, 1.0], "title": {"text": x}},
+              "yaxis": {"anchor": "x", "domain": [0.0, 1.0], "title": {"text": y}},
+              "legend": {"title": {"text": legende}, "tracegroupgap": 0} if legende else {"tracegroupgap": 0},
+              "margin": {"t": 60}}
+    if art == "bar":
+        layout["barmode"] = "relative"
+    return layout
+
+
+@lru_cache(maxsize=16)
+def _colorscale(name):
+    #Benannte Farbskala als Liste [[Position, Farbe], ...]
+    return [list(stufe) for stufe in go.layout.Coloraxis(colorscale=name).colorscale]
+
+
+def _figure(traces, layout):
+    return go.Figure(data=traces, layout=layout, _validate=False)
+
+
+def _hovertemplate(teile, hover_name):
+    #"name=wert" pro Teil, mit hover_name fett als Überschrift
+    text = "<br>".join("%s=%s" % teil for teil in teile) + "<extra></extra>"
+    return "<b>%{hovertext}</b><br><br>" + text if hover_name else text
+
+
+def _xy(df, x, y, color, hover_name, hover_data, render_mode, modus):
+    #Linien- bzw. Streudiagramm: ein Trace pro Wert von color, Farbe und Symbol nach color
+    xs, ys = df[x].to_numpy(), df[y].to_numpy()
+    texte = _text(df[hover_name]) if hover_name else None
+    zusatz = [df[spalte].to_numpy() for spalte in hover_data]
+    konstruktor = go.Scattergl if render_mode == "webgl" else go.Scatter
+    traces = []
+    for nummer, (name, zeilen) in enumerate(_groups(_text(df[color]))):
+        farbe = COLORS[nummer % len(COLORS)]
+        symbol = SYMBOLS[nummer % len(SYMBOLS)]
+        teile = [(color, name), (x, "%{x}"), (y, "%{y}")]
+        teile += [(spalte, "%%{customdata[%d]}" % i) for i, spalte in enumerate(hover_data)]
+        trace = {"hovertemplate": _hovertemplate(teile, hover_name), "legendgroup": name,
+                 "name": name, "showlegend": True, "x": xs[zeilen], "xaxis": "x", "y": ys[zeilen], "yaxis": "y"}
+        if modus == "lines+markers":
+            trace["line"] = {"color": farbe, "dash": "solid"}
+            trace["marker"] = {"symbol": symbol}
+        else:
+            trace["marker"] = {"color": farbe, "symbol": symbol}
+        trace["mode"] = modus
+        if render_mode != "webgl":
+            trace["orientation"] = "v"
+        if hover_name:
+            trace["hovertext"] = texte[zeilen]
+        if zusatz:
+            trace["customdata"] = np.stack([werte[zeilen] for werte in zusatz], axis=1)
+        traces.append(konstruktor(trace, _validate=False))
+    #Ohne Traces (leere Auswahl) hat die Legende wie bei plotly.express keinen Titel
+    return _figure(traces, _layout("xy", x, y, color if traces else None))
+
+
+def line(df, x, y, color, hover_name=None, render_mode="svg"):
+    #Wie px.line(df, x=x, y=y, color=color, symbol=color, hover_name=hover_name, render_mode=render_mode)
+    return _xy(df, x, y, color, hover_name, [], render_mode, "lines+markers")
+
+
+def scatter(df, x, y, color, hover_name=None, hover_data=(), render_mode="svg"):
+    #Wie px.scatter(df, x=x, y=y, color=color, symbol=color, hover_name=hover_name,
+    #hover_data=hover_data, render_mode=render_mode)
+    return _xy(df, x, y, color, hover_name, list(hover_data), render_mode, "markers")
+
+
+def bar(df, x, y, hover_name=None):
+    #Wie px.bar(df, x=x, y=y, color=x, hover_name=hover_name): ein Trace pro Wert von x
+    xs, ys = _text(df[x]), df[y].to_numpy()
+    texte = _text(df[hover_name]) if hover_name else None
+    traces = []
+    gruppen = _groups(xs)
+    for nummer, (name, zeilen) in enumerate(gruppen):
+        trace = {"hovertemplate": _hovertemplate([(x, "%{x}"), (y, "%{y}")], hover_name), "legendgroup": name,
+                 "marker": {"color": COLORS[nummer % len(COLORS)], "pattern": {"shape": ""}}, "name": name,
+                 "orientation": "v", "showlegend": True, "textposition": "auto", "x": xs[zeilen], "xaxis": "x",
+                 "y": ys[zeilen], "yaxis": "y"}
+        if hover_name:
+            trace["hovertext"] = texte[zeilen]
+        traces.append(go.Bar(trace, _validate=False))
+    layout = _layout("bar", x, y, x if traces else None)
+    #Balken in der Reihenfolge der Gruppen
+    layout = dict(layout, xaxis=dict(layout["xaxis"], categoryorder="array",
+                                     categoryarray=[name for name, _ in gruppen]))
+    return _figure(traces, layout)
+
+
+def treemap(df, path, values, colors, root_color=None, margin=None):
+    #Wie px.treemap(df, path=[px.Constant(path[0])] + path[1:], values=values,
+    #color_discrete_sequence=colors): path[0] ist die Wurzel, die übrigen Einträge
+    #Spalten von der obersten Ebene bis zu den Blättern (je Blatt eine Zeile)
+    werte = np.nan_to_num(df[values].to_numpy(dtype=np.float64, na_value=np.nan))
+    ids, labels, parents, summen = [], [], [], []
+    #Von den Blättern zur Wurzel; pro Ebene die Summe der Blätter jeder Gruppe
+    for ebene in range(len(path) - 1, 0, -1):
+        spalten = [np.full(len(df), path[0], dtype=object)] + [df[spalte].to_numpy(dtype=object)
+                                                                  for spalte in path[1:ebene + 1]]
+        pfade = spalten[0]
+        for spalte in spalten[1:]:
+            pfade = pfade + "/" + spalte
+        codes, eindeutig = pd.factorize(pfade)
+        ids += eindeutig.tolist()
+        erste = np.unique(codes, return_index=True)[1]
+        labels += spalten[-1][erste].tolist()
+        parents += [pfad.rsplit("/", 1)[0] for pfad in eindeutig.tolist()]
+        summen.append(np.bincount(codes, weights=werte, minlength=len(eindeutig)))
+    if len(df):
+        ids.append(path[0])
+        labels.append(path[0])
+        parents.append("")
+        summen.append(np.array([werte.sum()]))
+    trace = {"branchvalues": "total", "domain": {"x": [0.0, 1.0], "y": [0.0, 1.0]},
+             "hovertemplate": "labels=%%{label}<br>%s=%%{value}<br>parent=%%{parent}<br>id=%%{id}<extra></extra>"
+                              % values,
+             "ids": np.array(ids, dtype=str), "labels": np.array(labels, dtype=str), "name": "",
+             "parents": np.array(parents, dtype=str),
+             "values": np.concatenate(summen) if len(df) else np.zeros(0)}
+    if root_color is not None:
+        trace["root"] = {"color": root_color}
+    layout = dict(_layout("treemap"), treemapcolorway=list(colors))
+    if margin is not None:
+        layout["margin"] = margin
+    return _figure([go.Treemap(trace, _validate=False)], layout)
+
+
+def choropleth(df, locations, color, hover_name, color_continuous_scale, margin=None):
+    #Wie px.choropleth(df, locations=locations, color=color, hover_name=hover_name,
+    #color_continuous_scale=color_continuous_scale)
+    trace = {"coloraxis": "coloraxis", "geo": "geo",
+             "hovertemplate": _hovertemplate([(locations, "%{location}"), (color, "%{z}")], hover_name),
+             "hovertext": _text(df[hover_name]), "locations": _text(df[locations]), "name": "",
+             "z": df[color].to_numpy()}
+    layout = _layout("choropleth", sonstige=color)
+    layout = dict(layout, coloraxis=dict(layout["coloraxis"], colorscale=_colorscale(color_continuous_scale),
+                                                autocolorscale=False))
+    if margin is not None:
+        layout["margin"] = margin
+    return _figure([go.Choropleth(trace, _validate=False)], layout)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Gunicorn-Konfiguration für CoviDiagrams.
+
+Das Dashboard wird einmal im Master geladen (preload_app) und danach in die
+Worker geforkt. Die Datenspalten sind memory-mapped und liegen nur einmal im
+Page-Cache; mit gc.freeze() werden die beim Laden erzeugten Python-Objekte vor
+dem Fork aus der Garbage Collection genommen, damit ihre Speicherseiten in den
+Workern nicht durch GC-Durchläufe kopiert werden (Copy-on-Write).
+
+Jeder Worker startet nach dem Fork den Thread, der neue Daten übernimmt
+(siehe refresh.py); Threads überleben den Fork nicht.
+
+Jeder Worker bedient mit GUNICORN_THREADS Threads mehrere Requests
+gleichzeitig (Worker-Klasse gthread) aus derselben Kopie der Daten. Das ist
+sicher, weil ein Dataset nach dem Öffnen schreibgeschützt ist und jeder
+Callback den Datenstand nur einmal aus dem DatasetStore liest (siehe
+dataset.py); benchmarks/concurrency.py prüft das, während der Datenstand
+laufend gewechselt wird. Die Threads teilen sich den GIL, für mehr
+Rechenleistung braucht es weiterhin mehrere Worker (WEB_CONCURRENCY).
+"""
+
+import gc
+import os
+
+bind = "0.0.0.0:" + os.environ.get("PORT", "8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+preload_app = True
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import dashboard
+    dashboard.refresher.start()
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Messwerte der Callbacks: Zeiten pro Verarbeitungsschritt, Latenz,
+Antwortgrösse und Trefferquote des Figuren-Caches.
+
+Jeder Request an einen Dash-Callback wird als Trace erfasst. Code, der
+gemessen werden soll, läuft in einem Schritt:
+
+    with stage("figure"):
+        fig = px.line(...)
+
+Die Zeit verschachtelter Schritte zählt nur beim innersten Schritt; was ausser
+den Schritten anfällt (Dash, Serialisieren der Antwort), erscheint als
+"dash". Die Zeiten gehen als Server-Timing-Header an den Browser und in
+Histogramme, die /metrics im Textformat von Prometheus ausgibt. Jeder Worker
+zählt für sich.
+
+Stichprobenweise werden Callbacks mit cProfile aufgezeichnet
+(COVIDIAGRAMS_PROFILE_RATE, Anteil der Requests; COVIDIAGRAMS_PROFILE_CALLBACK
+schränkt auf Callbacks ein, deren Name den Text enthält). Die Profile landen
+als .prof-Dateien in COVIDIAGRAMS_PROFILE_DIR (auswerten mit pstats oder
+snakeviz).
+"""
+
+import cProfile
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import flask
+
+#Grenzen der Histogramme: Sekunden bzw. Bytes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1000, 3000, 10000, 30000, 100000, 300000, 1000000, 3000000, 10000000)
+
+#Pfad der Dash-Callbacks
+CALLBACK_PATH = "/_dash-update-component"
+
+_local = threading.local()
+
+
+class Histogram:
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._werte = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, wert):
+        with self._lock:
+            zaehler = self._werte.get(labels)
+            if zaehler is None:
+                zaehler = self._werte[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, grenze in enumerate(self.buckets):
+                if wert <= grenze:
+                    zaehler[0][i] += 1
+            zaehler[1] += wert
+            zaehler[2] += 1
+
+    def lines(self):
+        zeilen = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s histogram" % self.name]
+        with self._lock:
+            werte = sorted(self._werte.items())
+        for labels, (buckets, summe, anzahl) in werte:
+            for grenze, n in zip(self.buckets, buckets):
+                zeilen.append("%s_bucket%s %d" % (self.name, _labels(self.labels, labels, le=_zahl(grenze)), n))
+            zeilen.append("%s_bucket%s %d" % (self.name, _labels(self.labels, labels, le="+Inf"), anzahl))
+            zeilen.append("%s_sum%s %s" % (self.name, _labels(self.labels, labels), _zahl(summe)))
+            zeilen.append("%s_count%s %d" % (self.name, _labels(self.labels, labels), anzahl))
+        return zeilen
+
+
+def _zahl(wert):
+    return repr(float(wert)) if isinstance(wert, float) else str(wert)
+
+
+def _labels(namen, werte, **weitere):
+    paare = list(zip(namen, werte)) + list(weitere.items())
+    if not paare:
+        return ""
+    text = ",".join('%s="%s"' % (name, str(wert).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for name, wert in paare)
+    return "{%s}" % text
+
+
+def callback_name(output):
+    #Kurzer Name eines Callbacks aus seiner Ausgabe, z.B. "location:diagramm-graph.figure"
+    #für {"index": ["ALL"], "scope": "location", "type": "diagramm-graph"}.figure
+    namen = []
+    teile = output[2:-2].split("...") if output.startswith("..") else [output]
+    for teil in teile:
+        komponente, _, eigenschaft = teil.rpartition(".")
+        if komponente.startswith("{"):
+            try:
+                felder = json.loads(komponente)
+            except ValueError:
+                felder = {}
+            komponente = ":".join(str(felder[k]) for k in sorted(felder) if not isinstance(felder[k], list))
+        namen.append("%s.%s" % (komponente, eigenschaft))
+    return "+".join(namen)
+
+
+@contextmanager
+def stage(name):
+    #Zeit eines Verarbeitungsschritts im laufenden Trace erfassen (ohne Trace: nichts tun)
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        yield
+        return
+    trace["stack"].append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        dauer = time.perf_counter() - start
+        innen = trace["stack"].pop()
+        trace["stages"][name] = trace["stages"].get(name, 0.0) + dauer - innen
+        if trace["stack"]:
+            trace["stack"][-1] += dauer
+
+
+class Metrics:
+
+    def __init__(self, profile_rate=0.0, profile_callback="", profile_dir=None, allow=("127.0.0.1", "::1")):
+        self.latency = Histogram("covidiagrams_callback_seconds", "Latenz der Callback-Requests",
+                                 ("callback",), LATENCY_BUCKETS)
+        self.stages = Histogram("covidiagrams_callback_stage_seconds", "Zeit pro Verarbeitungsschritt",
+                                ("callback", "stage"), LATENCY_BUCKETS)
+        self.sizes = Histogram("covidiagrams_callback_response_bytes", "Grösse der Antworten (vor Kompression)",
+                               ("callback",), SIZE_BUCKETS)
+        self.profile_rate = profile_rate
+        self.profile_callback = profile_callback
+        self.profile_dir = profile_dir or os.path.join(tempfile.gettempdir(), "covidiagrams-profiles")
+        self.allow = set(allow)
+        self._gauges = []
+
+    def register(self, name, typ, help, funktion):
+        #Weiterer Messwert, beim Abruf von /metrics gelesen; funktion gibt eine Zahl
+        #oder ein Dictionary {label-Wert: Zahl} zurück (Label "kind")
+        self._gauges.append((name, typ, help, funktion))
+
+    def init_app(self, server):
+        server.before_request(self._before)
+        server.after_request(self._after)
+        server.add_url_rule("/metrics", "metrics", self._metrics)
+
+    def _before(self):
+        _local.trace = None
+        if flask.request.path != CALLBACK_PATH:
+            return
+        body = flask.request.get_json(silent=True) or {}
+        name = callback_name(body.get("output", ""))
+        profiler = None
+        if (self.profile_rate > 0 and self.profile_callback in name
+                and random.random() < self.profile_rate):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        _local.trace = {"callback": name, "start": time.perf_counter(), "stages": {}, "stack": [],
+                        "profiler": profiler}
+
+    def _after(self, response):
+        trace = getattr(_local, "trace", None)
+        if trace is None:
+            return response
+        _local.trace = None
+        if trace["profiler"] is not None:
+            trace["profiler"].disable()
+            self._dump(trace["profiler"], trace["callback"])
+        gesamt = time.perf_counter() - trace["start"]
+        schritte = dict(trace["stages"])
+        schritte["dash"] = max(0.0, gesamt - sum(schritte.values()))
+
+        name = trace["callback"]
+        self.latency.observe((name,), gesamt)
+        for schritt, dauer in schritte.items():
+            self.stages.observe((name, schritt), dauer)
+        if not response.direct_passthrough:
+            self.sizes.observe((name,), response.content_length or len(response.get_data()))
+
+        timing = ["%s;dur=%.2f" % (schritt, dauer * 1000) for schritt, dauer in schritte.items()]
+        timing.append("total;dur=%.2f" % (gesamt * 1000))
+        response.headers["Server-Timing"] = ", ".join(timing)
+        return response
+
+    def _dump(self, profiler, name):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        datei = "%s-%d-%d.prof" % ("".join(c if c.isalnum() or c in "-_." else "_" for c in name),
+                                  time.time() * 1000, os.getpid())
+        profiler.dump_stats(os.path.join(self.profile_dir, datei))
+
+    def render(self):
+        zeilen = self.latency.lines() + self.stages.lines() + self.sizes.lines()
+        for name, typ, help, funktion in self._gauges:
+            zeilen += ["# HELP %s %s" % (name, help), "# TYPE %s %s" % (name, typ)]
+            wert = funktion()
+            if isinstance(wert, dict):
+                zeilen += ["%s%s %s" % (name, _labels(("kind",), (k,)), _zahl(v)) for k, v in sorted(wert.items())]
+            else:
+                zeilen.append("%s %s" % (name, _zahl(wert)))
+        return "\n".join(zeilen) + "\n"
+
+    def _metrics(self):
+        #Nur lokal abrufbar (Prometheus-Agent auf dem Host)
+        if flask.request.remote_addr not in self.allow:
+            flask.abort(403)
+        return flask.Response(self.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Kompakte Figuren für die Antworten der Diagramm-Callbacks.
+
+Die Daten-Arrays der Traces werden vor dem Serialisieren verkleinert:
+
+    - Datumswerte ohne Uhrzeit als "YYYY-MM-DD" statt mit Nanosekunden
+    - Gleitkommawerte als float32, wenn Plotly sie als Typed Array (base64)
+      ausgibt (ab plotly 6, der Browser dekodiert sie direkt) und jeder Wert
+      als float32 genau erhalten bleibt (wie in storage.encode; z.B.
+      total_cases über 16.7 Mio. bleiben float64); sonst jeder Wert auf
+      SIGNIFICANT_DIGITS signifikante Stellen gerundet, was im JSON kürzere
+      Zahlen ergibt
+
+Die Kompression der Antworten selbst (Brotli/gzip) übernimmt Flask-Compress
+im Dashboard.
+"""
+
+import numpy as np
+import plotly
+
+#Signifikante Stellen für gerundete Werte (bezogen auf den Betrag jedes Werts)
+SIGNIFICANT_DIGITS = 6
+
+#Plotly serialisiert NumPy-Arrays ab Version 6 als Typed Arrays (dtype + bdata)
+TYPED_ARRAYS = int(plotly.__version__.split(".")[0]) >= 6
+
+#Daten-Attribute der Traces, die verkleinert werden
+ARRAY_PROPERTIES = ["x", "y", "z", "values", "customdata", "lat", "lon"]
+
+
+def round_significant(values, digits=SIGNIFICANT_DIGITS):
+    #Jeden Wert auf digits signifikante Stellen seines eigenen Betrags runden
+    gerundet = np.array(values, dtype=np.float64)
+    rund = np.isfinite(gerundet) & (gerundet != 0)
+    if not rund.any():
+        return gerundet
+    werte = gerundet[rund]
+    #Nachkommastellen pro Wert; bei negativen durch eine ganze Zehnerpotenz teilen, damit
+    #der gerundete Wert genau die kürzere Dezimalzahl ergibt
+    stellen = np.minimum(digits - 1 - np.floor(np.log10(np.abs(werte))), 300)
+    faktor = 10.0 ** np.abs(stellen)
+    nachkomma = stellen >= 0
+    werte[nachkomma] = np.round(werte[nachkomma] * faktor[nachkomma]) / faktor[nachkomma]
+    werte[~nachkomma] = np.round(werte[~nachkomma] / faktor[~nachkomma]) * faktor[~nachkomma]
+    gerundet[rund] = werte
+    return gerundet
+
+
+def compact_array(values):
+    #Verkleinertes Array oder None, wenn es so bleiben soll
+    if not isinstance(values, np.ndarray) or values.size == 0:
+        return None
+    if values.dtype.kind == "M":
+        tage = values.astype("datetime64[D]")
+        if np.all((tage == values) | np.isnat(values)):
+            return np.datetime_as_string(tage, unit="D")
+        return None
+    if values.dtype.kind == "f":
+        if TYPED_ARRAYS:
+            #float32 nur, wenn jeder Wert genau erhalten bleibt
+            kompakt = values.astype(np.float32)
+            if np.array_equal(kompakt.astype(np.float64), values, equal_nan=True):
+                return kompakt
+            return None
+        return round_significant(values)
+    return None
+
+
+def compact_figure(fig):
+    #Daten-Arrays aller Traces einer Figur verkleinern
+    for trace in fig.data:
+        for name in ARRAY_PROPERTIES:
+            if name not in trace:
+                continue
+            kompakt = compact_array(trace[name])
+            if kompakt is not None:
+                trace[name] = kompakt
+    return fig
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Aktualisierung des Datenstands im laufenden Betrieb.
+
+Ein Hintergrund-Thread pro Worker prüft in festen Abständen, ob die Quelle
+(OWID-URL oder eine lokal abgelegte CSV-Datei) neue Daten hat:
+
+    - URL: bedingter Download mit If-None-Match / If-Modified-Since
+    - Datei: Vergleich von Änderungszeit und Grösse
+
+Nur der Worker, der die Sperrdatei bekommt, lädt die Quelle und hängt die
+Zeilen an den Snapshot an, deren Datum nach dem letzten Datum des jeweiligen
+Landes liegt. Alle Worker öffnen danach den neuen Snapshot und wechseln ihn
+im DatasetStore ein; laufende Callbacks arbeiten mit dem alten Stand zu Ende.
+Die Kontinent-Aggregate werden dabei nur um die neuen Zeilen ergänzt.
+
+Umgebungsvariablen:
+    COVIDIAGRAMS_REFRESH_INTERVAL   Sekunden zwischen zwei Prüfungen (0 = aus)
+    COVIDIAGRAMS_REFRESH_SOURCE     URL oder Pfad der OWID-CSV
+"""
+
+import fcntl
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+import snapshot
+from dataset import Dataset
+
+LOCK_FILE = ".refresh.lock"
+
+logger = logging.getLogger(__name__)
+
+
+def fetch(source, stand):
+    #Quelle nur laden, wenn sie sich seit dem letzten Stand geändert hat;
+    #gibt (Datei, neuer Stand) zurück bzw. (None, None) wenn unverändert
+    if re.match(r"https?://", source):
+        headers = {}
+        if stand.get("etag"):
+            headers["If-None-Match"] = stand["etag"]
+        if stand.get("last_modified"):
+            headers["If-Modified-Since"] = stand["last_modified"]
+        try:
+            antwort = urllib.request.urlopen(urllib.request.Request(source, headers=headers), timeout=120)
+        except urllib.error.HTTPError as fehler:
+            if fehler.code == 304:
+                return None, None
+            raise
+        with antwort:
+            fd, datei = tempfile.mkstemp(suffix=".csv")
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(antwort, f)
+            return datei, {"etag": antwort.headers.get("ETag"),
+                           "last_modified": antwort.headers.get("Last-Modified")}
+    info = os.stat(source)
+    kennung = "%d/%d" % (info.st_mtime_ns, info.st_size)
+    if stand.get("stamp") == kennung:
+        return None, None
+    return source, {"stamp": kennung}
+
+
+class _Lock:
+    #Sperrdatei neben dem Snapshot; nicht blockierend, nur ein Worker aktualisiert
+
+    def __init__(self, path):
+        self.path = path
+        self.gesperrt = False
+
+    def __enter__(self):
+        self._datei = open(self.path, "w")
+        try:
+            fcntl.flock(self._datei, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.gesperrt = True
+        except OSError:
+            self.gesperrt = False
+        return self
+
+    def __exit__(self, *args):
+        if self.gesperrt:
+            fcntl.flock(self._datei, fcntl.LOCK_UN)
+        self._datei.close()
+
+
+class Refresher:
+
+    def __init__(self, store, path, source=snapshot.OWID_URL, interval=3600):
+        self.store = store
+        self.path = path
+        self.source = source
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="covidiagrams-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Aktualisierung von %s fehlgeschlagen", self.source)
+
+    def run_once(self):
+        #Zuerst einen von einem anderen Worker geschriebenen Stand übernehmen
+        self.reload()
+        lock_path = os.path.join(os.path.dirname(os.path.abspath(self.path)), LOCK_FILE)
+        with _Lock(lock_path) as lock:
+            if lock.gesperrt:
+                self.update_snapshot()
+        return self.reload()
+
+    def update_snapshot(self):
+        meta = snapshot.read_meta(self.path)
+        datei, stand = fetch(self.source, meta.get("refresh", {}))
+        if datei is None:
+            return False
+        try:
+            df = snapshot.read_owid_csv(datei)
+        finally:
+            if datei != self.source:
+                os.remove(datei)
+        basis = self.store.current
+        neue_zeilen = basis.new_rows(df)
+        if len(neue_zeilen) == 0:
+            snapshot.update_meta(self.path, {"refresh": stand})
+            return False
+        alt = basis.frame(slice(None))
+        neue_zeilen = neue_zeilen[alt.columns.intersection(neue_zeilen.columns)].assign(
+            date=pd.to_datetime(neue_zeilen["date"]))
+        gesamt = pd.concat([alt, neue_zeilen], ignore_index=True)
+        snapshot.write_snapshot(gesamt, self.path, codebook=basis.codebook, source=meta.get("source"),
+                                extra={"refresh": stand, "appended_to": basis.version})
+        logger.info("%d neue Zeilen aus %s übernommen", len(neue_zeilen), self.source)
+        return True
+
+    def reload(self):
+        #Neuen Snapshot öffnen und einwechseln, falls sich der Datenstand geändert hat
+        aktuell = self.store.current
+        try:
+            meta = snapshot.read_meta(self.path)
+        except (OSError, ValueError):
+            #Snapshot wird gerade von einem anderen Worker ersetzt
+            return False
+        if snapshot.version(meta) == aktuell.version:
+            return False
+        previous = aktuell if meta.get("appended_to") == aktuell.version else None
+        self.store.swap(Dataset(self.path, previous=previous))
+        return True
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Tagesreihen einer Auswahl für das Zeichnen im Browser.
+
+Nach einer Änderung der Länder- bzw. Kontinentauswahl oder der Diagramme
+schickt der Server die Tageswerte der ausgewählten Länder über den ganzen
+Datenstand einmal in einen dcc.Store. Einen neuen Zeitraum zeichnet danach
+assets/diagrams.js im Browser, ohne Request an den Server:
+
+    - Tage pro Land per Binärsuche auswählen
+    - Mittelwerte über den Zeitraum aus Präfixsummen wie der Cube
+      (aggregates.py), Tagesmittel pro Kontinent und Wochen- bzw.
+      Monatsmittel aus denselben Summen
+    - Tageswerte ausdünnen wie decimation.minmax
+    - Figuren wie figures.py (Template, Farben usw. aus figure_defaults())
+
+Die Zahlenspalten sind kompakt kodiert wie im Snapshot (storage.encode):
+float32 mit Nachkommastellen bzw. Zeilennummern und Werte der vorhandenen
+Einträge, als base64. Das Datum ist die Tagesnummer seit 1970 (int32).
+
+Der Store enthält nur die Tagesreihen; die Beschreibung der Diagramme kommt
+über die Stores der Diagramme. Solange sich der Schlüssel (Datenstand,
+Auswahl, Attribute) nicht ändert, behält der Browser den Store und bekommt
+nach einer Änderung der Diagramme nur die neuen Beschreibungen.
+
+Grosse Auswahlen (mehr als max_values Werte), Diagramme mit lttb,
+geglättete Tageswerte und Ranglisten (brauchen alle Länder) bleiben beim
+Server, ebenso Tabs ohne Tageswerte (nur Mittelwerte über den Zeitraum wie
+Treemap und Choropleth, deren Figuren kleiner sind als die Tagesreihen); der
+Store ist dann leer und die Figuren kommen wie bisher aus render_panels.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+import numpy as np
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+
+import figures
+import storage
+from dataset import slice_ranges, take
+from diagrams import (CHOROPLETH_MARGIN, CHOROPLETH_SCALE, GRANULARITIES, RANKING_CHARTS, TREEMAP_COLORS,
+                      TREEMAP_MARGIN, TREEMAP_ROOT_COLOR, WEBGL_THRESHOLD)
+from metrics import stage
+
+#Höchstens so viele Werte (Zeilen × Attribute) gehen pro Auswahl an den Browser
+MAX_VALUES = 50000
+
+#Ausdünnen, das auch der Browser kann
+BROWSER_DECIMATION = ["minmax", "off"]
+
+
+def figure_defaults():
+    #Was der Browser zum Bauen der Figuren braucht, einmal mit dem Layout geschickt
+    return {
+        "template": json.loads(to_json_plotly(pio.templates[pio.templates.default])),
+        "colors": figures.COLORS,
+        "symbols": figures.SYMBOLS,
+        "webgl_threshold": WEBGL_THRESHOLD,
+        "granularities": {wert: text for _, wert, text in GRANULARITIES},
+        "treemap": {"colors": TREEMAP_COLORS, "root_color": TREEMAP_ROOT_COLOR, "margin": TREEMAP_MARGIN},
+        "choropleth": {"colorscale": figures._colorscale(CHOROPLETH_SCALE), "margin": CHOROPLETH_MARGIN},
+    }
+
+
+def _array(werte, dtype):
+    #Array als {"dtype": ..., "bdata": base64} (little-endian)
+    daten = np.ascontiguousarray(werte, dtype=np.dtype(dtype).newbyteorder("<"))
+    return {"dtype": dtype, "bdata": base64.b64encode(daten.tobytes()).decode("ascii")}
+
+
+def _column(werte):
+    #Zahlenspalte in der kompakten Form von storage.encode
+    angaben, arrays = storage.encode(werte)
+    spalte = _array(arrays["values"], arrays["values"].dtype.name)
+    if "decimals" in angaben:
+        spalte["decimals"] = angaben["decimals"]
+    if "index" in arrays:
+        spalte["index"] = _array(arrays["index"], "int32")
+    return spalte
+
+
+def _attributes(diagrams):
+    return list(OrderedDict.fromkeys(attribut for diagram in diagrams for attribut in diagram.attributes))
+
+
+def series_key(dataset, scope, values, diagrams, max_values=MAX_VALUES):
+    #Schlüssel der Tagesreihen (Datenstand, Auswahl, Attribute), oder None, wenn der Server die Figuren zeichnet
+    if not max_values or not any(diagram.daily for diagram in diagrams) or any(
+            diagram.decimation not in BROWSER_DECIMATION or diagram.smoothing != "off"
+            or diagram.chart in RANKING_CHARTS for diagram in diagrams):
+        return None
+    attribute = _attributes(diagrams)
+    laender = dataset.locations(scope, values)
+    offsets = dataset.catalog.location_offsets
+    if int((offsets[laender + 1] - offsets[laender]).sum()) * max(len(attribute), 1) > max_values:
+        return None
+    return "%s/%s/%s/%s" % (dataset.version, scope, ",".join(sorted(values or [])), ",".join(attribute))
+
+
+def series_store(dataset, scope, values, diagrams, cache=None, max_values=MAX_VALUES):
+    #Inhalt des Stores: Tagesreihen der Auswahl, oder None, wenn der Server die Figuren zeichnet
+    key = series_key(dataset, scope, values, diagrams, max_values)
+    if key is None:
+        return None
+    attribute = _attributes(diagrams)
+    laender = dataset.locations(scope, values)
+
+    daten = None
+    if cache is not None:
+        with stage("cache"):
+            eintrag = cache.key("tagesreihen", [scope, values] + attribute, dataset.version)
+            daten = cache.get(eintrag)
+    if daten is None:
+        with stage("filter"):
+            daten = json.dumps(_series(dataset, scope, values, laender, attribute, key))
+        if cache is not None:
+            with stage("cache"):
+                cache.set(eintrag, daten)
+    with stage("serialize"):
+        return json.loads(daten)
+
+
+def _series(dataset, scope, values, laender, attribute, key):
+    #Tageswerte der Länder (alphabetisch, je nach Datum sortiert) über den ganzen Datenstand
+    offsets = dataset.catalog.location_offsets
+    von, bis = offsets[laender], offsets[laender + 1]
+    zeilen = slice_ranges(von, bis)
+    tage = take(dataset.columns["date"], zeilen).astype("datetime64[D]").astype(np.int64)
+    catalog = dataset.catalog
+    return {
+        #Datenstand und Auswahl; der Browser dekodiert die Spalten pro Schlüssel nur einmal
+        "key": key,
+        "continents": catalog.label("continent", dataset.codes("continent", values)).tolist()
+                      if scope == "continent" else [],
+        "locations": {
+            "name": catalog.label("location", laender).tolist(),
+            "continent": catalog.label("continent", catalog.location_continent[laender]).tolist(),
+            "iso_code": catalog.label("iso_code", catalog.location_iso_code[laender]).tolist(),
+            #Codes: Reihenfolge der Zeilen im Snapshot (Summen pro Kontinent wie im Cube)
+            "code": laender.tolist(),
+            "rows": (bis - von).tolist(),
+        },
+        "date": _array(tage, "int32"),
+        "columns": {attribut: _column(take(dataset.columns[attribut], zeilen)) for attribut in attribute},
+    }
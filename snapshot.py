@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Spaltenbasierter Snapshot der OWID-Covid-Daten.
+
+Die OWID-CSV (URL oder lokale Datei) wird einmalig in ein Verzeichnis mit
+typisierten NumPy-Spalten umgewandelt. Das Dashboard lädt beim Start nur noch
+diesen Snapshot und muss die CSV nicht mehr herunterladen und parsen.
+
+Aufruf:
+    python snapshot.py [QUELLE] [ZIELVERZEICHNIS] [--codebook QUELLE]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+OWID_URL = "https://covid.ourworldindata.org/data/owid-covid-data.csv"
+CODEBOOK_URL = "https://raw.githubusercontent.com/owid/covid-19-data/28810794703c2e8ff1b37b8d08fef6e8f69880c2/public/data/owid-covid-codebook.csv"
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "owid-snapshot")
+
+#Version 2: Zeilen nach Land und Datum sortiert
+#Version 3: Zahlenspalten als float32 bzw. dünn besetzt (siehe storage.py);
+#Snapshots der Version 2 bleiben lesbar und werden beim nächsten Schreiben kompakt
+FORMAT_VERSION = 3
+READABLE_FORMATS = (2, 3)
+META_FILE = "meta.json"
+CODEBOOK_FILE = "codebook.csv"
+
+#Textspalten, die als Kategorien (Integer-Codes) gespeichert werden
+CATEGORY_COLUMNS = ["iso_code", "continent", "location", "tests_units"]
+
+
+def read_owid_csv(source):
+    #CSV einlesen und bereinigen (wie bisher beim Import des Dashboards)
+    df = pd.read_csv(source)
+    df.replace("", np.nan, inplace=True)
+    df.dropna(subset=['continent'], axis=0, inplace=True)
+    df.dropna(subset=['location'], axis=0, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def sort_rows(df):
+    #Zeilen nach Land (Reihenfolge des ersten Auftretens) und Datum sortieren,
+    #damit jedes Land einen zusammenhängenden, nach Datum sortierten Block bildet
+    land = pd.Categorical(df['location'], categories=pd.unique(df['location'].dropna())).codes
+    datum = pd.to_datetime(df['date']).to_numpy(dtype="datetime64[ns]")
+    reihenfolge = np.lexsort((datum, land))
+    return df.iloc[reihenfolge].reset_index(drop=True)
+
+
+def write_snapshot(df, path, codebook=None, source=None, extra=None):
+    #Snapshot zuerst in ein temporäres Verzeichnis schreiben und danach
+    #umbenennen, damit parallel startende Prozesse nie einen halben Snapshot sehen
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".snapshot-", dir=parent)
+
+    df = sort_rows(df)
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        eintrag = {"name": name, "file": "%03d.npy" % len(columns)}
+        if name == "date":
+            eintrag["kind"] = "date"
+            values = pd.to_datetime(column).to_numpy(dtype="datetime64[ns]")
+        elif name in CATEGORY_COLUMNS or not pd.api.types.is_numeric_dtype(column):
+            #Kategorien in der Reihenfolge des ersten Auftretens (Reihenfolge der Dropdowns)
+            kategorien = pd.unique(column.dropna())
+            codes = pd.Categorical(column, categories=kategorien).codes
+            eintrag["kind"] = "category"
+            eintrag["categories"] = [str(k) for k in kategorien]
+            values = np.asarray(codes)
+        else:
+            eintrag["kind"] = "numeric"
+            values = column.to_numpy()
+        storage.save(tmp, eintrag, values)
+        columns.append(eintrag)
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "rows": len(df),
+        "columns": columns,
+        "source": source,
+        "created": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+    }
+    meta.update(extra or {})
+    with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    if codebook is not None:
+        codebook.to_csv(os.path.join(tmp, CODEBOOK_FILE), index=False)
+
+    #Offene memory-mapped Spalten eines alten Snapshots bleiben nach dem Löschen gültig
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        #Ein anderer Prozess war schneller
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            raise
+    return path
+
+
+def is_current(path):
+    #Snapshot vorhanden und im aktuellen Format?
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            return json.load(f).get("format") in READABLE_FORMATS
+    except (OSError, ValueError):
+        return False
+
+
+def version(meta):
+    #Datenstand eines Snapshots
+    return "%s/%d" % (meta["created"], meta["rows"])
+
+
+def update_meta(path, extra):
+    #Zusätzliche Angaben in meta.json ergänzen (atomar ersetzen)
+    meta = read_meta(path)
+    meta.update(extra)
+    tmp = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+
+def read_meta(path):
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") not in READABLE_FORMATS:
+        raise ValueError("Snapshot %s hat ein unbekanntes Format: %r" % (path, meta.get("format")))
+    return meta
+
+
+def read_snapshot(path=DEFAULT_PATH):
+    #Snapshot als DataFrame und Codebook laden
+    meta = read_meta(path)
+    data = {}
+    for eintrag in meta["columns"]:
+        values = np.asarray(storage.load(path, eintrag, meta["rows"], mmap=False))
+        if eintrag["kind"] == "category":
+            data[eintrag["name"]] = pd.Categorical.from_codes(values, eintrag["categories"])
+        else:
+            data[eintrag["name"]] = values
+    df = pd.DataFrame(data, columns=[eintrag["name"] for eintrag in meta["columns"]])
+
+    codebook_path = os.path.join(path, CODEBOOK_FILE)
+    df_codebook = pd.read_csv(codebook_path) if os.path.exists(codebook_path) else None
+    return df, df_codebook
+
+
+def ingest(source=OWID_URL, path=DEFAULT_PATH, codebook=CODEBOOK_URL):
+    #OWID-CSV und Codebook einlesen und als Snapshot speichern
+    df = read_owid_csv(source)
+    df_codebook = pd.read_csv(codebook) if codebook else None
+    return write_snapshot(df, path, codebook=df_codebook, source=str(source))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OWID-CSV in einen Daten-Snapshot umwandeln")
+    parser.add_argument("source", nargs="?", default=OWID_URL, help="URL oder Pfad der OWID-CSV")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH, help="Zielverzeichnis des Snapshots")
+    parser.add_argument("--codebook", default=CODEBOOK_URL, help="URL oder Pfad des OWID-Codebooks")
+    args = parser.parse_args()
+    print("Snapshot geschrieben:", ingest(args.source, args.path, args.codebook))
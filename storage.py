@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Kompakte Speicherform der Zahlenspalten eines Snapshots.
+
+Beim Schreiben wählt encode() pro Spalte die kleinste verlustfreie Form:
+
+    float32     wenn jeder Wert, als float32 gespeichert und beim Lesen auf
+                die Nachkommastellen der Quelle gerundet (höchstens
+                MAX_DECIMALS), genau den ursprünglichen float64-Wert ergibt
+    dünn        Zeilennummern (int32) und Werte der vorhandenen Einträge, wenn
+                das kleiner ist als die Spalte mit allen fehlenden Werten
+                (z.B. Übersterblichkeit und Spitalzahlen, die für die meisten
+                Länder fehlen)
+
+Kategorien sind bereits Integer-Codes, das Datum bleibt datetime64.
+
+Beim Lesen verhalten sich alle Spalten wie float64-Arrays mit NaN für fehlende
+Werte: Indexieren mit einem Zeilenbereich oder Index-Array und np.asarray()
+liefern die ursprünglichen Werte. Aggregate können bei dünnen Spalten nur die
+vorhandenen Werte lesen (SparseColumn.index und .present()).
+"""
+
+import os
+
+import numpy as np
+
+#Höchstens so viele Nachkommastellen werden beim Lesen wiederhergestellt
+MAX_DECIMALS = 6
+
+
+def _decimals(werte):
+    #Kleinste Anzahl Nachkommastellen, auf die gerundet alle Werte unverändert bleiben
+    for stellen in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(werte, stellen), werte):
+            return stellen
+    return None
+
+
+def _restore(werte, stellen):
+    #Gespeicherte Werte als float64, float32 auf die Nachkommastellen der Quelle gerundet
+    werte = np.asarray(werte, dtype=np.float64)
+    return werte if stellen is None else np.round(werte, stellen)
+
+
+def encode(values):
+    #Speicherform einer Zahlenspalte: (Angaben für meta.json, {"values": ..., ["index": ...]})
+    if values.dtype != np.float64:
+        return {}, {"values": values}
+    vorhanden = ~np.isnan(values)
+    werte = values[vorhanden]
+    angaben = {}
+    stellen = _decimals(werte)
+    if stellen is not None:
+        kompakt = werte.astype(np.float32)
+        if np.array_equal(_restore(kompakt, stellen), werte):
+            werte = kompakt
+            angaben["decimals"] = stellen
+    if len(werte) * (werte.itemsize + 4) < len(values) * werte.itemsize:
+        angaben["storage"] = "sparse"
+        return angaben, {"values": werte, "index": np.flatnonzero(vorhanden).astype(np.int32)}
+    if "decimals" in angaben:
+        #Fehlende Werte bleiben NaN
+        return angaben, {"values": values.astype(np.float32)}
+    return angaben, {"values": values}
+
+
+def save(path, eintrag, values):
+    #Spalte in das Snapshot-Verzeichnis schreiben, Zahlenspalten in kompakter Form
+    #(ergänzt eintrag um die Angaben für meta.json)
+    arrays = {"values": values}
+    if eintrag["kind"] == "numeric":
+        angaben, arrays = encode(values)
+        eintrag.update(angaben)
+    for teil, datei in files(eintrag).items():
+        np.save(os.path.join(path, datei), arrays[teil], allow_pickle=False)
+
+
+def files(eintrag):
+    #Dateien einer Spalte: {"values": Datei, ["index": Datei]}
+    dateien = {"values": eintrag["file"]}
+    if eintrag.get("storage") == "sparse":
+        dateien["index"] = eintrag["file"].replace(".npy", "-index.npy")
+    return dateien
+
+
+def load(path, eintrag, rows, mmap=True):
+    #Spalte so öffnen, dass sie sich wie das ursprüngliche Array verhält
+    arrays = {teil: np.load(os.path.join(path, datei), mmap_mode="r" if mmap else None, allow_pickle=False)
+              for teil, datei in files(eintrag).items()}
+    if eintrag.get("storage") == "sparse":
+        return SparseColumn(arrays["index"], arrays["values"], rows, eintrag.get("decimals"))
+    if "decimals" in eintrag:
+        return DenseColumn(arrays["values"], eintrag["decimals"])
+    return arrays["values"]
+
+
+class Column:
+    #Gemeinsame Schnittstelle der kompakten Spalten
+
+    dtype = np.dtype(np.float64)
+
+    def take_ranges(self, bereiche):
+        #Mehrere Zeilenbereiche (slices mit Schritt 1) aneinandergehängt lesen
+        return np.concatenate([self[bereich] for bereich in bereiche])
+
+
+class DenseColumn(Column):
+    #float32-Spalte, liest die ursprünglichen float64-Werte
+
+    def __init__(self, values, decimals):
+        self.values = values
+        self.decimals = decimals
+        self.values.flags.writeable = False
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def __getitem__(self, rows):
+        return _restore(self.values[rows], self.decimals)
+
+    def take_ranges(self, bereiche):
+        #Erst aneinanderhängen, dann einmal umwandeln
+        return _restore(np.concatenate([self.values[bereich] for bereich in bereiche]), self.decimals)
+
+    def __array__(self, dtype=None, copy=None):
+        return _restore(self.values, self.decimals).astype(dtype or np.float64, copy=False)
+
+
+class SparseColumn(Column):
+    #Dünn besetzte Spalte: aufsteigende Zeilennummern (index) und Werte der vorhandenen Einträge
+
+    def __init__(self, index, values, rows, decimals=None):
+        self.index = index
+        self.values = values
+        self.rows = rows
+        self.decimals = decimals
+        self.index.flags.writeable = False
+        self.values.flags.writeable = False
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def shape(self):
+        return (self.rows,)
+
+    @property
+    def nbytes(self):
+        return self.index.nbytes + self.values.nbytes
+
+    def present(self):
+        #Werte der vorhandenen Einträge (in der Reihenfolge von index)
+        return _restore(self.values, self.decimals)
+
+    def __getitem__(self, rows):
+        if isinstance(rows, slice):
+            von, bis, schritt = rows.indices(self.rows)
+            if schritt == 1:
+                #Nur den Teil von index lesen, der im Bereich liegt
+                ergebnis = np.full(max(bis - von, 0), np.nan)
+                a, b = np.searchsorted(self.index, [von, bis])
+                ergebnis[self.index[a:b] - von] = _restore(self.values[a:b], self.decimals)
+                return ergebnis
+            rows = np.arange(von, bis, schritt)
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        rows = np.where(rows < 0, rows + self.rows, rows)
+        position = np.minimum(np.searchsorted(self.index, rows), max(len(self.index) - 1, 0))
+        ergebnis = np.full(rows.shape, np.nan)
+        if len(self.index):
+            gefunden = self.index[position] == rows
+            ergebnis[gefunden] = _restore(self.values[position[gefunden]], self.decimals)
+        return ergebnis
+
+    def take_ranges(self, bereiche):
+        #Vorhandene Einträge aller Bereiche mit je einer Binärsuche pro Bereichsgrenze finden
+        von = np.array([bereich.start for bereich in bereiche], dtype=np.int64)
+        bis = np.array([bereich.stop for bereich in bereiche], dtype=np.int64)
+        laengen = bis - von
+        ergebnis = np.full(int(laengen.sum()), np.nan)
+        a, b = np.searchsorted(self.index, von), np.searchsorted(self.index, bis)
+        anzahl = b - a
+        #Positionen in index bzw. values und Zeile im Ergebnis
+        position = np.arange(int(anzahl.sum())) + np.repeat(a - (np.cumsum(anzahl) - anzahl), anzahl)
+        verschiebung = np.repeat(von - (np.cumsum(laengen) - laengen), anzahl)
+        ergebnis[self.index[position] - verschiebung] = _restore(self.values[position], self.decimals)
+        return ergebnis
+
+    def __array__(self, dtype=None, copy=None):
+        ergebnis = np.full(self.rows, np.nan)
+        ergebnis[self.index] = self.present()
+        return ergebnis.astype(dtype or np.float64, copy=False)